@@ -0,0 +1,84 @@
+"""Recall@K and build time of the IVF similarity backend against exact cosine
+
+    python -m benchmarks.ann_recall --k 10
+
+Without --data, a synthetic catalogue with co-purchase structure is used so
+the comparison can be run at sizes well beyond the shipped sample.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from shopper_spectrum.ann import IVFIndex, recall_at_k
+from shopper_spectrum.interactions import build_interaction_matrix
+from shopper_spectrum.recommender import build_similarity_index
+
+N_PROBES = [1, 2, 4, 8, 16, 32]
+
+
+def synthetic_interactions(n_customers, n_products, n_groups, seed=0):
+    """Customers who mostly buy within one product group plus a little noise"""
+    rng = np.random.default_rng(seed)
+    customer_groups = rng.integers(0, n_groups, n_customers)
+    product_groups = rng.integers(0, n_groups, n_products)
+    group_members = [np.flatnonzero(product_groups == group) for group in range(n_groups)]
+
+    rows, cols = [], []
+    for customer, group in enumerate(customer_groups):
+        members = group_members[group]
+        n_items = min(rng.integers(10, 40), len(members))
+        picks = np.concatenate([rng.choice(members, n_items, replace=False), rng.integers(0, n_products, 5)])
+        rows.append(np.full(len(picks), customer))
+        cols.append(picks)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                             shape=(n_customers, n_products))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help='Cleaned transactions CSV (e.g. the app sample)')
+    parser.add_argument('--customers', type=int, default=50000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.data:
+        transactions = pd.read_csv(args.data, usecols=['CustomerID', 'Description', 'Quantity'])
+        matrix = build_interaction_matrix(transactions).matrix
+    else:
+        matrix = synthetic_interactions(args.customers, args.products, n_groups=max(1, args.products // 100))
+    print(f"{matrix.shape[0]:,} customers x {matrix.shape[1]:,} products, k={args.k}")
+
+    start = time.perf_counter()
+    exact, exact_scores = build_similarity_index(matrix, k=args.k)
+    print(f"{'exact':>12}  build {time.perf_counter() - start:7.2f}s  recall@{args.k} 1.000  score ratio 1.000")
+
+    start = time.perf_counter()
+    index = IVFIndex().fit(matrix)
+    fit_seconds = time.perf_counter() - start
+    print(f"{'ivf fit':>12}  {fit_seconds:7.2f}s  ({index.n_lists} lists)")
+
+    sample = np.random.default_rng(0).choice(matrix.shape[1], min(200, matrix.shape[1]), replace=False)
+    for n_probe in N_PROBES:
+        start = time.perf_counter()
+        approximate, approximate_scores = index.build_neighbours(args.k, n_probe=n_probe)
+        seconds = time.perf_counter() - start
+
+        query_start = time.perf_counter()
+        for product_idx in sample:
+            index.query(product_idx, args.k, n_probe=n_probe)
+        query_ms = (time.perf_counter() - query_start) / len(sample) * 1000
+
+        # Many neighbours tie on sparse data, so also report how much similarity was recovered
+        score_ratio = approximate_scores.sum() / max(exact_scores.sum(), 1e-12)
+        print(f"{'n_probe=' + str(n_probe):>12}  build {fit_seconds + seconds:7.2f}s  "
+              f"recall@{args.k} {recall_at_k(approximate, exact):.3f}  score ratio {score_ratio:.3f}  "
+              f"query {query_ms:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Scatter payload size and serialisation time, full data against server-side downsampling
+
+    python -m benchmarks.chart_payload --rows 200000 500000 2000000
+
+Customers from customer_segments are resampled up to each --rows value and
+drawn as the Customer Explorer scatter, once with every point and once
+through downsample_points with the default point budget.
+"""
+import argparse
+import time
+
+import plotly.express as px
+
+from benchmarks.customer_explorer import synthetic_customers
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.downsample import POINT_BUDGET, downsample_points
+
+
+def scatter_payload(customers):
+    start = time.perf_counter()
+    fig = px.scatter(customers, x='Frequency', y='Monetary', color='Cluster', size='CLV_Estimate',
+                     hover_data=['CustomerID', 'Recency'])
+    payload = fig.to_json()
+    return len(payload), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[200_000, 1_000_000])
+    parser.add_argument('--budget', type=int, default=POINT_BUDGET)
+    args = parser.parse_args()
+
+    base = read_dataset('customer_segments')
+    for n_rows in args.rows:
+        customers = synthetic_customers(base, n_rows)
+        full_bytes, full_seconds = scatter_payload(customers)
+
+        start = time.perf_counter()
+        points = downsample_points(customers, args.budget, stratify='Cluster', keep_top=['Monetary', 'CLV_Estimate'],
+                                   outlier_cols=['Frequency', 'Monetary'])
+        sample_seconds = time.perf_counter() - start
+        sampled_bytes, sampled_seconds = scatter_payload(points)
+        print(f"{n_rows:>10,} customers  full {full_bytes / 1e6:7.1f} MB {full_seconds:6.2f}s  "
+              f"downsampled {len(points):,} points {sampled_bytes / 1e6:5.2f} MB "
+              f"{sample_seconds + sampled_seconds:5.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Customer Explorer filtering: boolean masks + nlargest against CustomerIndex
+
+    python -m benchmarks.customer_explorer --rows 2000000
+
+Customers from customer_segments are resampled with multiplicative noise up
+to --rows; each slider position is answered both ways (count, top 20 and
+histogram) and the answers are checked to agree.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.customer_index import CustomerIndex
+
+SLIDER_POSITIONS = [(0, 1), (500, 2), (2000, 5), (10000, 20), (50000, 50)]
+
+
+def synthetic_customers(customers, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    sampled = customers.iloc[rng.integers(0, len(customers), n_rows)].reset_index(drop=True)
+    for col in ['Monetary', 'CLV_Estimate', 'Recency']:
+        sampled[col] = sampled[col] * rng.lognormal(0, 0.1, n_rows)
+    return sampled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--sort-by', default='Monetary')
+    args = parser.parse_args()
+
+    customers = synthetic_customers(read_dataset('customer_segments'), args.rows)
+    clusters = sorted(customers['Cluster'].unique())
+
+    start = time.perf_counter()
+    index = CustomerIndex(customers)
+    print(f"{args.rows:,} customers, index built in {time.perf_counter() - start:.2f}s")
+
+    for min_monetary, min_frequency in SLIDER_POSITIONS:
+        start = time.perf_counter()
+        filtered = customers[customers['Cluster'].isin(clusters) & (customers['Monetary'] >= min_monetary)
+                             & (customers['Frequency'] >= min_frequency)]
+        mask_top = filtered.nlargest(20, args.sort_by)
+        mask_counts, _ = np.histogram(filtered['Monetary'], bins=30)
+        mask_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        minimums = {'Monetary': min_monetary, 'Frequency': min_frequency}
+        selected = index.select(clusters, minimums)
+        index_top = index.top_n(args.sort_by, 20, clusters, minimums)
+        index_counts = index.histogram(selected)['Customers'].to_numpy()
+        index_seconds = time.perf_counter() - start
+
+        assert len(selected) == len(filtered) and list(index_top) == list(mask_top.index), 'answers differ'
+        assert (index_counts == mask_counts).all(), 'histograms differ'
+        print(f"Monetary >= {min_monetary:>6,} Frequency >= {min_frequency:>3}: {len(selected):>10,} rows  "
+              f"mask {mask_seconds * 1000:8.2f} ms  index {index_seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Throughput of per-customer recommendations, batched sparse scoring against one customer at a time
+
+    python -m benchmarks.customer_recommendations --customers 200000 1000000 --products 5000
+
+Synthetic customers buy mostly within one product group (see ann_recall).
+The similarity index is built once per size and is not part of the timing.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.ann_recall import synthetic_interactions
+from shopper_spectrum.interactions import InteractionMatrix
+from shopper_spectrum.personalized import CustomerRecommender
+from shopper_spectrum.recommender import SimilarityIndex, build_similarity_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, nargs='+', default=[50_000, 200_000])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--n', type=int, default=5)
+    parser.add_argument('--boost', type=float, default=0.2)
+    parser.add_argument('--single', type=int, default=200, help='Customers timed one call at a time')
+    args = parser.parse_args()
+
+    for n_customers in args.customers:
+        matrix = synthetic_interactions(n_customers, args.products, n_groups=max(1, args.products // 100))
+        products = np.array([f'PRODUCT {i}' for i in range(args.products)], dtype=object)
+        customer_ids = np.arange(n_customers, dtype=np.int64)
+        interactions = InteractionMatrix(matrix, customer_ids, products, 'binary')
+        index = SimilarityIndex(products, *build_similarity_index(matrix))
+        clusters = pd.Series(np.random.default_rng(0).integers(0, 5, n_customers), index=customer_ids)
+        recommender = CustomerRecommender(interactions, index, clusters, boost=args.boost)
+
+        start = time.perf_counter()
+        for customer_id in customer_ids[:args.single]:
+            recommender.recommend(customer_id, args.n)
+        single = (time.perf_counter() - start) / args.single
+
+        recommender = CustomerRecommender(interactions, index, clusters, boost=args.boost)
+        start = time.perf_counter()
+        recommender.recommend_many(customer_ids, args.n)
+        batch = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recommender.recommend_many(customer_ids[:args.single], args.n)
+        cached = (time.perf_counter() - start) / args.single
+        print(f"{n_customers:>10,} customers  one at a time {single * 1e3:6.2f} ms/customer  "
+              f"batch {batch:6.2f}s ({n_customers / batch:,.0f} customers/s)  cached {cached * 1e6:5.1f} us/customer")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Pair mining time, naive pandas self-join against the sparse Apriori engine
+
+    python -m benchmarks.market_basket --invoices 100000 500000 --jobs 1 4
+
+The sample's invoices are tiled (with new invoice numbers) up to each
+--invoices value. The naive version self-joins invoice lines on InvoiceNo
+and counts product pairs with groupby; its pair counts are checked against
+frequent_itemsets with max_length=2. Times for max_length=3 are reported
+per --jobs value as well.
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.basket import BASKET_COLUMNS, basket_matrix, frequent_itemsets
+
+MIN_SUPPORT = 0.0002
+
+
+def tiled_invoices(transactions, n_invoices):
+    codes, invoices = pd.factorize(transactions['InvoiceNo'])
+    copies = math.ceil(n_invoices / len(invoices))
+    tiled = pd.concat([transactions.assign(InvoiceNo=codes + copy * len(invoices)) for copy in range(copies)],
+                      ignore_index=True)
+    return tiled[tiled['InvoiceNo'] < n_invoices]
+
+
+def naive_pairs(transactions, min_support):
+    lines = transactions.loc[transactions['Quantity'] > 0, ['InvoiceNo', 'Description']].drop_duplicates()
+    n_invoices = lines['InvoiceNo'].nunique()
+    pairs = lines.merge(lines, on='InvoiceNo')
+    pairs = pairs[pairs['Description_x'] < pairs['Description_y']]
+    counts = pairs.groupby(['Description_x', 'Description_y']).size()
+    return counts[counts >= math.ceil(min_support * n_invoices)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invoices', type=int, nargs='+', default=[100_000, 300_000])
+    parser.add_argument('--min-support', type=float, default=MIN_SUPPORT)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1])
+    args = parser.parse_args()
+
+    sample = read_dataset('retail_data_sample', columns=BASKET_COLUMNS)
+    sample['Description'] = sample['Description'].astype(str)
+    for n_invoices in args.invoices:
+        transactions = tiled_invoices(sample, n_invoices)
+        start = time.perf_counter()
+        expected = naive_pairs(transactions, args.min_support)
+        naive_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        baskets = basket_matrix(transactions)
+        supports, _ = frequent_itemsets(baskets, args.min_support, max_length=2, n_jobs=1)
+        sparse_seconds = time.perf_counter() - start
+        products = np.asarray(baskets.products, dtype=object)
+        pairs = {(products[a], products[b]): count for (a, b), count in
+                 ((itemset, count) for itemset, count in supports.items() if len(itemset) == 2)}
+        match = pairs == {pair: int(count) for pair, count in expected.items()}
+        print(f"{n_invoices:>9,} invoices  pairs: pandas {naive_seconds:6.2f}s  sparse {sparse_seconds:6.2f}s  "
+              f"({len(pairs):,} frequent pairs, {'match' if match else 'MISMATCH'})")
+
+        for n_jobs in args.jobs:
+            start = time.perf_counter()
+            supports, _ = frequent_itemsets(basket_matrix(transactions), args.min_support, max_length=3,
+                                            n_jobs=n_jobs)
+            print(f"{'':>19}up to triples, {n_jobs} job(s) {time.perf_counter() - start:6.2f}s "
+                  f"({len(supports):,} frequent itemsets)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Speedup of the parallel export aggregations versus core count
+
+    python -m benchmarks.parallel_export --rows 2000000
+
+The app's transaction sample is tiled (with shifted customer and invoice
+ids) up to --rows, then the serial and parallel export paths are timed and
+their outputs compared.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.parallel import build_export_datasets_parallel
+from shopper_spectrum.pipeline import build_export_datasets, compute_customer_features
+
+SAMPLE_PATH = os.path.join('Generated CSV files', 'retail_data_sample.csv')
+DATASETS = ['transaction_summary', 'cluster_characteristics', 'product_analysis', 'geographical_analysis',
+            'time_analysis']
+
+
+def tile_transactions(sample, n_rows):
+    """Repeat the sample with disjoint customer and invoice ids until it has n_rows"""
+    copies = []
+    for copy in range(int(np.ceil(n_rows / len(sample)))):
+        tile = sample.copy()
+        tile['CustomerID'] = tile['CustomerID'] + copy * 100000
+        tile['InvoiceNo'] = tile['InvoiceNo'].astype(str) + f'-{copy}'
+        copies.append(tile)
+    return pd.concat(copies, ignore_index=True).iloc[:n_rows]
+
+
+def assert_same_datasets(serial, parallel):
+    """Row order must match too, so the outputs are compared as built"""
+    for name in DATASETS:
+        expected = serial[name].reset_index(drop=True)
+        actual = parallel[name].reset_index(drop=True)
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=SAMPLE_PATH, help='Cleaned transactions CSV to tile')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    sample = pd.read_csv(args.data, dtype={'InvoiceNo': str, 'StockCode': str}, parse_dates=['InvoiceDate'])
+    clean = tile_transactions(sample, args.rows)
+    customer_data = compute_customer_features(clean)
+    customer_data['Cluster'] = (customer_data['Monetary'] > customer_data['Monetary'].median()).astype(int)
+    print(f"{len(clean):,} transactions, {len(customer_data):,} customers")
+
+    start = time.perf_counter()
+    serial = build_export_datasets(clean, customer_data)
+    serial_seconds = time.perf_counter() - start
+    print(f"{'serial':>10}  {serial_seconds:7.2f}s")
+
+    n_jobs = 2
+    while n_jobs <= args.max_jobs:
+        start = time.perf_counter()
+        parallel = build_export_datasets_parallel(clean, customer_data, n_jobs=n_jobs)
+        seconds = time.perf_counter() - start
+        assert_same_datasets(serial, parallel)
+        print(f"{n_jobs:>4} jobs  {seconds:7.2f}s  speedup {serial_seconds / seconds:.2f}x  (outputs match)")
+        n_jobs *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Product quadrant classification: row-wise apply against the vectorized classifier
+
+    python -m benchmarks.product_quadrants --rows 1000000
+
+A synthetic lognormal catalogue of --rows products is classified both ways
+(apply only on the first --apply-rows, then extrapolated) and the labels
+are checked to agree.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.quadrants import categorize_products
+
+
+def categorize_row_wise(products, revenue_median, quantity_median):
+    """The Product Analysis page's original rule"""
+    def categorize_product(row):
+        if row['Total_Revenue'] >= revenue_median and row['Total_Quantity'] >= quantity_median:
+            return "Star Products"
+        elif row['Total_Revenue'] >= revenue_median and row['Total_Quantity'] < quantity_median:
+            return "Premium Products"
+        elif row['Total_Revenue'] < revenue_median and row['Total_Quantity'] >= quantity_median:
+            return "Volume Products"
+        else:
+            return "Underperformers"
+    return products.apply(categorize_product, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--apply-rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    products = pd.DataFrame({'Total_Revenue': rng.lognormal(5, 2, args.rows),
+                             'Total_Quantity': rng.lognormal(4, 2, args.rows).round()})
+
+    start = time.perf_counter()
+    categories, (revenue_threshold, quantity_threshold) = categorize_products(products)
+    vectorized = time.perf_counter() - start
+
+    subset = products.head(args.apply_rows)
+    start = time.perf_counter()
+    row_wise = categorize_row_wise(subset, revenue_threshold, quantity_threshold)
+    apply_seconds = (time.perf_counter() - start) * args.rows / len(subset)
+
+    assert (row_wise == categories.head(len(subset)).astype(str)).all(), 'labels differ'
+    print(f"{args.rows:,} products")
+    print(f"{'apply':>12}  {apply_seconds:8.3f}s (extrapolated from {len(subset):,} rows)")
+    print(f"{'vectorized':>12}  {vectorized:8.3f}s  ({apply_seconds / vectorized:,.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
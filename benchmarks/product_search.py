@@ -0,0 +1,65 @@
+"""Product search latency, linear scan against the n-gram index, as the catalogue grows
+
+    python -m benchmarks.product_search --products 4000 100000 500000
+
+Synthetic catalogues recombine the words of the sample's descriptions.
+Queries are substrings of random names (2 to 10 characters); the scan is
+the page's old lowercase-every-name comprehension plus a revenue sort.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.product_search import SEARCH_LIMIT, ProductSearchIndex
+
+
+def synthetic_catalogue(descriptions, n_products, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(sorted({word for name in descriptions for word in str(name).split()}))
+    lengths = rng.integers(2, 6, n_products)
+    picks = rng.choice(words, lengths.sum())
+    names = [' '.join(name_words) for name_words in np.split(picks, np.cumsum(lengths)[:-1])]
+    # Suffix with the position so names stay unique
+    return [f'{name} {i}' for i, name in enumerate(names)], rng.lognormal(5, 2, n_products)
+
+
+def scan(names, revenue, query):
+    matches = [i for i, name in enumerate(names) if query.lower() in name.lower()]
+    return [names[i] for i in sorted(matches, key=lambda i: -revenue[i])[:SEARCH_LIMIT]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, nargs='+', default=[4000, 100_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    descriptions = read_dataset('retail_data_sample', columns=['Description'])['Description'].unique()
+    rng = np.random.default_rng(args.seed)
+    for n_products in args.products:
+        names, revenue = synthetic_catalogue(descriptions, n_products, args.seed)
+        start = time.perf_counter()
+        index = ProductSearchIndex(names, revenue)
+        build_seconds = time.perf_counter() - start
+
+        queries = []
+        for name in rng.choice(names, args.queries):
+            size = int(rng.integers(2, 11))
+            offset = int(rng.integers(0, max(len(name) - size, 0) + 1))
+            queries.append(name[offset:offset + size])
+
+        timings = {}
+        for label, search in [('scan', lambda q: scan(names, revenue, q)), ('index', index.search)]:
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            timings[label] = (time.perf_counter() - start) / len(queries)
+        print(f"{n_products:>9,} products  build {build_seconds:6.2f}s  scan {timings['scan'] * 1e3:8.2f} ms/query  "
+              f"index {timings['index'] * 1e3:6.3f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Latency of recommendation queries: the old per-query DataFrame filters against RecommendationService
+
+    python -m benchmarks.recommendation_cache --queries 2000
+
+Queries follow a Zipf-like popularity over the sample's products, so a few
+products are asked for much more often than the rest, as on the page. Each
+query is answered three ways: filtering product_info for every
+recommendation (what the page did before), the service with its cache
+disabled, and the service with its LRU cache.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.recommender import RecommendationService, get_or_build_similarity_index
+from shopper_spectrum.shared_store import dataset_version, shared_interaction_matrix
+
+
+def product_info_of(transactions):
+    product_info = transactions.groupby('Description', observed=True).agg({
+        'UnitPrice': 'mean', 'Quantity': 'sum', 'CustomerID': 'nunique', 'TotalAmount': 'sum'
+    }).reset_index()
+    product_info.columns = ['Description', 'Avg_Price', 'Total_Quantity', 'Unique_Customers', 'Total_Revenue']
+    return product_info
+
+
+def filtered_recommendations(index, product_info, product_name, n):
+    recommendations = index.recommend(product_name, n)
+    stats = product_info[product_info['Description'] == product_name].iloc[0]
+    rows = [product_info[product_info['Description'] == rec['Product']].iloc[0] for rec in recommendations]
+    return stats, rows
+
+
+def time_queries(answer, queries):
+    start = time.perf_counter()
+    for product_name in queries:
+        answer(product_name)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--n', type=int, default=5)
+    parser.add_argument('--cache-size', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    interactions = shared_interaction_matrix('retail_data_sample')
+    index = get_or_build_similarity_index(interactions, source_version=dataset_version('retail_data_sample'))
+    product_info = product_info_of(read_dataset('retail_data_sample'))
+    rng = np.random.default_rng(args.seed)
+    weights = 1.0 / np.arange(1, len(index.products) + 1)
+    queries = rng.choice(index.products, args.queries, p=weights / weights.sum())
+
+    seconds = time_queries(lambda name: filtered_recommendations(index, product_info, name, args.n), queries)
+    print(f"{'filters':>10}  {seconds * 1e6:10.1f} us/query")
+
+    uncached = RecommendationService(index, product_info, dataset_version('retail_data_sample'), cache_size=0)
+    seconds = time_queries(lambda name: (uncached.product_stats(name), uncached.recommend(name, args.n)), queries)
+    print(f"{'no cache':>10}  {seconds * 1e6:10.1f} us/query")
+
+    service = RecommendationService(index, product_info, dataset_version('retail_data_sample'), args.cache_size)
+    seconds = time_queries(lambda name: (service.product_stats(name), service.recommend(name, args.n)), queries)
+    stats = service.cache_stats()
+    print(f"{'LRU':>10}  {seconds * 1e6:10.1f} us/query  hit rate {stats['hit_rate']:.1%} "
+          f"({stats['size']:,} cached)")
+
+
+if __name__ == '__main__':
+    main()
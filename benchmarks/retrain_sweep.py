@@ -0,0 +1,58 @@
+"""k-sweep time of the notebook's KMeans loop against the warm-started retrain path
+
+    python -m benchmarks.retrain_sweep --rows 20000
+
+Customers from customer_segments are resampled with multiplicative noise up
+to --rows. The notebook loop (KMeans n_init=10, full silhouette) is O(n^2)
+and is skipped above --baseline-limit rows.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.retrain import K_RANGE, retrain_segments
+from shopper_spectrum.scoring import load_scorer
+
+
+def notebook_sweep(features):
+    scaled = StandardScaler().fit_transform(features.fillna(features.median()))
+    scores = []
+    for k in K_RANGE:
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10).fit(scaled)
+        scores.append(silhouette_score(scaled, kmeans.labels_))
+    return K_RANGE[int(np.argmax(scores))], max(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--jobs', type=int, help='Processes for the retrain sweep (default: all cores)')
+    parser.add_argument('--baseline-limit', type=int, default=50000)
+    args = parser.parse_args()
+
+    feature_names = load_scorer().feature_names
+    base = read_dataset('customer_segments')[feature_names].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(0)
+    features = base[rng.integers(0, len(base), args.rows)] * rng.lognormal(0, 0.1, (args.rows, base.shape[1]))
+    customers = pd.DataFrame(features, columns=feature_names)
+    print(f"{args.rows:,} customers, k in {K_RANGE.start}..{K_RANGE.stop - 1}")
+
+    if args.rows <= args.baseline_limit:
+        start = time.perf_counter()
+        best_k, best_score = notebook_sweep(customers)
+        print(f"{'notebook':>10}  {time.perf_counter() - start:8.2f}s  best k={best_k} silhouette {best_score:.3f}")
+
+    start = time.perf_counter()
+    _, model_info, _ = retrain_segments(customers, n_jobs=args.jobs)
+    print(f"{'retrain':>10}  {time.perf_counter() - start:8.2f}s  best k={model_info['n_clusters']} "
+          f"silhouette {model_info['silhouette_score']:.3f} (sample of {model_info['silhouette_sample_size']:,})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Segment scoring throughput and agreement with the notebook's cluster labels
+
+    python -m benchmarks.scoring_throughput --rows 1000000
+
+Customers from customer_segments are resampled with multiplicative noise up
+to --rows, then scored in batches of --batch-size rows.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.scoring import load_scorer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=100_000)
+    args = parser.parse_args()
+
+    scorer = load_scorer()
+    customers = read_dataset('customer_segments')
+    agreement = (scorer.predict(scorer.feature_matrix(customers)) == customers['Cluster'].to_numpy()).mean()
+    print(f"Agreement with notebook labels on {len(customers):,} customers: {agreement:.2%}")
+
+    rng = np.random.default_rng(0)
+    base = scorer.feature_matrix(customers)
+    features = base[rng.integers(0, len(base), args.rows)] * rng.lognormal(0, 0.1, (args.rows, base.shape[1]))
+
+    start = time.perf_counter()
+    for offset in range(0, args.rows, args.batch_size):
+        scorer.predict(features[offset:offset + args.batch_size])
+    elapsed = time.perf_counter() - start
+    print(f"Scored {args.rows:,} customers in {elapsed:.3f}s ({args.rows / elapsed:,.0f} customers/s)")
+
+
+if __name__ == '__main__':
+    main()
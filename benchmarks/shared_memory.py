@@ -0,0 +1,84 @@
+"""Per-process memory of worker processes holding the transaction dataset (Linux)
+
+    python -m benchmarks.shared_memory --rows 2000000 --workers 4
+
+The retail sample is tiled to --rows in a scratch directory. --workers
+processes then hold it at the same time, once loaded as private copies
+(read_dataset) and once through the memory-mapped Arrow store
+(open_dataset). Each worker reports its RSS and its private dirty memory,
+which is what actually grows with every extra session or replica; mapped
+file pages are shared through the page cache.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.artifact_store import read_dataset, write_dataset
+from shopper_spectrum.shared_store import open_dataset
+
+NUMERIC_COLUMNS = ['Quantity', 'UnitPrice', 'TotalAmount', 'CustomerID']
+
+
+def memory_mb():
+    """(RSS, private dirty) of this process in MB, from /proc/self/smaps_rollup"""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return fields['Rss'], fields['Private_Dirty']
+
+
+def _worker(loader, barrier, results):
+    frame = read_dataset('retail_data_sample') if loader == 'copy' else open_dataset('retail_data_sample')
+    # Touch every numeric value, as rendering a page would
+    float(sum(frame[column].sum() for column in NUMERIC_COLUMNS))
+    barrier.wait()
+    results.put(memory_mb())
+    barrier.wait()
+
+
+def run_workers(loader, n_workers):
+    context = multiprocessing.get_context('spawn')
+    barrier, results = context.Barrier(n_workers), context.Queue()
+    workers = [context.Process(target=_worker, args=(loader, barrier, results)) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    measurements = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return np.mean(measurements, axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    sample = read_dataset('retail_data_sample')
+    tiled = pd.concat([sample] * int(np.ceil(args.rows / len(sample))), ignore_index=True).head(args.rows)
+    scratch = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        os.chdir(scratch)
+        write_dataset('retail_data_sample', tiled)
+        # Publish outside the measurement so workers only map the file
+        open_dataset('retail_data_sample')
+        print(f"{args.rows:,} transactions, {args.workers} concurrent workers (mean per worker)")
+        for loader in ['copy', 'shared']:
+            rss, private = run_workers(loader, args.workers)
+            print(f"{loader:>8}  RSS {rss:8.1f} MB  private dirty {private:8.1f} MB")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""End-to-end benchmark suite over synthetic transactions, with regression baselines
+
+    python -m benchmarks.suite --rows 10000,100000
+    python -m benchmarks.suite --rows 1000000,10000000 --repeat 1 --output artifacts/bench.json
+    python -m benchmarks.suite --rows 10000,100000 --update-baselines
+
+For every size a synthetic log (benchmarks.synthetic_retail) is generated
+and each stage below is timed on it: the RFM pipeline, KMeans retraining
+and segment scoring, the export aggregations, the similarity index build
+and recommendation lookups, and the data preparation behind each dashboard
+page (from the stage outputs, so no dataset is read from disk). Every
+stage runs --repeat times and the fastest run counts.
+
+Times are compared with benchmarks/baselines.json; a stage more than
+--tolerance times slower than its baseline (and by more than MIN_DELTA
+seconds, so that millisecond stages don't flap) is a regression and the
+exit status is 1. Baselines are machine specific: record them on the
+machine the suite runs on with --update-baselines, which replaces the
+sizes that were run and keeps the others. When the baselines were recorded
+on a different machine (Python version, platform or core count) the
+comparison is still printed but regressions do not fail the run.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic_retail import generate_transactions
+from shopper_spectrum.customer_index import CustomerIndex
+from shopper_spectrum.downsample import downsample_points
+from shopper_spectrum.interactions import build_interaction_matrix
+from shopper_spectrum.kpis import compute_overview_kpis
+from shopper_spectrum.pipeline import (RFMState, add_clv_estimate, add_rfm_scores, build_export_datasets,
+                                       clean_transactions)
+from shopper_spectrum.product_search import ProductSearchIndex
+from shopper_spectrum.quadrants import categorize_products
+from shopper_spectrum.recommender import (RecommendationService, SimilarityIndex, build_similarity_index,
+                                          default_backend)
+from shopper_spectrum.retrain import retrain_segments
+from shopper_spectrum.scoring import SegmentScorer
+from shopper_spectrum.time_cube import TimeCube, build_time_cube
+
+BASELINES_PATH = os.path.join('benchmarks', 'baselines.json')
+DEFAULT_SIZES = '10000,100000'
+TOLERANCE = 1.5
+MIN_DELTA = 0.05
+K_VALUES = range(2, 7)
+LOOKUPS = 1000
+SEARCH_QUERIES = ['heart', 'lantern', 'red tea', 'vintage', 'bunting', 'cake stnd', 'jumbo bag', 'clock']
+
+
+def _timed(timings, stage, function, repeat):
+    """Run function repeat times, keep the fastest time under stage and return the last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    timings[stage] = best
+    return result
+
+
+def _summary_stats(clean, customer_data, n_clusters):
+    start, end = clean['InvoiceDate'].min(), clean['InvoiceDate'].max()
+    total_revenue, total_orders = float(clean['TotalAmount'].sum()), int(clean['InvoiceNo'].nunique())
+    return {
+        'total_revenue': total_revenue,
+        'total_customers': int(len(customer_data)),
+        'total_orders': total_orders,
+        'avg_order_value': total_revenue / total_orders,
+        'unique_countries': int(clean['Country'].nunique()),
+        'analysis_period_days': (end - start).days,
+        'date_range': {'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')},
+        'cluster_info': {'n_clusters': n_clusters},
+    }
+
+
+def _product_info(clean):
+    """Per-product stats, as prepare_recommendation_data builds them for the app"""
+    product_info = clean.groupby('Description', observed=True).agg({
+        'UnitPrice': 'mean',
+        'Quantity': 'sum',
+        'CustomerID': 'nunique',
+        'TotalAmount': 'sum'
+    }).reset_index()
+    product_info.columns = ['Description', 'Avg_Price', 'Total_Quantity', 'Unique_Customers', 'Total_Revenue']
+    return product_info
+
+
+def run_size(n_rows, repeat=1, seed=0):
+    """{stage: fastest seconds} for one synthetic log of n_rows rows"""
+    timings = {}
+    raw = _timed(timings, 'generate', lambda: generate_transactions(n_rows, seed=seed), repeat)
+
+    # RFM pipeline
+    clean = _timed(timings, 'rfm_clean', lambda: clean_transactions(raw), repeat)
+    customer_data = _timed(timings, 'rfm_features', lambda: add_clv_estimate(add_rfm_scores(
+        RFMState.from_transactions(clean).features())), repeat)
+
+    # KMeans training, in-process so the timing does not depend on the core count
+    scaler, model_info, _ = _timed(timings, 'kmeans_retrain', lambda: retrain_segments(
+        customer_data, k_values=K_VALUES, n_jobs=1, seed=seed), repeat)
+    scorer = SegmentScorer.from_artifacts(scaler, model_info)
+    customer_data['Cluster'] = _timed(timings, 'segment_scoring',
+                                      lambda: scorer.predict(scorer.feature_matrix(customer_data)), repeat)
+
+    exports = _timed(timings, 'export_aggregations', lambda: build_export_datasets(clean, customer_data), repeat)
+
+    # Recommendations
+    interactions = _timed(timings, 'interaction_matrix', lambda: build_interaction_matrix(clean), repeat)
+    backend = default_backend(interactions.shape[1])
+    neighbours, scores = _timed(timings, 'similarity_index', lambda: build_similarity_index(
+        interactions.matrix, backend=backend), repeat)
+    similarity_index = SimilarityIndex(list(interactions.products), neighbours, scores, backend=backend)
+    product_info = _product_info(clean)
+    queries = np.random.default_rng(seed).choice(similarity_index.products, LOOKUPS)
+
+    def lookups():
+        # A fresh service each run, so every lookup misses the LRU
+        service = RecommendationService(similarity_index, product_info)
+        for product in queries:
+            service.recommend(product, 5)
+        return service
+    service = _timed(timings, 'recommendation_lookups', lookups, repeat)
+
+    # Page data preparation
+    customer_segments = customer_data
+    product_analysis = exports['product_analysis']
+    geographical_analysis = exports['geographical_analysis']
+    _timed(timings, 'page_overview', lambda: compute_overview_kpis(
+        _summary_stats(clean, customer_data, model_info['n_clusters']), customer_segments,
+        exports['time_analysis']), repeat)
+    _timed(timings, 'page_segments', lambda: customer_segments.groupby('Cluster')[
+        ['R_Score', 'F_Score', 'M_Score', 'Recency', 'Frequency', 'Monetary']].mean(), repeat)
+
+    def products_page():
+        categories, _ = categorize_products(product_analysis)
+        return downsample_points(product_analysis.assign(Category=categories), stratify='Category',
+                                 keep_top=['Total_Revenue', 'Total_Quantity'],
+                                 outlier_cols=['Total_Quantity', 'Total_Revenue'])
+    _timed(timings, 'page_products', products_page, repeat)
+    _timed(timings, 'page_geographic', lambda: (geographical_analysis.head(15),
+                                                geographical_analysis.nlargest(15, 'Avg_Order_Value')), repeat)
+
+    def time_page():
+        cube = TimeCube(*build_time_cube(exports['transaction_summary']))
+        return cube.rollup(['Date'], ['Revenue']), cube.rollup(['Hour'], ['Revenue']), cube.monthly(), \
+            cube.weekday_hour_heatmap()
+    _timed(timings, 'page_time', time_page, repeat)
+
+    def explorer_page():
+        index = CustomerIndex(customer_segments)
+        minimums = {'Monetary': 0, 'Frequency': 1}
+        return index.histogram(index.select(index.clusters, minimums)), \
+            index.top_n('Monetary', 20, index.clusters, minimums)
+    _timed(timings, 'page_explorer', explorer_page, repeat)
+
+    def recommendations_page():
+        search = ProductSearchIndex.from_product_info(service.product_info)
+        return [search.search(query) for query in SEARCH_QUERIES]
+    _timed(timings, 'page_recommendations', recommendations_page, repeat)
+    _timed(timings, 'page_scoring', lambda: scorer.score(customer_segments), repeat)
+    return timings
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'machine': None, 'sizes': {}}
+
+
+def save_baselines(results, path=BASELINES_PATH):
+    """Replace the baselines of the sizes in results, keeping the other sizes"""
+    baselines = load_baselines(path)
+    baselines['machine'] = machine_info()
+    baselines['sizes'].update({str(n_rows): {stage: round(seconds, 6) for stage, seconds in timings.items()}
+                               for n_rows, timings in results.items()})
+    baselines['sizes'] = dict(sorted(baselines['sizes'].items(), key=lambda item: int(item[0])))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(baselines, f, indent=2)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def machine_differences(recorded):
+    """Fields of machine_info() that differ from the machine the baselines were recorded on"""
+    current = machine_info()
+    if not recorded:
+        return list(current)
+    return [key for key, value in current.items() if recorded.get(key) != value]
+
+
+def compare(results, baselines, tolerance=TOLERANCE, min_delta=MIN_DELTA):
+    """Rows of (rows, stage, seconds, baseline seconds or None, regressed)"""
+    rows = []
+    for n_rows, timings in results.items():
+        sized = baselines['sizes'].get(str(n_rows), {})
+        for stage, seconds in timings.items():
+            baseline = sized.get(stage)
+            regressed = baseline is not None and seconds > baseline * tolerance and seconds - baseline > min_delta
+            rows.append((n_rows, stage, seconds, baseline, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default=DEFAULT_SIZES, help='Comma-separated log sizes, e.g. 10000,1000000')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the fastest counts')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Allowed slowdown versus the baseline')
+    parser.add_argument('--baselines', default=BASELINES_PATH)
+    parser.add_argument('--update-baselines', action='store_true', help='Record these timings as the baselines')
+    parser.add_argument('--output', help='Also write the timings to this JSON file')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = {}
+    for n_rows in [int(size) for size in args.rows.split(',')]:
+        start = time.perf_counter()
+        results[n_rows] = run_size(n_rows, args.repeat, args.seed)
+        print(f"{n_rows:,} rows done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    baselines = load_baselines(args.baselines)
+    rows = compare(results, baselines, args.tolerance)
+    print(f"{'rows':>12}  {'stage':<24} {'seconds':>9} {'baseline':>9} {'ratio':>6}")
+    for n_rows, stage, seconds, baseline, regressed in rows:
+        baseline_text = f"{baseline:9.4f}" if baseline is not None else f"{'-':>9}"
+        ratio_text = f"{seconds / baseline:6.2f}" if baseline else f"{'-':>6}"
+        print(f"{n_rows:>12,}  {stage:<24} {seconds:9.4f} {baseline_text} {ratio_text}"
+              + ('  REGRESSION' if regressed else ''))
+
+    if args.output:
+        if os.path.dirname(args.output):
+            os.makedirs(os.path.dirname(args.output), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'machine': machine_info(), 'repeat': args.repeat,
+                       'sizes': {str(n_rows): timings for n_rows, timings in results.items()}}, f, indent=2)
+
+    if args.update_baselines:
+        save_baselines(results, args.baselines)
+        print(f"Baselines for {', '.join(f'{n:,}' for n in results)} rows written to {args.baselines}")
+        return
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} stage(s) slower than {args.tolerance}x their baseline")
+    differences = machine_differences(baselines.get('machine'))
+    if differences:
+        print(f"Warning: baselines were recorded on another machine ({', '.join(differences)} differ); "
+              f"not failing on regressions. Record local baselines with --update-baselines", file=sys.stderr)
+    elif regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
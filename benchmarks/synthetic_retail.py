@@ -0,0 +1,131 @@
+"""Synthetic transaction log with the online_retail.csv schema
+
+    python -m benchmarks.synthetic_retail --rows 1000000 --output synthetic_retail.csv
+
+Rows are grouped into invoices of a few lines each. Customers and products
+are drawn from Zipf-like popularity curves (--skew sets the exponent; 0 is
+uniform), a share of invoices are cancellations ('C' prefix, negative
+quantities) and a share have no CustomerID, so the cleaning rules have
+work to do. Every customer shops from one country, mostly the United
+Kingdom. The same seed always gives the same log.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+RAW_COLUMNS = ['InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice', 'CustomerID',
+               'Country']
+DEFAULT_SKEW = 1.0
+LINES_PER_INVOICE = 3
+CANCEL_RATE = 0.02
+MISSING_CUSTOMER_RATE = 0.1
+START_DATE = '2022-12-01'
+DAYS = 373
+COUNTRIES = ['United Kingdom', 'Germany', 'France', 'EIRE', 'Spain', 'Netherlands', 'Belgium', 'Switzerland',
+             'Portugal', 'Australia', 'Norway', 'Italy']
+COUNTRY_WEIGHTS = [0.89, 0.027, 0.023, 0.015, 0.008, 0.007, 0.006, 0.006, 0.005, 0.005, 0.004, 0.004]
+ADJECTIVES = ['VINTAGE', 'SMALL', 'LARGE', 'JUMBO', 'RETRO', 'SET OF 3', 'PACK OF 12', 'HANGING', 'WOODEN',
+              'GLASS', 'ENAMEL', 'PAPER', 'FELTCRAFT', 'ANTIQUE', 'REGENCY', 'PARTY']
+COLOURS = ['RED', 'PINK', 'BLUE', 'GREEN', 'WHITE', 'IVORY', 'BLACK', 'SILVER', 'GOLD', 'PASTEL', 'SPOTTY',
+           'FLORAL']
+NOUNS = ['HEART', 'LANTERN', 'LUNCH BAG', 'CAKE STAND', 'TEA CUP', 'WALL CLOCK', 'CANDLE', 'BUNTING', 'DOORMAT',
+         'TRINKET BOX', 'NAPKINS', 'ALARM CLOCK', 'BAKING SET', 'SHOPPER BAG', 'PHOTO FRAME', 'CHOPSTICKS',
+         'BIRD ORNAMENT', 'WATER BOTTLE', 'NOTEBOOK', 'COAT RACK']
+
+
+def zipf_weights(n, skew):
+    """Probabilities of n ranks falling off as 1 / rank^skew (callers shuffle which id gets which rank)"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def product_catalogue(n_products, rng):
+    """StockCode, Description and list price of n_products distinct products"""
+    positions = np.arange(n_products)
+    n_combinations = len(ADJECTIVES) * len(COLOURS) * len(NOUNS)
+    descriptions = [f"{ADJECTIVES[i % len(ADJECTIVES)]} {COLOURS[i // len(ADJECTIVES) % len(COLOURS)]} "
+                    f"{NOUNS[i // (len(ADJECTIVES) * len(COLOURS)) % len(NOUNS)]}"
+                    + (f" NO {i // n_combinations + 1}" if i >= n_combinations else '')
+                    for i in positions.tolist()]
+    stock_codes = [f"{20000 + i}" if i < 80000 else f"{20000 + i % 80000}{chr(65 + i // 80000)}"
+                   for i in positions.tolist()]
+    prices = np.round(rng.lognormal(0.6, 0.8, n_products).clip(0.04, 40), 2)
+    return stock_codes, descriptions, prices
+
+
+def generate_transactions(n_rows, n_customers=None, n_products=None, skew=DEFAULT_SKEW,
+                          lines_per_invoice=LINES_PER_INVOICE, cancel_rate=CANCEL_RATE,
+                          missing_customer_rate=MISSING_CUSTOMER_RATE, seed=0):
+    """Raw transactions (RAW_COLUMNS) as read from online_retail.csv
+
+    Customers default to one per 15 rows and products to the size of the
+    real catalogue, growing slowly beyond 1M rows. StockCode, Description
+    and Country are categoricals, as the Parquet store returns them.
+    """
+    rng = np.random.default_rng(seed)
+    n_customers = n_customers or max(n_rows // 15, 10)
+    n_products = n_products or int(min(max(4000, np.sqrt(n_rows) * 4), 20000))
+    n_invoices = max(n_rows // lines_per_invoice, 1)
+
+    # Invoice-level attributes, then broadcast to their lines
+    invoice_of_row = np.sort(rng.integers(0, n_invoices, n_rows))
+    invoice_customer = rng.choice(n_customers, n_invoices, p=zipf_weights(n_customers, skew))
+    invoice_customer = rng.permutation(n_customers)[invoice_customer]
+    invoice_minutes = np.sort(rng.integers(0, DAYS * 24 * 60, n_invoices))
+    cancelled = rng.random(n_invoices) < cancel_rate
+    anonymous = rng.random(n_invoices) < missing_customer_rate
+    customer_country = rng.choice(len(COUNTRIES), n_customers, p=COUNTRY_WEIGHTS)
+
+    invoice_numbers = (536365 + np.arange(n_invoices)).astype(str).astype(object)
+    invoice_numbers[cancelled] = 'C' + invoice_numbers[cancelled]
+    customer_ids = (12346 + invoice_customer).astype(np.float64)
+    customer_ids[anonymous] = np.nan
+
+    stock_codes, descriptions, prices = product_catalogue(n_products, rng)
+    product_of_row = rng.permutation(n_products)[rng.choice(n_products, n_rows, p=zipf_weights(n_products, skew))]
+    quantity = rng.integers(1, 24, n_rows)
+    quantity[cancelled[invoice_of_row]] *= -1
+
+    return pd.DataFrame({
+        'InvoiceNo': invoice_numbers[invoice_of_row],
+        'StockCode': pd.Categorical.from_codes(product_of_row, categories=stock_codes),
+        'Description': pd.Categorical.from_codes(product_of_row, categories=descriptions),
+        'Quantity': quantity,
+        'InvoiceDate': pd.Timestamp(START_DATE) + pd.to_timedelta(invoice_minutes[invoice_of_row], unit='min'),
+        'UnitPrice': prices[product_of_row],
+        'CustomerID': customer_ids[invoice_of_row],
+        'Country': pd.Categorical.from_codes(customer_country[invoice_customer[invoice_of_row]],
+                                             categories=COUNTRIES),
+    }, columns=RAW_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--output', required=True, help='Destination .csv or .parquet file')
+    parser.add_argument('--customers', type=int, help='Distinct customers (default: rows / 15)')
+    parser.add_argument('--products', type=int, help='Distinct products (default: 4,000 up to 20,000)')
+    parser.add_argument('--skew', type=float, default=DEFAULT_SKEW, help='Zipf exponent of popularity')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    transactions = generate_transactions(args.rows, args.customers, args.products, args.skew, seed=args.seed)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    tmp_path = args.output + '.tmp'
+    if args.output.endswith('.parquet'):
+        transactions.to_parquet(tmp_path, index=False)
+    else:
+        transactions.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, args.output)
+    print(f"{len(transactions):,} rows, {transactions['InvoiceNo'].nunique():,} invoices, "
+          f"{transactions['CustomerID'].nunique():,} customers written to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Shared data, modelling and recommendation code for the Shopper Spectrum dashboard"""
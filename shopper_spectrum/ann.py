@@ -0,0 +1,176 @@
+"""Approximate nearest-neighbour search over product vectors
+
+An inverted-file (IVF) index: products are embedded with a random
+projection of their normalised customer vectors and grouped into n_lists
+clusters with spherical k-means, then the clusters are refined on the
+exact customer vectors. Every product probes its own n_probe closest
+clusters (by exact cosine to their centroids) and only scores the products
+in them, re-ranked with exact cosine similarity. Raising n_probe trades
+latency for recall; n_probe == n_lists is exact.
+"""
+import numpy as np
+from scipy import sparse
+
+from shopper_spectrum.similarity import normalize_columns, top_k_neighbours
+
+DEFAULT_N_PROBE = 16
+DEFAULT_EMBEDDING_DIM = 128
+REFINE_ITERATIONS = 3
+BLOCK_CELLS = 1 << 22
+
+
+def random_projections(vectors, n_components, seed=42, chunk_size=65536):
+    """Project sparse row vectors onto Gaussian directions, chunked over features
+
+    The projection matrix is regenerated per feature chunk from the seed, so
+    it never has to be held in memory for millions of customers.
+    """
+    n_features = vectors.shape[1]
+    vectors = vectors.tocsc()
+    projected = np.zeros((vectors.shape[0], n_components), dtype=np.float32)
+    for chunk, start in enumerate(range(0, n_features, chunk_size)):
+        stop = min(start + chunk_size, n_features)
+        rng = np.random.default_rng([seed, chunk])
+        directions = rng.standard_normal((stop - start, n_components), dtype=np.float32)
+        projected += vectors[:, start:stop] @ directions
+    return projected
+
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def spherical_kmeans(embeddings, n_clusters, n_iter=10, seed=42):
+    """Cluster unit vectors by cosine similarity; returns (centroids, labels)"""
+    rng = np.random.default_rng(seed)
+    centroids = embeddings[rng.choice(len(embeddings), n_clusters, replace=False)]
+    for _ in range(n_iter):
+        labels = np.argmax(embeddings @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, embeddings)
+        # Empty clusters keep their previous centroid
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = _unit_rows(sums)
+    return centroids, np.argmax(embeddings @ centroids.T, axis=1)
+
+
+def sparse_centroids(vectors, labels, n_clusters):
+    """Unit-length mean of each cluster's sparse rows, kept sparse (nnz at most that of vectors)"""
+    assignment = sparse.csr_matrix((np.ones(len(labels), dtype=np.float32), (labels, np.arange(len(labels)))),
+                                   shape=(n_clusters, len(labels)))
+    sums = (assignment @ vectors).tocsr()
+    norms = np.sqrt(np.asarray(sums.multiply(sums).sum(axis=1)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return (sparse.diags(inverse.astype(np.float32)) @ sums).tocsr()
+
+
+def _merge_top_k(ids, scores, k):
+    """Best k (ids, scores) per row, ties broken on the lower id; -inf marks empty slots"""
+    order = np.lexsort((ids, -scores), axis=1)[:, :k]
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+class IVFIndex:
+    """Cosine IVF index over the product columns of an interaction matrix"""
+
+    def __init__(self, n_lists=None, n_probe=DEFAULT_N_PROBE, embedding_dim=DEFAULT_EMBEDDING_DIM, seed=42,
+                 refine_iterations=REFINE_ITERATIONS):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.embedding_dim = embedding_dim
+        self.seed = seed
+        self.refine_iterations = refine_iterations
+
+    def fit(self, customer_product_matrix):
+        """Cluster the products and assign each to its closest inverted list
+
+        The projected embeddings only seed the clusters: they are too coarse
+        to pick the lists a product's neighbours sit in, so the clusters are
+        refined and products assigned on the exact vectors.
+        """
+        self.vectors = normalize_columns(customer_product_matrix).T.tocsr()
+        n_products = self.vectors.shape[0]
+        embeddings = _unit_rows(random_projections(self.vectors, self.embedding_dim, seed=self.seed))
+
+        # sqrt(n) lists keeps both the centroid scan and each list around sqrt(n) long
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_products)))
+        self.n_lists = min(n_lists, n_products)
+        _, labels = spherical_kmeans(embeddings, self.n_lists, seed=self.seed)
+        self.centroids = sparse_centroids(self.vectors, labels, self.n_lists)
+        for _ in range(self.refine_iterations):
+            labels = np.asarray((self.vectors @ self.centroids.T).argmax(axis=1)).ravel()
+            self.centroids = sparse_centroids(self.vectors, labels, self.n_lists)
+
+        # Products sorted by list so each inverted list is a contiguous slice
+        self.order = np.argsort(labels, kind='stable')
+        self.offsets = np.searchsorted(labels[self.order], np.arange(self.n_lists + 1))
+        return self
+
+    def probe_lists(self, vectors, n_probe=None):
+        """The n_probe closest lists for each (sparse, unit) product vector"""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        centroid_scores = (vectors @ self.centroids.T).toarray()
+        return np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+    def candidates(self, product_idx, n_probe=None):
+        """Indices of products in the lists probed for product_idx"""
+        lists = self.probe_lists(self.vectors[product_idx:product_idx + 1], n_probe)[0]
+        found = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        return found[found != product_idx]
+
+    def query(self, product_idx, k, n_probe=None):
+        """Approximate top-k (indices, scores) for one product, exact cosine on candidates"""
+        candidates = self.candidates(product_idx, n_probe)
+        if len(candidates) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        scores = (self.vectors[candidates] @ self.vectors[product_idx].T).toarray().ravel()
+        top, top_scores = top_k_neighbours(scores[None, :].astype(np.float32), min(k, len(candidates)))
+        return candidates[top[0]].astype(np.int32), top_scores[0]
+
+    def build_neighbours(self, k, n_probe=None, block_cells=BLOCK_CELLS):
+        """Approximate top-k table for every product, padded with -1 / 0 where lists run dry
+
+        Every product probes its own lists. The work is still done one
+        inverted list at a time: all products probing a list are scored
+        against its members with a blocked sparse product (at most
+        block_cells dense scores at once) and merged into their running top-k.
+        """
+        n_products = self.vectors.shape[0]
+        neighbours = np.full((n_products, k), -1, dtype=np.int32)
+        scores = np.full((n_products, k), -np.inf, dtype=np.float32)
+        probes = np.concatenate([self.probe_lists(self.vectors[start:start + 4096], n_probe)
+                                 for start in range(0, n_products, 4096)])
+        # Products grouped by probed list, like the inverted lists themselves
+        probed_lists = probes.ravel()
+        probe_order = np.argsort(probed_lists, kind='stable')
+        probers = (probe_order // probes.shape[1]).astype(np.int64)
+        probe_offsets = np.searchsorted(probed_lists[probe_order], np.arange(self.n_lists + 1))
+        for list_idx in range(self.n_lists):
+            members = self.order[self.offsets[list_idx]:self.offsets[list_idx + 1]]
+            queries = probers[probe_offsets[list_idx]:probe_offsets[list_idx + 1]]
+            if len(members) == 0 or len(queries) == 0:
+                continue
+            member_vectors = self.vectors[members].T.tocsc()
+            rows = max(1, block_cells // len(members))
+            for start in range(0, len(queries), rows):
+                block_queries = queries[start:start + rows]
+                block = (self.vectors[block_queries] @ member_vectors).toarray()
+                # Mask each product's own column so it is never its own neighbour
+                block[members[None, :] == block_queries[:, None]] = -np.inf
+                found, found_scores = top_k_neighbours(block, min(k, len(members)))
+                neighbours[block_queries], scores[block_queries] = _merge_top_k(
+                    np.hstack([neighbours[block_queries], members[found].astype(np.int32)]),
+                    np.hstack([scores[block_queries], found_scores]), k)
+        empty = ~np.isfinite(scores)
+        neighbours[empty] = -1
+        scores[empty] = 0
+        return neighbours, scores
+
+
+def recall_at_k(approximate, exact):
+    """Mean fraction of the exact top-k neighbours recovered by the approximate index"""
+    k = exact.shape[1]
+    hits = [len(np.intersect1d(a[a >= 0], e)) for a, e in zip(approximate[:, :k], exact)]
+    return float(np.mean(hits)) / k
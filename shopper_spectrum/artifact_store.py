@@ -0,0 +1,200 @@
+"""Typed columnar storage for the datasets exported by the notebook
+
+Datasets are stored as Parquet under artifacts/datasets/ with native
+timestamps and dictionary-encoded (categorical) string columns, so loads
+skip CSV parsing and can read just the columns a page renders. When a
+Parquet file is missing the CSV in 'Generated CSV files' is read instead
+and converted once, so existing exports keep working.
+
+Numeric columns are narrowed by name wherever they appear: ids, counts and
+calendar fields become the smallest integer type that holds them
+(CustomerID is an int32 rather than a float like 12347.0) and per-row or
+per-customer measures become float32. Money totals that are summed again
+(Monetary, TotalAmount, Revenue, Total_Revenue) stay float64 so headline
+figures keep their cents.
+
+    python -m shopper_spectrum.artifact_store
+
+reports each dataset's memory with default CSV dtypes and with the schema.
+"""
+import argparse
+import os
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+CSV_DIR = 'Generated CSV files'
+PARQUET_DIR = os.path.join('artifacts', 'datasets')
+
+# Per dataset: timestamp columns and low-cardinality strings to dictionary-encode
+SCHEMAS = {
+    'customer_segments': {'dates': [], 'categories': ['Country', 'RFM_Score']},
+    'customer_features': {'dates': ['First_Purchase', 'Last_Purchase'], 'categories': ['Country', 'RFM_Score']},
+    'cluster_characteristics': {'dates': [], 'categories': []},
+    'product_analysis': {'dates': [], 'categories': ['StockCode', 'Description']},
+    'geographical_analysis': {'dates': [], 'categories': ['Country']},
+    'time_analysis': {'dates': ['Date'], 'categories': []},
+    'transaction_summary': {'dates': ['InvoiceDate'], 'categories': ['Country']},
+    'time_cube': {'dates': ['Date'], 'categories': ['Country']},
+    'time_cube_customers': {'dates': ['Month'], 'categories': ['Country']},
+    'retail_data_sample': {
+        'dates': ['InvoiceDate'],
+        'categories': ['InvoiceNo', 'StockCode', 'Description', 'Country', 'MonthName', 'DayName'],
+    },
+}
+
+
+# Integer columns and the narrowest type that holds them; values that do not fit are left as they are
+INTEGER_DTYPES = {
+    'CustomerID': 'int32', 'InvoiceNo': 'int32', 'Cluster': 'int8',
+    'Year': 'int16', 'Month': 'int8', 'Day': 'int8', 'Hour': 'int8', 'DayOfWeek': 'int8',
+    'Recency': 'int16', 'Customer_Lifetime': 'int16', 'Frequency': 'int32', 'Unique_Products': 'int32',
+    'R_Score': 'int8', 'F_Score': 'int8', 'M_Score': 'int8', 'RFM_Score_Numeric': 'int8',
+    'Quantity': 'int32', 'Total_Quantity': 'int32', 'Total_Orders': 'int32', 'Unique_Customers': 'int32',
+    'Orders': 'int32', 'Customers': 'int32',
+}
+FLOAT32_COLUMNS = ('UnitPrice', 'Avg_Price', 'Avg_Order_Value', 'Order_Value_Std', 'Avg_Quantity_Per_Order',
+                   'Avg_Unit_Price', 'CLV_Estimate', 'Revenue_Per_Customer')
+
+
+def narrow_column(series, dtype):
+    """series as dtype if every value survives the cast, otherwise unchanged
+
+    Categoricals, columns with missing values (e.g. raw CustomerIDs) and
+    non-integral floats are never turned into integers.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) or not is_numeric_dtype(series) or series.dtype == dtype:
+        return series
+    if np.dtype(dtype).kind == 'f':
+        return series.astype(dtype)
+    values = series.to_numpy()
+    if series.isna().any() or (values.dtype.kind == 'f' and not np.array_equal(values, np.floor(values))):
+        return series
+    limits = np.iinfo(dtype)
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        return series
+    return series.astype(dtype)
+
+
+def compact_dtypes(frame):
+    """Narrow the numeric columns named in INTEGER_DTYPES and FLOAT32_COLUMNS in place"""
+    for column, dtype in INTEGER_DTYPES.items():
+        if column in frame.columns:
+            frame[column] = narrow_column(frame[column], dtype)
+    for column in FLOAT32_COLUMNS:
+        if column in frame.columns:
+            frame[column] = narrow_column(frame[column], 'float32')
+    return frame
+
+
+def memory_mb(frame):
+    """Memory held by a frame's columns, including string and category contents"""
+    return frame.memory_usage(deep=True).sum() / 2**20
+
+
+def csv_path(name):
+    return os.path.join(CSV_DIR, f'{name}.csv')
+
+
+def parquet_path(name):
+    return os.path.join(PARQUET_DIR, f'{name}.parquet')
+
+
+def apply_schema(name, frame):
+    """Parse timestamps, dictionary-encode string columns and narrow numeric ones in place"""
+    schema = SCHEMAS[name]
+    for column in schema['dates']:
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column])
+    for column in schema['categories']:
+        if column in frame.columns and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+            # str() keeps mixed-type codes uniform; missing values stay missing rather than becoming 'nan'
+            values = frame[column]
+            frame[column] = values.astype(str).where(values.notna()).astype('category')
+    return compact_dtypes(frame)
+
+
+@contextmanager
+def replacing(path):
+    """Yield a private temporary path beside path, moved over path once the block completes
+
+    The name is unique per writer, so processes publishing the same file
+    at once never write into or move each other's temporary file. It is
+    removed if the block fails.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=f'.{os.path.basename(path)}.',
+                                    suffix='.tmp')
+    os.close(fd)
+    # mkstemp creates the file owner-only; published files are read by other workers
+    os.chmod(tmp_path, 0o644)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_dataset(name, frame, csv_copy=False):
+    """Store a dataset as typed Parquet (CSV when pyarrow is unavailable)"""
+    frame = apply_schema(name, frame.reset_index(drop=True).copy())
+    # CSV first, so the Parquet file is never older than its CSV copy
+    if csv_copy or not HAS_PARQUET:
+        os.makedirs(CSV_DIR, exist_ok=True)
+        frame.to_csv(csv_path(name), index=False)
+    if HAS_PARQUET:
+        os.makedirs(PARQUET_DIR, exist_ok=True)
+        with replacing(parquet_path(name)) as tmp_path:
+            frame.to_parquet(tmp_path, index=False)
+
+
+def read_dataset(name, columns=None):
+    """Load a dataset, reading only the requested columns where the format allows it
+
+    Raises FileNotFoundError if the dataset has never been exported.
+    """
+    if HAS_PARQUET and os.path.exists(parquet_path(name)):
+        # Stale if the CSV was replaced by hand after the conversion
+        csv_is_newer = (os.path.exists(csv_path(name))
+                        and os.path.getmtime(csv_path(name)) > os.path.getmtime(parquet_path(name)))
+        if not csv_is_newer:
+            # Files written before a schema change are narrowed on read; current ones are already compact
+            return compact_dtypes(pd.read_parquet(parquet_path(name), columns=columns))
+
+    frame = apply_schema(name, pd.read_csv(csv_path(name)))
+    if HAS_PARQUET:
+        # Convert once so later cold starts skip CSV parsing
+        write_dataset(name, frame)
+    return frame[columns] if columns is not None else frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    print(f"{'dataset':<26} {'rows':>9} {'default MB':>11} {'schema MB':>10} {'ratio':>6}")
+    totals = [0.0, 0.0]
+    for name in SCHEMAS:
+        if not os.path.exists(csv_path(name)):
+            continue
+        default = memory_mb(pd.read_csv(csv_path(name)))
+        frame = read_dataset(name)
+        compact = memory_mb(frame)
+        totals[0] += default
+        totals[1] += compact
+        print(f"{name:<26} {len(frame):>9,} {default:>11.2f} {compact:>10.2f} {default / compact:>5.1f}x")
+    print(f"{'total':<26} {'':>9} {totals[0]:>11.2f} {totals[1]:>10.2f} {totals[0] / max(totals[1], 1e-9):>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
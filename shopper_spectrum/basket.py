@@ -0,0 +1,191 @@
+"""Frequent itemsets and association rules over invoice baskets
+
+    python -m shopper_spectrum.basket --output artifacts/basket_rules.parquet --min-support 0.001
+
+Invoices are turned into a binary invoice x product sparse matrix and
+mined level by level (Apriori). At every level the invoices are split into
+row chunks that a process pool counts independently: the invoices holding
+each frequent (k-1)-itemset form a sparse indicator matrix, and one sparse
+product with the chunk gives the counts of all its one-item extensions.
+Counts are additive over chunks, so memory is bounded by the chunk size
+and the number of frequent itemsets, not by the number of invoices.
+Rules have a single consequent and are scored by support, confidence and
+lift.
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from shopper_spectrum.artifact_store import read_dataset
+from shopper_spectrum.interactions import build_interaction_matrix
+
+MIN_SUPPORT = 0.001
+MIN_CONFIDENCE = 0.2
+MIN_LIFT = 1.0
+MAX_LENGTH = 3
+CHUNK_SIZE = 50_000
+BASKET_COLUMNS = ['InvoiceNo', 'Description', 'Quantity']
+RULE_COLUMNS = ['Antecedent', 'Consequent', 'Antecedent_Size', 'Count', 'Support', 'Confidence', 'Lift']
+
+
+def basket_matrix(transactions, invoice_col='InvoiceNo', item_col='Description'):
+    """Binary invoice x product InteractionMatrix (returns and cancellations excluded)"""
+    baskets = transactions[transactions['Quantity'] > 0] if 'Quantity' in transactions else transactions
+    return build_interaction_matrix(baskets, customer_col=invoice_col, item_col=item_col,
+                                    value_col='Quantity', weighting='binary')
+
+
+def _count_extensions(chunk, itemsets):
+    """Counts of every itemset + one later item in a CSC chunk, as (itemset row, item, count) arrays"""
+    if itemsets is None:
+        counts = np.asarray(chunk.sum(axis=0)).ravel()
+        return None, np.arange(len(counts)), counts
+    indicator = chunk[:, itemsets[:, 0]]
+    for column in range(1, itemsets.shape[1]):
+        indicator = indicator.multiply(chunk[:, itemsets[:, column]])
+    counts = (sparse.csr_matrix(indicator).T @ chunk).tocoo()
+    # Only extend with items after the itemset's last one, so every itemset is counted once
+    keep = counts.col > itemsets[counts.row, -1]
+    return counts.row[keep], counts.col[keep], counts.data[keep]
+
+
+def _count_extensions_star(args):
+    return _count_extensions(*args)
+
+
+def _count_level(chunks, itemsets, n_items, pool):
+    tasks = [(chunk, itemsets) for chunk in chunks]
+    results = pool.map(_count_extensions_star, tasks) if pool is not None else map(_count_extensions_star, tasks)
+    n_rows = 1 if itemsets is None else len(itemsets)
+    total = sparse.csr_matrix((n_rows, n_items), dtype=np.int64)
+    for rows, cols, counts in results:
+        rows = np.zeros(len(cols), dtype=np.int64) if rows is None else rows
+        total = total + sparse.csr_matrix((counts.astype(np.int64), (rows, cols)), shape=(n_rows, n_items))
+    return total.tocoo()
+
+
+def frequent_itemsets(baskets, min_support=MIN_SUPPORT, max_length=MAX_LENGTH, chunk_size=CHUNK_SIZE,
+                      n_jobs=None):
+    """{itemset (tuple of product positions): invoice count} for every itemset meeting min_support"""
+    matrix = sparse.csr_matrix(baskets.matrix)
+    n_invoices, n_items = matrix.shape
+    min_count = max(1, math.ceil(min_support * n_invoices))
+    chunks = [sparse.csc_matrix(matrix[start:start + chunk_size]) for start in range(0, n_invoices, chunk_size)]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(chunks), 1))
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        counts = _count_level(chunks, None, n_items, pool)
+        items = counts.col[counts.data >= min_count]
+        supports = {(item,): int(count) for item, count in zip(counts.col.tolist(), counts.data.tolist())
+                    if count >= min_count}
+        # Apriori: only frequent items can extend an itemset, so drop every other column once
+        chunks = [chunk[:, items] for chunk in chunks]
+        itemsets = np.arange(len(items))[:, None]
+        for length in range(2, max_length + 1):
+            if not len(itemsets):
+                break
+            counts = _count_level(chunks, itemsets, len(items), pool)
+            frequent = counts.data >= min_count
+            candidates = np.column_stack([itemsets[counts.row[frequent]], counts.col[frequent]])
+            found = []
+            for itemset, count in zip(map(tuple, candidates.tolist()), counts.data[frequent].tolist()):
+                original = tuple(items[list(itemset)].tolist())
+                # ...and every (k-1)-subset of a frequent itemset is frequent as well
+                if length > 2 and any(subset not in supports for subset in combinations(original, length - 1)):
+                    continue
+                supports[original] = int(count)
+                found.append(itemset)
+            itemsets = np.array(sorted(found), dtype=np.int64).reshape(-1, length)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return supports, n_invoices
+
+
+def association_rules(supports, n_invoices, products, min_confidence=MIN_CONFIDENCE, min_lift=MIN_LIFT):
+    """Single-consequent rules from the frequent itemsets, strongest lift first
+
+    Antecedent holds a tuple of product names; format_rules joins them for display.
+    """
+    records = []
+    for itemset, count in supports.items():
+        if len(itemset) < 2:
+            continue
+        for consequent in itemset:
+            antecedent = tuple(item for item in itemset if item != consequent)
+            confidence = count / supports[antecedent]
+            lift = confidence / (supports[(consequent,)] / n_invoices)
+            if confidence >= min_confidence and lift >= min_lift:
+                records.append((antecedent, consequent, count, confidence, lift))
+    if not records:
+        return pd.DataFrame(columns=RULE_COLUMNS)
+
+    antecedents, consequents, counts, confidence, lift = zip(*records)
+    products = np.asarray(products, dtype=object)
+    rules = pd.DataFrame({
+        'Antecedent': [tuple(products[list(antecedent)]) for antecedent in antecedents],
+        'Consequent': products[list(consequents)],
+        'Antecedent_Size': np.array([len(antecedent) for antecedent in antecedents], dtype=np.int8),
+        'Count': np.array(counts, dtype=np.int64),
+        'Support': np.array(counts) / n_invoices,
+        'Confidence': np.array(confidence),
+        'Lift': np.array(lift),
+    })
+    return rules.sort_values(['Lift', 'Confidence', 'Count'], ascending=False, ignore_index=True)
+
+
+def format_rules(rules):
+    """Rules with each antecedent tuple joined into one readable string, for display and CSV only
+
+    Product names can themselves contain ' + ', so filter on the tuples
+    (e.g. a membership test) before formatting, never on the strings.
+    """
+    return rules.assign(Antecedent=rules['Antecedent'].map(' + '.join))
+
+
+def mine_rules(transactions, min_support=MIN_SUPPORT, min_confidence=MIN_CONFIDENCE, min_lift=MIN_LIFT,
+               max_length=MAX_LENGTH, chunk_size=CHUNK_SIZE, n_jobs=None):
+    """Association rules straight from transaction rows"""
+    baskets = basket_matrix(transactions)
+    supports, n_invoices = frequent_itemsets(baskets, min_support, max_length, chunk_size, n_jobs)
+    return association_rules(supports, n_invoices, baskets.products, min_confidence, min_lift)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='Destination .parquet or .csv file')
+    parser.add_argument('--data', default='retail_data_sample', help='Transactions dataset name')
+    parser.add_argument('--min-support', type=float, default=MIN_SUPPORT, help='Share of invoices')
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE)
+    parser.add_argument('--min-lift', type=float, default=MIN_LIFT)
+    parser.add_argument('--max-length', type=int, default=MAX_LENGTH, help='Largest itemset size')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Invoices per counting task')
+    parser.add_argument('--jobs', type=int, help='Worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    transactions = read_dataset(args.data, columns=BASKET_COLUMNS)
+    rules = mine_rules(transactions, args.min_support, args.min_confidence, args.min_lift, args.max_length,
+                       args.chunk_size, args.jobs)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    tmp_path = args.output + '.tmp'
+    if args.output.endswith('.parquet'):
+        rules.to_parquet(tmp_path, index=False)
+    else:
+        format_rules(rules).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, args.output)
+    print(f"{len(rules):,} rules from {transactions['InvoiceNo'].nunique():,} invoices written to {args.output} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
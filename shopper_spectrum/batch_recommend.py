@@ -0,0 +1,160 @@
+"""Nightly "customers who bought X also bought" recommendations for many products at once
+
+    python -m shopper_spectrum.batch_recommend --output artifacts/recommendations.parquet --k 10
+
+Products are split into chunks that are scored in a process pool. Within a
+chunk the cosine similarities are computed as blocked sparse products, so
+only a block_size x n_products slice is ever dense, whatever the catalogue
+size. Chunks are written to the output as they finish, in product order,
+so the full result never has to fit in memory. Scores are the same as
+get_product_recommendations on the Product Recommendations page (exact
+cosine over the same interaction matrix); only products tied on score at
+the top-k cut-off may be picked differently.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.artifact_store import HAS_PARQUET
+from shopper_spectrum.interactions import WEIGHTINGS
+from shopper_spectrum.shared_store import shared_interaction_matrix
+from shopper_spectrum.similarity import normalize_columns, top_k_neighbours
+
+if HAS_PARQUET:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+DEFAULT_K = 10
+CHUNK_SIZE = 2048
+BLOCK_SIZE = 256
+OUTPUT_COLUMNS = ['Product', 'Rank', 'Recommended_Product', 'Similarity_Score']
+
+# Set once per worker process by _init_worker
+_NORMALIZED = None
+_PRODUCT_VECTORS = None
+
+
+def _init_worker(normalized):
+    global _NORMALIZED, _PRODUCT_VECTORS
+    _NORMALIZED = normalized
+    _PRODUCT_VECTORS = normalized.T.tocsr()
+
+
+def _score_chunk(positions, k, block_size=BLOCK_SIZE):
+    neighbours = np.zeros((len(positions), k), dtype=np.int32)
+    scores = np.zeros((len(positions), k), dtype=np.float32)
+    for start in range(0, len(positions), block_size):
+        block_positions = positions[start:start + block_size]
+        block = (_PRODUCT_VECTORS[block_positions] @ _NORMALIZED).toarray()
+        block_neighbours, block_scores = top_k_neighbours(block, k, exclude=block_positions)
+        neighbours[start:start + len(block_positions)] = block_neighbours
+        scores[start:start + len(block_positions)] = block_scores
+    return positions, neighbours, scores
+
+
+def _score_chunk_star(args):
+    return _score_chunk(*args)
+
+
+def product_positions(interactions, products=None):
+    """Columns of the requested products (all of them by default); unknown names raise ValueError"""
+    if products is None:
+        return np.arange(interactions.shape[1])
+    positions = interactions.product_index.get_indexer(list(products))
+    missing = [product for product, position in zip(products, positions) if position < 0]
+    if missing:
+        raise ValueError(f"{len(missing)} product(s) not in the interaction data, e.g. {missing[:5]}")
+    return positions
+
+
+def batch_recommendations(interactions, products=None, k=DEFAULT_K, chunk_size=CHUNK_SIZE, block_size=BLOCK_SIZE,
+                          n_jobs=None):
+    """Yield one long-format DataFrame (OUTPUT_COLUMNS) per chunk of products, in input order"""
+    positions = product_positions(interactions, products)
+    k = max(1, min(k, interactions.shape[1] - 1))
+    normalized = normalize_columns(interactions.matrix)
+    chunks = [(positions[start:start + chunk_size], k, block_size) for start in range(0, len(positions), chunk_size)]
+    names = np.asarray(interactions.products, dtype=object)
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(chunks), 1))
+    if n_jobs == 1:
+        _init_worker(normalized)
+        results = map(_score_chunk_star, chunks)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(normalized,))
+        results = pool.map(_score_chunk_star, chunks)
+    try:
+        for chunk_positions, neighbours, scores in results:
+            yield pd.DataFrame({
+                'Product': np.repeat(names[chunk_positions], k),
+                'Rank': np.tile(np.arange(1, k + 1, dtype=np.int16), len(chunk_positions)),
+                'Recommended_Product': names[neighbours.ravel()],
+                'Similarity_Score': scores.ravel(),
+            })
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def write_recommendations(chunks, path):
+    """Stream chunks to a .parquet or .csv file (by extension), swapped in once complete; returns rows written"""
+    use_parquet = path.endswith('.parquet')
+    if use_parquet and not HAS_PARQUET:
+        raise ValueError('Writing Parquet needs pyarrow; use a .csv output instead')
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path, rows, writer = path + '.tmp', 0, None
+    try:
+        for chunk in chunks:
+            if use_parquet:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(tmp_path, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(tmp_path, mode='w' if rows == 0 else 'a', header=rows == 0, index=False)
+            rows += len(chunk)
+        if use_parquet and writer is None:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_parquet(tmp_path, index=False)
+        elif not use_parquet and rows == 0:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(tmp_path, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='Destination .parquet or .csv file')
+    parser.add_argument('--data', default='retail_data_sample', help='Transactions dataset name')
+    parser.add_argument('--products-file', help='Products to score, one description per line (default: all)')
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help='Recommendations per product')
+    parser.add_argument('--weighting', choices=WEIGHTINGS, default='quantity')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Products per pool task')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='Products per dense similarity block')
+    parser.add_argument('--jobs', type=int, help='Worker processes (default: all cores)')
+    args = parser.parse_args()
+
+    products = None
+    if args.products_file:
+        with open(args.products_file, encoding='utf-8') as f:
+            products = [line.rstrip('\n') for line in f if line.strip()]
+
+    start = time.perf_counter()
+    interactions = shared_interaction_matrix(args.data, weighting=args.weighting)
+    chunks = batch_recommendations(interactions, products, k=args.k, chunk_size=args.chunk_size,
+                                   block_size=args.block_size, n_jobs=args.jobs)
+    rows = write_recommendations(chunks, args.output)
+    print(f"{rows:,} recommendations for {rows // max(min(args.k, interactions.shape[1] - 1), 1):,} products "
+          f"written to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Filter index behind the Customer Explorer page
+
+Customers are partitioned by cluster. Inside each partition every range
+column (Monetary, Frequency) is presorted, so a 'column >= minimum'
+predicate is a binary search giving a suffix of row positions; only the
+shortest suffix is scanned for the remaining predicates. For every sort key
+each partition also keeps its rows in descending order, so the top N
+customers are found by walking that order until N rows pass the filters.
+The value histogram is binned over the selected rows' own range, so a
+narrow filter still spreads over every bin.
+"""
+import numpy as np
+import pandas as pd
+
+RANGE_COLUMNS = ('Monetary', 'Frequency')
+SORT_KEYS = ('Monetary', 'CLV_Estimate', 'Frequency', 'Recency')
+HISTOGRAM_BINS = 30
+
+
+def _bin_edges(values, n_bins):
+    low, high = values.min(), values.max()
+    return np.linspace(low, high if high > low else low + 1, n_bins + 1)
+
+
+class CustomerIndex:
+    """Cluster partitions with presorted range columns and per-key top-N orders"""
+
+    def __init__(self, customers, cluster_col='Cluster', range_cols=RANGE_COLUMNS, sort_keys=SORT_KEYS,
+                 histogram_col='Monetary', histogram_bins=HISTOGRAM_BINS):
+        self.customers = customers
+        self.range_cols = list(range_cols)
+        self.values = {col: customers[col].to_numpy(dtype=np.float64)
+                       for col in dict.fromkeys(self.range_cols + list(sort_keys) + [histogram_col])}
+        cluster_values = customers[cluster_col].to_numpy()
+        self.clusters = np.unique(cluster_values).tolist()
+
+        self.sorted_positions, self.sorted_values, self.top_orders = {}, {}, {}
+        for cluster in self.clusters:
+            members = np.flatnonzero(cluster_values == cluster)
+            for col in self.range_cols:
+                order = members[np.argsort(self.values[col][members], kind='stable')]
+                self.sorted_positions[cluster, col] = order
+                self.sorted_values[cluster, col] = self.values[col][order]
+            for key in sort_keys:
+                keyed = members[~np.isnan(self.values[key][members])]
+                # Stable on the negated key, so ties keep row order exactly like DataFrame.nlargest
+                self.top_orders[cluster, key] = keyed[np.argsort(-self.values[key][keyed], kind='stable')]
+
+        self.cluster_codes = np.searchsorted(self.clusters, cluster_values)
+        self.histogram_col = histogram_col
+        self.histogram_bins = histogram_bins
+
+    def __len__(self):
+        return len(self.customers)
+
+    def maximum(self, col):
+        return np.nanmax(self.values[col])
+
+    def _passes(self, positions, minimums, skip=None):
+        keep = np.ones(len(positions), dtype=bool)
+        for col, minimum in minimums.items():
+            if col != skip:
+                keep &= self.values[col][positions] >= minimum
+        return positions[keep]
+
+    def _shortest_suffix(self, cluster, minimums):
+        """Binary search per range column; returns the column with the fewest candidate rows and them"""
+        suffixes = {col: self.sorted_positions[cluster, col][
+            np.searchsorted(self.sorted_values[cluster, col], minimum, side='left'):]
+            for col, minimum in minimums.items()}
+        if not suffixes:
+            return None, self.sorted_positions[cluster, self.range_cols[0]]
+        col = min(suffixes, key=lambda name: len(suffixes[name]))
+        return col, suffixes[col]
+
+    def select(self, clusters, minimums):
+        """Row positions in the given clusters with every minimums[col] <= col"""
+        selected = []
+        for cluster in clusters:
+            if cluster in self.clusters:
+                col, suffix = self._shortest_suffix(cluster, minimums)
+                selected.append(self._passes(suffix, minimums, skip=col))
+        if not selected:
+            return np.array([], dtype=np.int64)
+        return np.concatenate(selected)
+
+    def top_n(self, key, n, clusters, minimums):
+        """Positions of the n largest key values among the filtered rows, in nlargest order"""
+        values = self.values[key]
+        candidates = []
+        for cluster in clusters:
+            if cluster not in self.clusters:
+                continue
+            col, suffix = self._shortest_suffix(cluster, minimums)
+            order = self.top_orders[cluster, key]
+            found, found_count, chunk, start = [], 0, max(4 * n, 1024), 0
+            # Walk the presorted order, but never scan more rows than the filtered suffix holds
+            while found_count < n and start < min(len(order), len(suffix)):
+                found.append(self._passes(order[start:start + chunk], minimums))
+                found_count += len(found[-1])
+                start += chunk
+                chunk *= 4
+            if found_count >= n or start >= len(order):
+                candidates.append(np.concatenate(found)[:n] if found else order[:0])
+            else:
+                # Few rows pass in this cluster: rank the filtered suffix directly
+                filtered = self._passes(suffix, minimums, skip=col)
+                filtered = filtered[~np.isnan(values[filtered])]
+                candidates.append(filtered[np.lexsort((filtered, -values[filtered]))][:n])
+        if not candidates:
+            return np.array([], dtype=np.int64)
+        candidates = np.concatenate(candidates)
+        # Largest key first, ties by row position
+        ranked = np.lexsort((candidates, -values[candidates]))
+        return candidates[ranked[:n]]
+
+    def histogram(self, positions):
+        """Counts of the selected rows over histogram_bins equal bins spanning their own range"""
+        values = self.values[self.histogram_col][positions]
+        values = values[~np.isnan(values)]
+        if len(values):
+            edges = _bin_edges(values, self.histogram_bins)
+            counts, _ = np.histogram(values, bins=edges)
+        else:
+            edges, counts = np.zeros(1), np.zeros(0, dtype=np.int64)
+        return pd.DataFrame({'Bin_Start': edges[:-1], 'Bin_End': edges[1:],
+                             self.histogram_col: (edges[:-1] + edges[1:]) / 2, 'Customers': counts})
@@ -0,0 +1,70 @@
+"""Server-side reduction of chart data before it is sent to the browser
+
+Scatter charts above the point budget are downsampled: the top rows by the
+given value columns and the most extreme rows (largest robust z-score) are
+always kept, and the rest of the budget is spread over the strata (e.g.
+clusters) in proportion to their size, so small segments stay visible.
+Histograms are binned here and drawn as bars, so their payload is one row
+per bin whatever the number of values.
+"""
+import numpy as np
+import pandas as pd
+
+POINT_BUDGET = 5000
+TOP_N = 20
+# Share of the budget reserved for outliers
+OUTLIER_SHARE = 0.05
+
+
+def outlier_positions(values, n):
+    """Positions of the n rows with the largest robust z-score (|x - median| / IQR) in any column"""
+    values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+    q1, median, q3 = np.nanpercentile(values, [25, 50, 75], axis=0)
+    iqr = np.where(q3 > q1, q3 - q1, 1.0)
+    scores = np.nan_to_num(np.abs(values - median) / iqr).max(axis=1)
+    n = min(n, len(scores))
+    return np.argpartition(-scores, n - 1)[:n] if n else np.array([], dtype=np.int64)
+
+
+def stratified_sample(strata, budget, keep=None, seed=0):
+    """Sorted positions: every keep position plus a per-stratum proportional random sample up to budget"""
+    strata = np.asarray(strata)
+    keep = np.unique(keep) if keep is not None and len(keep) else np.array([], dtype=np.int64)
+    if len(strata) <= budget:
+        return np.arange(len(strata))
+
+    rng = np.random.default_rng(seed)
+    available = np.ones(len(strata), dtype=bool)
+    available[keep] = False
+    codes, labels = pd.factorize(strata)
+    sizes = np.bincount(codes[available], minlength=len(labels))
+    remaining = max(budget - len(keep), 0)
+    # Proportional quotas, but at least one point for every non-empty stratum
+    quotas = np.minimum(sizes, np.maximum(np.floor(remaining * sizes / max(sizes.sum(), 1)), sizes > 0))
+
+    sampled = [keep]
+    for code in np.flatnonzero(quotas):
+        members = np.flatnonzero(available & (codes == code))
+        sampled.append(rng.choice(members, int(quotas[code]), replace=False))
+    return np.sort(np.concatenate(sampled)).astype(np.int64)
+
+
+def downsample_points(frame, budget=POINT_BUDGET, stratify=None, keep_top=(), outlier_cols=(), n_top=TOP_N,
+                      seed=0):
+    """At most about budget rows of frame for a scatter chart, keeping top and outlier rows"""
+    if len(frame) <= budget:
+        return frame
+    keep = [frame[col].reset_index(drop=True).nlargest(n_top).index.to_numpy() for col in keep_top]
+    if outlier_cols:
+        keep.append(outlier_positions(frame[list(outlier_cols)].to_numpy(), int(budget * OUTLIER_SHARE)))
+    strata = frame[stratify].to_numpy() if stratify else np.zeros(len(frame), dtype=np.int8)
+    keep = np.concatenate(keep) if keep else None
+    return frame.iloc[stratified_sample(strata, budget, keep, seed)]
+
+
+def histogram_bins(values, nbins=30):
+    """One row per bin (start, end, centre, count) for drawing a histogram as bars"""
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=nbins)
+    return pd.DataFrame({'Bin_Start': edges[:-1], 'Bin_End': edges[1:], 'Bin_Centre': (edges[:-1] + edges[1:]) / 2,
+                         'Count': counts})
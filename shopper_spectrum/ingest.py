@@ -0,0 +1,309 @@
+"""Out-of-core ingestion of the raw transaction log
+
+    python -m shopper_spectrum.ingest online_retail.csv --chunksize 200000
+
+The raw CSV is read in chunks; each chunk is cleaned with the pipeline's
+rules and folded into mergeable partial aggregates (customer RFM state plus
+product, country and hourly stats). Sums are kept in memory per key. The
+distinct pairs behind every nunique statistic (product-invoice,
+country-customer, ...) grow with the file, so once more than SPILL_ROWS
+of them are buffered they are appended to disk in hash partitions of
+their key and deduplicated one partition at a time at the end. Peak
+memory therefore follows the chunk size, the number of distinct keys,
+the spill budget and one spill partition, plus the final RFM state, which
+keeps every distinct (customer, invoice) and (customer, product) pair so
+that 'pipeline update' stays exact.
+
+The IQR outlier fences need the quartiles of every TotalAmount before
+anything is filtered. A first pass counts distinct amounts (there are far
+fewer distinct amounts than rows), from which the quartiles are exact.
+"""
+import argparse
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.artifact_store import write_dataset
+from shopper_spectrum.pipeline import (
+    RAW_DTYPES, STATE_DIR, RFMState, add_clv_estimate, add_rfm_scores, apply_cleaning_rules,
+    remove_amount_outliers, sort_by_revenue,
+)
+from shopper_spectrum.sql_store import build_from_raw, store_path
+
+DEFAULT_CHUNKSIZE = 200_000
+# Pending chunk partials are merged into the running total this often
+MERGE_EVERY = 8
+# Distinct pairs held in memory before they are spilled, and the hash partitions they are spilled to
+SPILL_ROWS = 5_000_000
+SPILL_PARTITIONS = 32
+
+
+def read_raw_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    return pd.read_csv(path, dtype=RAW_DTYPES, chunksize=chunksize)
+
+
+def weighted_quantile(value_counts, q):
+    """pandas' default (linear) quantile computed from a value -> count table"""
+    value_counts = value_counts.sort_index()
+    cumulative = value_counts.cumsum().to_numpy()
+    position = q * (cumulative[-1] - 1)
+    lower, upper = int(np.floor(position)), int(np.ceil(position))
+    values = value_counts.index.to_numpy()
+    lower_value = values[np.searchsorted(cumulative, lower + 1)]
+    upper_value = values[np.searchsorted(cumulative, upper + 1)]
+    return lower_value + (upper_value - lower_value) * (position - lower)
+
+
+def stream_amount_bounds(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Exact IQR fences over the whole file from per-chunk TotalAmount counts"""
+    counts = pd.Series(dtype='int64')
+    for chunk in read_raw_chunks(path, chunksize):
+        chunk_counts = apply_cleaning_rules(chunk)['TotalAmount'].value_counts()
+        counts = counts.add(chunk_counts, fill_value=0)
+    q1, q3 = weighted_quantile(counts, 0.25), weighted_quantile(counts, 0.75)
+    iqr = q3 - q1
+    return float(q1 - 1.5 * iqr), float(q3 + 1.5 * iqr)
+
+
+def _distinct(frames):
+    return pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True)
+
+
+def _sum(frames):
+    return pd.concat(frames).groupby(level=list(range(frames[0].index.nlevels)), observed=True).sum()
+
+
+class PairSpill:
+    """Distinct pair frames held up to a row budget, then appended to disk in hash partitions of their key
+
+    A key always hashes to the same partition, so partitions can be
+    deduplicated and counted independently, one in memory at a time. Logs
+    whose pairs fit in the budget never touch the disk.
+    """
+
+    def __init__(self, directory, n_partitions=SPILL_PARTITIONS, max_rows=SPILL_ROWS):
+        self.directory = directory
+        self.n_partitions = n_partitions
+        self.max_rows = max_rows
+        self.buffers, self.keys, self.spilled = {}, {}, set()
+        self.buffered_rows = 0
+
+    def _path(self, name, partition):
+        return os.path.join(self.directory, f'{name}.{partition}.pkl')
+
+    def append(self, name, pairs, keys):
+        self.buffers.setdefault(name, []).append(pairs)
+        self.keys[name] = keys
+        self.buffered_rows += len(pairs)
+        if self.buffered_rows > self.max_rows:
+            for buffered in list(self.buffers):
+                self._flush(buffered)
+            self.buffered_rows = 0
+
+    def _flush(self, name):
+        pairs = _distinct(self.buffers.pop(name, []) or [pd.DataFrame(columns=self.keys[name])])
+        partitions = pd.util.hash_pandas_object(pairs[self.keys[name]], index=False).to_numpy() % self.n_partitions
+        order = np.argsort(partitions, kind='stable')
+        bounds = np.searchsorted(partitions[order], np.arange(self.n_partitions + 1))
+        pairs = pairs.iloc[order]
+        for partition, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+            if stop > start:
+                # Pickles are appended one after another and read back in a loop
+                with open(self._path(name, partition), 'ab') as f:
+                    pickle.dump(pairs.iloc[start:stop], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.spilled.add(name)
+
+    def partitions(self, name):
+        """Deduplicated pairs of each non-empty partition in turn"""
+        if name not in self.spilled:
+            # Everything still fits in the budget: one in-memory partition
+            if self.buffers.get(name):
+                yield _distinct(self.buffers.pop(name))
+            return
+        self._flush(name)
+        for partition in range(self.n_partitions):
+            path = self._path(name, partition)
+            if not os.path.exists(path):
+                continue
+            frames = []
+            with open(path, 'rb') as f:
+                while True:
+                    try:
+                        frames.append(pickle.load(f))
+                    except EOFError:
+                        break
+            yield _distinct(frames)
+
+
+class PartialAggregates:
+    """Decomposable product, country and hourly statistics for a batch of transactions
+
+    Sums are kept per key; every nunique statistic is kept as its distinct
+    (key, value) pairs so merging batches stays exact. When streaming, the
+    pairs are spilled to a PairSpill instead and only their per-key counts
+    come back (collect_pairs).
+    """
+
+    SUMMED = ['product_sums', 'country_sums', 'hour_sums']
+    DISTINCT = {
+        'product_invoices': ['StockCode', 'Description'],
+        'product_customers': ['StockCode', 'Description'],
+        'country_invoices': ['Country'],
+        'country_customers': ['Country'],
+        'country_products': ['Country'],
+        'hour_invoices': ['Date', 'Hour'],
+        'hour_customers': ['Date', 'Hour'],
+    }
+
+    def __init__(self, rfm, **frames):
+        self.rfm = rfm
+        for name in self.SUMMED + list(self.DISTINCT):
+            setattr(self, name, frames[name])
+        # Per-key distinct counts of spilled pairs, by DISTINCT name
+        self.counts = {}
+
+    @classmethod
+    def from_transactions(cls, clean, amount_bounds=None, include_rfm=True):
+        product_keys = ['StockCode', 'Description']
+        clean = clean.assign(Date=clean['InvoiceDate'].dt.normalize())
+        return cls(
+            rfm=RFMState.from_transactions(clean, amount_bounds) if include_rfm else None,
+            product_sums=clean.groupby(product_keys, observed=True).agg(
+                Total_Quantity=('Quantity', 'sum'), Total_Revenue=('TotalAmount', 'sum'),
+                Price_Sum=('UnitPrice', 'sum'), Lines=('UnitPrice', 'size')),
+            country_sums=clean.groupby('Country', observed=True).agg(
+                Total_Revenue=('TotalAmount', 'sum'), Total_Quantity=('Quantity', 'sum')),
+            hour_sums=clean.groupby(['Date', 'Hour'], observed=True).agg(Revenue=('TotalAmount', 'sum')),
+            product_invoices=clean[product_keys + ['InvoiceNo']].drop_duplicates(),
+            product_customers=clean[product_keys + ['CustomerID']].drop_duplicates(),
+            country_invoices=clean[['Country', 'InvoiceNo']].drop_duplicates(),
+            country_customers=clean[['Country', 'CustomerID']].drop_duplicates(),
+            country_products=clean[['Country', 'StockCode']].drop_duplicates(),
+            hour_invoices=clean[['Date', 'Hour', 'InvoiceNo']].drop_duplicates(),
+            hour_customers=clean[['Date', 'Hour', 'CustomerID']].drop_duplicates(),
+        )
+
+    @classmethod
+    def merge_all(cls, partials):
+        """Combine any number of partials from disjoint batches"""
+        rfm = partials[0].rfm
+        for partial in partials[1:]:
+            rfm = rfm.merge(partial.rfm) if rfm is not None else None
+        frames = {name: _sum([getattr(p, name) for p in partials]) for name in cls.SUMMED}
+        frames.update({name: _distinct([getattr(p, name) for p in partials]) for name in cls.DISTINCT})
+        return cls(rfm, **frames)
+
+    def spill_pairs(self, spill):
+        """Move the distinct pairs (RFM ones included) to spill, leaving empty frames; returns self"""
+        for name, keys in self.DISTINCT.items():
+            spill.append(name, getattr(self, name), keys)
+            setattr(self, name, getattr(self, name).iloc[:0])
+        if self.rfm is not None:
+            spill.append('rfm_invoices', self.rfm.invoices, ['CustomerID'])
+            spill.append('rfm_products', self.rfm.products, ['CustomerID'])
+            self.rfm.invoices, self.rfm.products = self.rfm.invoices.iloc[:0], self.rfm.products.iloc[:0]
+        return self
+
+    def collect_pairs(self, spill):
+        """Per-key counts of every spilled statistic, and the RFM pairs back in full; returns self"""
+        for name, keys in self.DISTINCT.items():
+            self.counts[name] = pd.concat([pairs.groupby(keys, observed=True).size()
+                                           for pairs in spill.partitions(name)])
+        if self.rfm is not None:
+            # Partitioned by customer, so the deduplicated partitions are disjoint
+            self.rfm.invoices = pd.concat(spill.partitions('rfm_invoices'), ignore_index=True)
+            self.rfm.products = pd.concat(spill.partitions('rfm_products'), ignore_index=True)
+        return self
+
+    def distinct_count(self, name):
+        """Distinct pairs per key of one DISTINCT statistic"""
+        if name in self.counts:
+            return self.counts[name]
+        return getattr(self, name).groupby(self.DISTINCT[name], observed=True).size()
+
+    def product_analysis(self):
+        keys = ['StockCode', 'Description']
+        products = self.product_sums.copy()
+        products['Total_Orders'] = self.distinct_count('product_invoices')
+        products['Unique_Customers'] = self.distinct_count('product_customers')
+        products['Avg_Price'] = products['Price_Sum'] / products['Lines']
+        products = products.reset_index()[['StockCode', 'Description', 'Total_Quantity', 'Total_Revenue',
+                                           'Total_Orders', 'Unique_Customers', 'Avg_Price']]
+        return sort_by_revenue(products, ['StockCode', 'Description'])
+
+    def geographical_analysis(self):
+        countries = self.country_sums.copy()
+        countries['Total_Orders'] = self.distinct_count('country_invoices')
+        countries['Unique_Customers'] = self.distinct_count('country_customers')
+        countries['Unique_Products'] = self.distinct_count('country_products')
+        countries = countries.reset_index()[['Country', 'Total_Revenue', 'Total_Orders', 'Unique_Customers',
+                                             'Total_Quantity', 'Unique_Products']]
+        countries['Avg_Order_Value'] = countries['Total_Revenue'] / countries['Total_Orders']
+        countries['Revenue_Per_Customer'] = countries['Total_Revenue'] / countries['Unique_Customers']
+        return sort_by_revenue(countries, ['Country'])
+
+    def time_analysis(self):
+        hours = self.hour_sums.copy()
+        hours['Orders'] = self.distinct_count('hour_invoices')
+        hours['Customers'] = self.distinct_count('hour_customers')
+        hours = hours.reset_index()
+        hours['Date'] = hours['Date'].dt.date
+        return hours[['Date', 'Hour', 'Revenue', 'Orders', 'Customers']]
+
+
+def stream_aggregates(path, chunksize=DEFAULT_CHUNKSIZE, amount_bounds=None, spill_dir=None):
+    """Fold a raw CSV into PartialAggregates one chunk at a time
+
+    Distinct pairs are spilled to a temporary directory (inside spill_dir
+    if given), so the running total only carries per-key sums and merging
+    it stays cheap however many chunks there are.
+    """
+    if amount_bounds is None:
+        amount_bounds = stream_amount_bounds(path, chunksize)
+
+    with tempfile.TemporaryDirectory(prefix='ingest-', dir=spill_dir) as directory:
+        spill = PairSpill(directory)
+        total, pending = None, []
+        for chunk in read_raw_chunks(path, chunksize):
+            clean = remove_amount_outliers(apply_cleaning_rules(chunk), amount_bounds)
+            if len(clean):
+                pending.append(PartialAggregates.from_transactions(clean, amount_bounds).spill_pairs(spill))
+            if len(pending) >= MERGE_EVERY:
+                total = PartialAggregates.merge_all(([total] if total else []) + pending)
+                pending = []
+        if pending:
+            total = PartialAggregates.merge_all(([total] if total else []) + pending)
+        return total.collect_pairs(spill) if total else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('raw_path', help='Raw transactions CSV in the online_retail.csv schema')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--state-dir', default=STATE_DIR, help='Where the RFM running aggregates are saved')
+    parser.add_argument('--spill-dir', help='Where distinct pairs are spilled while streaming (default: system temp)')
+    parser.add_argument('--sql-store', action='store_true',
+                        help='Also load the cleaned transactions into the SQL store behind the dashboard')
+    args = parser.parse_args()
+
+    aggregates = stream_aggregates(args.raw_path, args.chunksize, spill_dir=args.spill_dir)
+    # Saved so 'python -m shopper_spectrum.pipeline update' can continue from here
+    aggregates.rfm.save(args.state_dir)
+
+    customer_data = add_clv_estimate(add_rfm_scores(aggregates.rfm.features()))
+    write_dataset('customer_features', customer_data)
+    write_dataset('product_analysis', aggregates.product_analysis())
+    write_dataset('geographical_analysis', aggregates.geographical_analysis())
+    write_dataset('time_analysis', aggregates.time_analysis())
+    print(f"Ingested {len(customer_data):,} customers from {args.raw_path} in chunks of {args.chunksize:,} rows")
+    if args.sql_store:
+        # A second pass over the file with the fences found above
+        rows = build_from_raw(args.raw_path, args.chunksize, aggregates.rfm.amount_bounds)
+        print(f"{rows:,} transactions loaded into {store_path()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Sparse customer x product interaction matrices"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+WEIGHTINGS = ('binary', 'quantity', 'log_quantity')
+
+
+class InteractionMatrix:
+    """CSR customer x product matrix with id <-> index lookup tables"""
+
+    def __init__(self, matrix, customer_ids, products, weighting):
+        self.matrix = matrix
+        self.customer_ids = customer_ids
+        self.products = products
+        self.weighting = weighting
+        self.customer_index = pd.Index(customer_ids)
+        self.product_index = pd.Index(products)
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def customer_position(self, customer_id):
+        """Row of customer_id, or -1 if the customer has no purchases"""
+        return self.customer_index.get_indexer([customer_id])[0]
+
+    def product_position(self, product_name):
+        """Column of product_name, or -1 if the product was never bought"""
+        return self.product_index.get_indexer([product_name])[0]
+
+    def to_frame(self):
+        """Dense DataFrame view, only sensible for small samples"""
+        return pd.DataFrame(self.matrix.toarray(), index=self.customer_ids, columns=self.products)
+
+
+def apply_weighting(matrix, weighting):
+    """Turn summed purchase quantities into implicit-feedback strengths"""
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"Unknown weighting '{weighting}', expected one of {WEIGHTINGS}")
+
+    matrix = matrix.astype(np.float32)
+    if weighting == 'binary':
+        matrix.data[:] = 1.0
+    elif weighting == 'log_quantity':
+        matrix.data = np.log1p(matrix.data)
+    return matrix
+
+
+def build_interaction_matrix(transactions, customer_col='CustomerID', item_col='Description',
+                             value_col='Quantity', weighting='quantity'):
+    """Build a CSR interaction matrix straight from transaction rows
+
+    Customers and products are integer-coded in sorted order, which matches
+    the column order of the old groupby(...).unstack() frame.
+    """
+    customer_codes, customer_ids = pd.factorize(transactions[customer_col], sort=True)
+    product_codes, products = pd.factorize(transactions[item_col], sort=True)
+    values = transactions[value_col].to_numpy(dtype=np.float32)
+
+    # Duplicate (customer, product) pairs are summed when converting to CSR
+    matrix = sparse.coo_matrix(
+        (values, (customer_codes, product_codes)),
+        shape=(len(customer_ids), len(products))
+    ).tocsr()
+    matrix.eliminate_zeros()
+    return InteractionMatrix(apply_weighting(matrix, weighting), np.asarray(customer_ids),
+                             np.asarray(products, dtype=object), weighting)
@@ -0,0 +1,189 @@
+"""Materialised KPIs for the Overview Dashboard
+
+    python -m shopper_spectrum.kpis
+
+Every number and chart series on the landing page is computed once from
+summary_stats.json, customer_segments and time_analysis and stored in
+overview_kpis.json next to summary_stats.json, together with the version
+(modification time) of each source. The snapshot is rebuilt when a source
+changes. Between rebuilds, pipeline updates fold new transactions into it:
+revenue, orders, daily revenue and per-segment revenue are sums and are
+updated exactly; the CLV insight needs the whole customer table and is
+refreshed on the next rebuild.
+"""
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from shopper_spectrum.artifact_store import read_dataset, replacing
+from shopper_spectrum.shared_store import dataset_version
+
+SUMMARY_STATS_PATH = 'summary_stats.json'
+OVERVIEW_KPIS_PATH = 'overview_kpis.json'
+SOURCE_DATASETS = ['customer_segments', 'time_analysis']
+
+
+def source_versions():
+    versions = {name: dataset_version(name) for name in SOURCE_DATASETS}
+    versions['summary_stats'] = os.path.getmtime(SUMMARY_STATS_PATH)
+    return versions
+
+
+def snapshot_version():
+    """Changes whenever a source or the snapshot itself (e.g. after an incremental update) changes"""
+    versions = source_versions()
+    if os.path.exists(OVERVIEW_KPIS_PATH):
+        versions['snapshot'] = os.path.getmtime(OVERVIEW_KPIS_PATH)
+    return tuple(sorted(versions.items()))
+
+
+def _percentages(cluster_revenue):
+    total = sum(row['Monetary'] for row in cluster_revenue)
+    for row in cluster_revenue:
+        row['Percentage'] = row['Monetary'] / total * 100 if total else 0.0
+    return cluster_revenue
+
+
+def _refresh_insights(kpis):
+    top = max(kpis['cluster_revenue'], key=lambda row: row['Monetary'])
+    kpis['insights']['top_cluster'] = top['Cluster']
+    kpis['insights']['top_cluster_revenue_pct'] = top['Percentage']
+    kpis['insights']['avg_frequency'] = kpis['insights']['frequency_sum'] / max(kpis['insights']['customers'], 1)
+    return kpis
+
+
+def compute_overview_kpis(summary_stats, customer_segments, time_analysis, sources=None):
+    """Every value the Overview page shows, as a JSON-serialisable dict
+
+    sources holds the versions of the inputs (see source_versions()); a
+    snapshot stored without them is rebuilt on its next read.
+    """
+    by_cluster = customer_segments.groupby('Cluster').agg(Monetary=('Monetary', 'sum'),
+                                                          Count=('CustomerID', 'size'),
+                                                          Frequency=('Frequency', 'sum'))
+    cluster_revenue = _percentages([{'Cluster': int(cluster), 'Monetary': float(row['Monetary'])}
+                                    for cluster, row in by_cluster.iterrows()])
+    # Largest segments first, as value_counts() ordered them
+    cluster_counts = [{'Cluster': int(cluster), 'Count': int(count)}
+                      for cluster, count in by_cluster['Count'].sort_values(ascending=False, kind='stable').items()]
+
+    daily_revenue = time_analysis.groupby('Date')['Revenue'].sum()
+    avg_clv = float(customer_segments['CLV_Estimate'].mean())
+    kpis = {
+        'sources': dict(sources or {}),
+        'headline': {key: summary_stats[key] for key in ['total_revenue', 'total_customers', 'total_orders',
+                                                         'avg_order_value', 'unique_countries',
+                                                         'analysis_period_days', 'date_range']},
+        'n_clusters': summary_stats['cluster_info']['n_clusters'],
+        'cluster_revenue': cluster_revenue,
+        'cluster_counts': cluster_counts,
+        'daily_revenue': {pd.Timestamp(date).strftime('%Y-%m-%d'): float(revenue)
+                          for date, revenue in daily_revenue.items()},
+        'insights': {
+            'avg_clv': avg_clv,
+            'high_value_customers': int((customer_segments['CLV_Estimate'] > avg_clv * 2).sum()),
+            # Kept as sums so an update can fold in new orders
+            'frequency_sum': int(by_cluster['Frequency'].sum()),
+            'customers': int(len(customer_segments)),
+        },
+        'updates': 0,
+    }
+    return _refresh_insights(kpis)
+
+
+def apply_transactions(kpis, clean, customer_clusters, total_customers=None):
+    """Fold a batch of cleaned, not yet counted transactions into the snapshot
+
+    customer_clusters maps CustomerID to Cluster; revenue of customers not
+    segmented yet counts towards the totals only. total_customers, if given,
+    replaces the headline customer count (e.g. from the RFM state).
+    """
+    if len(clean) == 0:
+        return kpis
+    headline = kpis['headline']
+    revenue = float(clean['TotalAmount'].sum())
+    orders = int(clean['InvoiceNo'].nunique())
+    headline['total_revenue'] += revenue
+    headline['total_orders'] += orders
+    headline['avg_order_value'] = headline['total_revenue'] / headline['total_orders']
+    if total_customers is not None:
+        headline['total_customers'] = kpis['insights']['customers'] = int(total_customers)
+
+    dates = clean['InvoiceDate'].dt.strftime('%Y-%m-%d')
+    for date, day_revenue in clean.groupby(dates)['TotalAmount'].sum().items():
+        kpis['daily_revenue'][date] = kpis['daily_revenue'].get(date, 0.0) + float(day_revenue)
+    start, end = min(kpis['daily_revenue']), max(kpis['daily_revenue'])
+    headline['date_range'] = {'start': start, 'end': end}
+    headline['analysis_period_days'] = (pd.Timestamp(end) - pd.Timestamp(start)).days
+
+    clusters = clean['CustomerID'].map(customer_clusters)
+    cluster_revenue = {row['Cluster']: row for row in kpis['cluster_revenue']}
+    for cluster, cluster_amount in clean.groupby(clusters)['TotalAmount'].sum().items():
+        if int(cluster) in cluster_revenue:
+            cluster_revenue[int(cluster)]['Monetary'] += float(cluster_amount)
+    _percentages(kpis['cluster_revenue'])
+
+    # Frequency counts invoices per customer, so new invoices add to its sum
+    kpis['insights']['frequency_sum'] += int(clean[['CustomerID', 'InvoiceNo']].drop_duplicates().shape[0])
+    kpis['updates'] += 1
+    return _refresh_insights(kpis)
+
+
+def save_overview_kpis(kpis, path=OVERVIEW_KPIS_PATH):
+    with replacing(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(kpis, f, indent=2)
+
+
+def build_overview_kpis(path=OVERVIEW_KPIS_PATH, sources=None):
+    """Recompute the snapshot from its sources and store it"""
+    # Versions are taken before the reads, so a source replaced meanwhile makes the snapshot stale
+    if sources is None:
+        sources = source_versions()
+    with open(SUMMARY_STATS_PATH) as f:
+        summary_stats = json.load(f)
+    kpis = compute_overview_kpis(summary_stats,
+                                 read_dataset('customer_segments', columns=['CustomerID', 'Cluster', 'Monetary',
+                                                                            'Frequency', 'CLV_Estimate']),
+                                 read_dataset('time_analysis', columns=['Date', 'Revenue']),
+                                 sources)
+    save_overview_kpis(kpis, path)
+    return kpis
+
+
+def read_overview_kpis(path=OVERVIEW_KPIS_PATH):
+    """The stored snapshot, rebuilt first if it is missing or a source has changed since"""
+    try:
+        with open(path) as f:
+            kpis = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return build_overview_kpis(path)
+    sources = source_versions()
+    if kpis.get('sources') != sources:
+        return build_overview_kpis(path, sources)
+    return kpis
+
+
+def update_overview_kpis(clean, total_customers=None, path=OVERVIEW_KPIS_PATH):
+    """Apply a batch of new transactions to the stored snapshot (used by pipeline updates)"""
+    kpis = read_overview_kpis(path)
+    customer_clusters = read_dataset('customer_segments', columns=['CustomerID', 'Cluster']).set_index(
+        'CustomerID')['Cluster']
+    kpis = apply_transactions(kpis, clean, customer_clusters, total_customers)
+    save_overview_kpis(kpis, path)
+    return kpis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    kpis = build_overview_kpis()
+    print(f"Overview KPIs for {kpis['headline']['total_customers']:,} customers and "
+          f"{len(kpis['daily_revenue']):,} days written to {OVERVIEW_KPIS_PATH}")
+
+
+if __name__ == '__main__':
+    main()
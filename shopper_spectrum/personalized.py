@@ -0,0 +1,160 @@
+"""Per-customer recommendations from item similarities and segment popularity
+
+A customer's score for a product is the mean similarity between that
+product and the products they bought, taken from the top-k neighbour
+table of the similarity index (kept as a sparse product x product matrix),
+so a whole batch of customers is scored with one sparse product. With a
+boost, the share of the customer's segment that bought each product is
+added on top; the boost is given per query, so one recommender serves
+every boost setting. Products the customer already bought are never
+recommended.
+Only a block_size x n_products slice of scores is dense at a time.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_BOOST = 0.0
+BLOCK_SIZE = 1024
+CACHE_SIZE = 100_000
+
+
+def neighbour_matrix(similarity_index):
+    """Sparse product x product matrix holding each product's top-k similarities"""
+    neighbours = np.asarray(similarity_index.neighbours)
+    scores = np.asarray(similarity_index.scores, dtype=np.float32)
+    n_products = neighbours.shape[0]
+    rows = np.repeat(np.arange(n_products), neighbours.shape[1])
+    # IVF rows are padded with -1; zero similarities add nothing
+    keep = (neighbours.ravel() >= 0) & (scores.ravel() > 0)
+    return sparse.csr_matrix((scores.ravel()[keep], (rows[keep], neighbours.ravel()[keep])),
+                             shape=(n_products, n_products))
+
+
+def purchase_matrix(interactions):
+    """Binary customer x product matrix scaled so each customer's row sums to 1"""
+    purchases = interactions.matrix.astype(bool).astype(np.float32).tocsr()
+    counts = np.diff(purchases.indptr)
+    inverse = np.divide(1.0, counts, out=np.zeros(len(counts), dtype=np.float32), where=counts > 0)
+    return sparse.diags(inverse) @ purchases
+
+
+def cluster_popularity(purchases, cluster_codes, n_clusters):
+    """Share of each cluster's customers who bought each product (n_clusters x n_products)"""
+    member = cluster_codes >= 0
+    assignment = sparse.csr_matrix((np.ones(member.sum(), dtype=np.float32),
+                                    (cluster_codes[member], np.flatnonzero(member))),
+                                   shape=(n_clusters, purchases.shape[0]))
+    bought = (assignment @ purchases.astype(bool).astype(np.float32)).toarray()
+    sizes = np.maximum(np.bincount(cluster_codes[member], minlength=n_clusters), 1)
+    return (bought / sizes[:, None]).astype(np.float32)
+
+
+class CustomerRecommender:
+    """Top-N unseen products per customer, with an LRU cache of computed customers"""
+
+    def __init__(self, interactions, similarity_index, customer_clusters=None, boost=DEFAULT_BOOST,
+                 cache_size=CACHE_SIZE):
+        if list(similarity_index.products) != list(interactions.products):
+            raise ValueError('The similarity index was built for a different product list')
+        self.interactions = interactions
+        self.products = np.asarray(interactions.products, dtype=object)
+        self.boost = boost
+        self.cache_size = cache_size
+        self._similarity = neighbour_matrix(similarity_index)
+        self._purchases = purchase_matrix(interactions)
+
+        # customer_clusters: Series of cluster labels indexed by CustomerID
+        self._cluster_codes = np.full(interactions.shape[0], -1, dtype=np.int64)
+        self._popularity = None
+        if customer_clusters is not None:
+            labels = customer_clusters.reindex(interactions.customer_ids)
+            codes, self.clusters = labels.factorize()
+            self._cluster_codes = np.asarray(codes, dtype=np.int64)
+            self._popularity = cluster_popularity(self._purchases, self._cluster_codes, len(self.clusters))
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def score_rows(self, rows, boost=None):
+        """Dense scores of the given customer rows; already-bought products are -inf"""
+        boost = self.boost if boost is None else boost
+        purchases = self._purchases[rows]
+        scores = (purchases @ self._similarity).toarray()
+        if self._popularity is not None and boost:
+            codes = self._cluster_codes[rows]
+            boosted = codes >= 0
+            scores[boosted] += boost * self._popularity[codes[boosted]]
+        bought_rows, bought_cols = purchases.nonzero()
+        scores[bought_rows, bought_cols] = -np.inf
+        return scores
+
+    def top_n_rows(self, rows, n=5, boost=None, block_size=BLOCK_SIZE):
+        """(product positions, scores) of the n best unseen products per row, best first
+
+        Rows with fewer than n products scoring above zero are padded with -1.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n = max(1, min(n, len(self.products)))
+        positions = np.full((len(rows), n), -1, dtype=np.int32)
+        best = np.zeros((len(rows), n), dtype=np.float32)
+        for start in range(0, len(rows), block_size):
+            scores = self.score_rows(rows[start:start + block_size], boost)
+            candidates = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+            candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+            order = np.lexsort((candidates, -candidate_scores), axis=1)
+            candidates = np.take_along_axis(candidates, order, axis=1)
+            candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            found = candidate_scores > 0
+            positions[start:start + len(scores)] = np.where(found, candidates, -1)
+            best[start:start + len(scores)] = np.where(found, candidate_scores, 0)
+        return positions, best
+
+    def recommend_many(self, customer_ids, n=5, boost=None):
+        """{CustomerID: [{'Product', 'Score'}, ...]}; uncached customers are scored in one batch
+
+        Safe to call from concurrent sessions: the cache is only touched under a lock,
+        and scoring runs outside it.
+        """
+        boost = float(self.boost if boost is None else boost)
+        customer_ids = list(dict.fromkeys(customer_ids))
+        with self._lock:
+            cached = {customer_id: self._cache[(customer_id, n, boost)] for customer_id in customer_ids
+                      if (customer_id, n, boost) in self._cache}
+            self.hits += len(cached)
+            self.misses += len(customer_ids) - len(cached)
+        missing = [customer_id for customer_id in customer_ids if customer_id not in cached]
+
+        rows = self.interactions.customer_index.get_indexer(missing) if missing else np.array([], dtype=np.int64)
+        known = rows >= 0
+        positions, scores = self.top_n_rows(rows[known], n, boost)
+        # Customers without purchases in the interaction data have nothing to aggregate
+        computed = {customer_id: [] for customer_id in missing}
+        for customer_id, row_positions, row_scores in zip(np.asarray(missing, dtype=object)[known], positions,
+                                                          scores):
+            computed[customer_id] = [{'Product': self.products[position], 'Score': float(score)}
+                                     for position, score in zip(row_positions, row_scores) if position >= 0]
+
+        results = {**cached, **computed}
+        with self._lock:
+            for customer_id in customer_ids:
+                key = (customer_id, n, boost)
+                self._cache[key] = results[customer_id]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return {customer_id: results[customer_id] for customer_id in customer_ids}
+
+    def recommend(self, customer_id, n=5, boost=None):
+        return self.recommend_many([customer_id], n, boost)[customer_id]
+
+    def cache_stats(self):
+        with self._lock:
+            hits, misses, size = self.hits, self.misses, len(self._cache)
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'size': size, 'max_size': self.cache_size,
+                'hit_rate': hits / lookups if lookups else 0.0}
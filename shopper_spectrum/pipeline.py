@@ -0,0 +1,352 @@
+"""Headless RFM feature pipeline, extracted from shopper_spectrum_analysis.ipynb
+
+Build everything from the raw transaction log:
+
+    python -m shopper_spectrum.pipeline build online_retail.csv
+
+then fold in a new day of invoices without rescanning history:
+
+    python -m shopper_spectrum.pipeline update invoices_2023-12-10.csv
+
+Customer features are kept as running per-customer aggregates (RFMState)
+that can be merged, so an update only touches the new rows.
+"""
+import argparse
+import json
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from shopper_spectrum.artifact_store import compact_dtypes, replacing, write_dataset
+from shopper_spectrum.kpis import OVERVIEW_KPIS_PATH, update_overview_kpis
+
+STATE_DIR = os.path.join('artifacts', 'rfm_state')
+RAW_DTYPES = {'InvoiceNo': str, 'StockCode': str}
+
+
+def iqr_bounds(amounts):
+    """The notebook's outlier fences: 1.5 IQR beyond the quartiles"""
+    q1, q3 = amounts.quantile(0.25), amounts.quantile(0.75)
+    iqr = q3 - q1
+    return float(q1 - 1.5 * iqr), float(q3 + 1.5 * iqr)
+
+
+def apply_cleaning_rules(raw):
+    """Drop unusable rows and add the derived columns, before outlier removal"""
+    df = raw.dropna(subset=['CustomerID'])
+    df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
+    df = df[~df['InvoiceNo'].astype(str).str.startswith('C')].copy()
+
+    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
+    df['TotalAmount'] = df['Quantity'] * df['UnitPrice']
+    df['Year'] = df['InvoiceDate'].dt.year
+    df['Month'] = df['InvoiceDate'].dt.month
+    df['Day'] = df['InvoiceDate'].dt.day
+    df['Hour'] = df['InvoiceDate'].dt.hour
+    df['DayOfWeek'] = df['InvoiceDate'].dt.dayofweek
+    df['MonthName'] = df['InvoiceDate'].dt.month_name()
+    df['DayName'] = df['InvoiceDate'].dt.day_name()
+    # Integer CustomerIDs, narrow calendar fields and float32 prices from here on
+    return compact_dtypes(df)
+
+
+def remove_amount_outliers(df, amount_bounds):
+    lower, upper = amount_bounds
+    return df[(df['TotalAmount'] >= lower) & (df['TotalAmount'] <= upper)]
+
+
+def clean_transactions(raw, amount_bounds=None):
+    """Apply the notebook cleaning rules, derived columns and outlier removal
+
+    amount_bounds fixes the TotalAmount outlier fences; when None they are
+    computed from this frame, as the notebook does for the full log.
+    """
+    df = apply_cleaning_rules(raw)
+    return remove_amount_outliers(df, amount_bounds or iqr_bounds(df['TotalAmount']))
+
+
+def _merge_customer_aggregates(left, right):
+    """Combine two per-customer aggregate frames (parallel mean/variance merge)"""
+    left, right = left.align(right, join='outer')
+    n_left, n_right = left['Lines'].fillna(0), right['Lines'].fillna(0)
+    n_total = n_left + n_right
+    mean_left, mean_right = left['Amount_Mean'].fillna(0), right['Amount_Mean'].fillna(0)
+    delta = mean_right - mean_left
+
+    merged = pd.DataFrame(index=left.index)
+    merged['First_Purchase'] = pd.concat([left['First_Purchase'], right['First_Purchase']], axis=1).min(axis=1)
+    merged['Last_Purchase'] = pd.concat([left['Last_Purchase'], right['Last_Purchase']], axis=1).max(axis=1)
+    for column in ['Monetary', 'Lines', 'Total_Quantity', 'Unit_Price_Sum']:
+        merged[column] = left[column].fillna(0) + right[column].fillna(0)
+    merged['Amount_Mean'] = mean_left + delta * n_right / n_total
+    merged['Amount_M2'] = (left['Amount_M2'].fillna(0) + right['Amount_M2'].fillna(0)
+                           + delta ** 2 * n_left * n_right / n_total)
+    return merged
+
+
+class RFMState:
+    """Mergeable running aggregates from which every customer feature is derived
+
+    Besides per-customer sums, it keeps the distinct (customer, invoice) and
+    (customer, product) pairs and per-country line counts, which are much
+    smaller than the transaction log but make Frequency, Unique_Products and
+    the modal Country exact after any number of updates.
+    """
+
+    def __init__(self, customers=None, invoices=None, products=None, countries=None, amount_bounds=None):
+        self.customers = customers if customers is not None else pd.DataFrame(
+            columns=['First_Purchase', 'Last_Purchase', 'Monetary', 'Lines', 'Amount_Mean', 'Amount_M2',
+                     'Total_Quantity', 'Unit_Price_Sum'])
+        self.invoices = invoices if invoices is not None else pd.DataFrame(columns=['CustomerID', 'InvoiceNo'])
+        self.products = products if products is not None else pd.DataFrame(columns=['CustomerID', 'StockCode'])
+        self.countries = countries if countries is not None else pd.Series(dtype='int64')
+        self.amount_bounds = amount_bounds
+
+    @classmethod
+    def from_transactions(cls, clean, amount_bounds=None):
+        """Aggregate a batch of cleaned transactions with vectorized groupbys"""
+        grouped = clean.groupby('CustomerID')
+        customers = grouped.agg(
+            First_Purchase=('InvoiceDate', 'min'),
+            Last_Purchase=('InvoiceDate', 'max'),
+            Monetary=('TotalAmount', 'sum'),
+            Lines=('TotalAmount', 'size'),
+            Amount_Mean=('TotalAmount', 'mean'),
+            Amount_Var=('TotalAmount', 'var'),
+            Total_Quantity=('Quantity', 'sum'),
+            Unit_Price_Sum=('UnitPrice', 'sum'),
+        )
+        customers['Amount_M2'] = (customers.pop('Amount_Var') * (customers['Lines'] - 1)).fillna(0)
+
+        return cls(
+            customers=customers,
+            invoices=clean[['CustomerID', 'InvoiceNo']].drop_duplicates(),
+            products=clean[['CustomerID', 'StockCode']].drop_duplicates(),
+            countries=clean.groupby(['CustomerID', 'Country'], observed=True).size(),
+            amount_bounds=amount_bounds,
+        )
+
+    def merge(self, other):
+        """Combined state of two disjoint batches of transactions"""
+        if len(self.customers) == 0:
+            return RFMState(other.customers, other.invoices, other.products, other.countries,
+                            self.amount_bounds or other.amount_bounds)
+        return RFMState(
+            customers=_merge_customer_aggregates(self.customers, other.customers),
+            invoices=pd.concat([self.invoices, other.invoices]).drop_duplicates(),
+            products=pd.concat([self.products, other.products]).drop_duplicates(),
+            countries=self.countries.add(other.countries, fill_value=0).astype('int64'),
+            amount_bounds=self.amount_bounds or other.amount_bounds,
+        )
+
+    def update(self, raw):
+        """Clean a new batch of raw invoices with the stored fences and fold it in"""
+        clean = clean_transactions(raw, self.amount_bounds)
+        return self.merge(RFMState.from_transactions(clean, self.amount_bounds))
+
+    def modal_country(self):
+        """Most frequent Country per customer, ties broken alphabetically like Series.mode()"""
+        counts = self.countries.rename('Lines').reset_index()
+        counts = counts.sort_values(['CustomerID', 'Lines', 'Country'], ascending=[True, False, True])
+        return counts.drop_duplicates('CustomerID').set_index('CustomerID')['Country']
+
+    def features(self, reference_date=None):
+        """Customer feature table with the notebook's column names and order"""
+        customers = self.customers
+        if reference_date is None:
+            reference_date = customers['Last_Purchase'].max() + timedelta(days=1)
+
+        features = pd.DataFrame(index=customers.index)
+        features['Recency'] = (reference_date - customers['Last_Purchase']).dt.days
+        features['Frequency'] = self.invoices.groupby('CustomerID').size()
+        features['Monetary'] = customers['Monetary']
+        features['Total_Quantity'] = customers['Total_Quantity']
+        features['Avg_Quantity_Per_Order'] = customers['Total_Quantity'] / customers['Lines']
+        features['Avg_Unit_Price'] = customers['Unit_Price_Sum'] / customers['Lines']
+        features['Unique_Products'] = self.products.groupby('CustomerID').size()
+        features['Country'] = self.modal_country()
+        features['First_Purchase'] = customers['First_Purchase']
+        features['Last_Purchase'] = customers['Last_Purchase']
+        features['Avg_Order_Value'] = customers['Amount_Mean']
+        # Sample std (ddof=1), undefined for a single line as in pandas
+        features['Order_Value_Std'] = np.sqrt(customers['Amount_M2'] / (customers['Lines'] - 1).where(
+            customers['Lines'] > 1))
+        features['Customer_Lifetime'] = (customers['Last_Purchase'] - customers['First_Purchase']).dt.days
+        return compact_dtypes(features.rename_axis('CustomerID').reset_index())
+
+    def save(self, directory=STATE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for name in ['customers', 'invoices', 'products', 'countries']:
+            with replacing(os.path.join(directory, f'{name}.pkl')) as tmp_path:
+                getattr(self, name).to_pickle(tmp_path)
+        with replacing(os.path.join(directory, 'meta.json')) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                json.dump({'amount_bounds': self.amount_bounds}, f)
+
+    @classmethod
+    def load(cls, directory=STATE_DIR):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        frames = {name: pd.read_pickle(os.path.join(directory, f'{name}.pkl'))
+                  for name in ['customers', 'invoices', 'products', 'countries']}
+        return cls(amount_bounds=meta['amount_bounds'], **frames)
+
+
+def compute_customer_features(clean, reference_date=None):
+    """Recency, Frequency, Monetary and the other customer features in one pass"""
+    return RFMState.from_transactions(clean).features(reference_date)
+
+
+def add_rfm_scores(customer_data):
+    """Quintile R/F/M scores (1-5) and the combined RFM_Score, as in the notebook"""
+    customer_data = customer_data.copy()
+    customer_data['R_Score'] = pd.qcut(customer_data['Recency'], 5, labels=[5, 4, 3, 2, 1]).astype('int8')
+    customer_data['F_Score'] = pd.qcut(customer_data['Frequency'].rank(method='first'), 5,
+                                       labels=[1, 2, 3, 4, 5]).astype('int8')
+    customer_data['M_Score'] = pd.qcut(customer_data['Monetary'], 5, labels=[1, 2, 3, 4, 5]).astype('int8')
+    customer_data['RFM_Score'] = (customer_data['R_Score'].astype(str) + customer_data['F_Score'].astype(str)
+                                  + customer_data['M_Score'].astype(str)).astype('category')
+    customer_data['RFM_Score_Numeric'] = customer_data['R_Score'] + customer_data['F_Score'] + customer_data['M_Score']
+    return customer_data
+
+
+def add_clv_estimate(customer_data):
+    """Simple CLV estimate: average order value x frequency, annualised by recency"""
+    customer_data = customer_data.copy()
+    customer_data['CLV_Estimate'] = (customer_data['Avg_Order_Value'] * customer_data['Frequency']
+                                     * (365 / (customer_data['Recency'] + 1)))
+    return customer_data
+
+
+def build_product_analysis(clean):
+    product_analysis = clean.groupby(['StockCode', 'Description'], observed=True).agg({
+        'Quantity': 'sum',
+        'TotalAmount': 'sum',
+        'InvoiceNo': 'nunique',
+        'CustomerID': 'nunique',
+        'UnitPrice': 'mean'
+    }).reset_index()
+    product_analysis.columns = ['StockCode', 'Description', 'Total_Quantity', 'Total_Revenue',
+                                'Total_Orders', 'Unique_Customers', 'Avg_Price']
+    return sort_by_revenue(product_analysis, ['StockCode', 'Description'])
+
+
+def sort_by_revenue(frame, keys):
+    """Highest Total_Revenue first, ties broken by keys, so the serial and parallel builds agree row for row
+
+    Revenue is compared rounded to 1e-6, as sums taken in a different order
+    can differ in the last bits.
+    """
+    return frame.sort_values(['Total_Revenue'] + keys, ascending=[False] + [True] * len(keys), kind='stable',
+                             key=lambda column: column.round(6) if column.name == 'Total_Revenue' else column)
+
+
+def build_geographical_analysis(clean):
+    geographical_analysis = clean.groupby('Country', observed=True).agg({
+        'TotalAmount': 'sum',
+        'InvoiceNo': 'nunique',
+        'CustomerID': 'nunique',
+        'Quantity': 'sum',
+        'StockCode': 'nunique'
+    }).reset_index()
+    geographical_analysis.columns = ['Country', 'Total_Revenue', 'Total_Orders',
+                                     'Unique_Customers', 'Total_Quantity', 'Unique_Products']
+    geographical_analysis['Avg_Order_Value'] = geographical_analysis['Total_Revenue'] / geographical_analysis['Total_Orders']
+    geographical_analysis['Revenue_Per_Customer'] = (geographical_analysis['Total_Revenue']
+                                                     / geographical_analysis['Unique_Customers'])
+    return sort_by_revenue(geographical_analysis, ['Country'])
+
+
+def build_time_analysis(clean):
+    time_analysis = clean.groupby([clean['InvoiceDate'].dt.date, 'Hour']).agg({
+        'TotalAmount': 'sum',
+        'InvoiceNo': 'nunique',
+        'CustomerID': 'nunique'
+    }).reset_index()
+    time_analysis.columns = ['Date', 'Hour', 'Revenue', 'Orders', 'Customers']
+    return time_analysis
+
+
+def build_transaction_summary(clean, customer_data):
+    transaction_summary = clean.groupby(['InvoiceDate', 'CustomerID']).agg({
+        'TotalAmount': 'sum',
+        'Quantity': 'sum',
+        'InvoiceNo': 'nunique',
+        'Country': 'first'
+    }).reset_index()
+    return transaction_summary.merge(customer_data[['CustomerID', 'Cluster']], on='CustomerID', how='left')
+
+
+def build_cluster_characteristics(customer_data):
+    cluster_characteristics = customer_data.groupby('Cluster').agg({
+        'Recency': ['mean', 'std', 'min', 'max'],
+        'Frequency': ['mean', 'std', 'min', 'max'],
+        'Monetary': ['mean', 'std', 'min', 'max'],
+        'Avg_Order_Value': ['mean', 'std'],
+        'Unique_Products': ['mean', 'std'],
+        'Customer_Lifetime': ['mean', 'std'],
+        'CustomerID': 'count'
+    }).round(2)
+    cluster_characteristics.columns = ['_'.join(col) if col[1] else col[0] for col in cluster_characteristics.columns]
+    return cluster_characteristics.reset_index()
+
+
+def build_export_datasets(clean, customer_data):
+    """Every aggregated dataset of the notebook export step, computed serially"""
+    return {
+        'transaction_summary': build_transaction_summary(clean, customer_data),
+        'cluster_characteristics': build_cluster_characteristics(customer_data),
+        'product_analysis': build_product_analysis(clean),
+        'geographical_analysis': build_geographical_analysis(clean),
+        'time_analysis': build_time_analysis(clean),
+    }
+
+
+def run_build(raw_path, state_dir=STATE_DIR):
+    """Full rebuild from the raw log: state, customer features and product/country/time exports"""
+    prepared = apply_cleaning_rules(pd.read_csv(raw_path, dtype=RAW_DTYPES))
+    # Fences are fixed here so later updates filter outliers consistently
+    amount_bounds = iqr_bounds(prepared['TotalAmount'])
+    clean = remove_amount_outliers(prepared, amount_bounds)
+    state = RFMState.from_transactions(clean, amount_bounds)
+    state.save(state_dir)
+
+    customer_data = add_clv_estimate(add_rfm_scores(state.features()))
+    write_dataset('customer_features', customer_data)
+    write_dataset('product_analysis', build_product_analysis(clean))
+    write_dataset('geographical_analysis', build_geographical_analysis(clean))
+    write_dataset('time_analysis', build_time_analysis(clean))
+    return customer_data
+
+
+def run_update(raw_path, state_dir=STATE_DIR):
+    """Fold a new batch of raw invoices into the saved state and re-export customer features"""
+    state = RFMState.load(state_dir)
+    clean = clean_transactions(pd.read_csv(raw_path, dtype=RAW_DTYPES), state.amount_bounds)
+    state = state.merge(RFMState.from_transactions(clean, state.amount_bounds))
+    state.save(state_dir)
+
+    customer_data = add_clv_estimate(add_rfm_scores(state.features()))
+    write_dataset('customer_features', customer_data)
+    # Keep the Overview KPI snapshot current without recomputing it from scratch
+    if os.path.exists(OVERVIEW_KPIS_PATH):
+        update_overview_kpis(clean, total_customers=len(customer_data))
+    return customer_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['build', 'update'])
+    parser.add_argument('raw_path', help='Raw transactions CSV in the online_retail.csv schema')
+    parser.add_argument('--state-dir', default=STATE_DIR, help='Where the running aggregates are kept')
+    args = parser.parse_args()
+
+    run = run_build if args.command == 'build' else run_update
+    customer_data = run(args.raw_path, args.state_dir)
+    print(f"{args.command}: {len(customer_data):,} customers written to the 'customer_features' dataset")
+
+
+if __name__ == '__main__':
+    main()
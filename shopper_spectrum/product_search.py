@@ -0,0 +1,132 @@
+"""Prebuilt search index over product descriptions for the recommendation search box
+
+Products are numbered in descending Total_Revenue order, and every 1- to
+3-gram of a lowercased description maps to the sorted array of products
+that contain it. A query of up to three characters is a single posting
+list read; a longer one intersects its trigram lists starting from the
+rarest and verifies the survivors in revenue order until the limit is
+reached, so the cost follows how common the query is, not the catalogue.
+A start marker before every name makes prefix search the same lookup.
+
+When a query has (almost) no exact matches, names sharing enough padded
+word trigrams with it (as in pg_trgm) fill the rest, so typos such as
+'choclate' still find CHOCOLATE products.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+MAX_GRAM = 3
+# Marks the start of a name, so prefix queries are substring queries for START + query
+START = '\x02'
+# Share of the query's word trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+# Fuzzy matches are only looked up when a query has fewer exact matches than this
+FUZZY_BELOW = 5
+SEARCH_LIMIT = 50
+
+
+def normalize(text):
+    return ' '.join(str(text).lower().split())
+
+
+def ngrams(text, sizes=range(1, MAX_GRAM + 1)):
+    return {text[start:start + size] for size in sizes for start in range(len(text) - size + 1)}
+
+
+def word_trigrams(text, partial_last=False):
+    """Trigrams of each word padded with two leading and one trailing space
+
+    With partial_last the last word gets no trailing space, as it may still
+    be being typed.
+    """
+    words = text.split()
+    padded = [f'  {word} ' for word in words]
+    if partial_last and padded:
+        padded[-1] = padded[-1][:-1]
+    return {word[start:start + 3] for word in padded for start in range(len(word) - 2)}
+
+
+def contains(posting, values):
+    """Mask of the values present in a sorted posting list"""
+    positions = np.minimum(np.searchsorted(posting, values), len(posting) - 1)
+    return posting[positions] == values
+
+
+class ProductSearchIndex:
+    """N-gram inverted index over product names, with results ranked by revenue"""
+
+    def __init__(self, names, revenue=None):
+        names = list(names)
+        order = (np.argsort(-np.nan_to_num(np.asarray(revenue, dtype=np.float64), nan=-np.inf), kind='stable')
+                 if revenue is not None else np.arange(len(names)))
+        # Position in self.names is the revenue rank
+        self.names = [names[i] for i in order]
+        self._keys = [START + normalize(name) for name in self.names]
+
+        postings, fuzzy_postings = defaultdict(list), defaultdict(list)
+        fuzzy_sizes = np.zeros(len(self.names), dtype=np.int32)
+        for rank, key in enumerate(self._keys):
+            for gram in ngrams(key):
+                postings[gram].append(rank)
+            trigrams = word_trigrams(key[1:])
+            fuzzy_sizes[rank] = len(trigrams)
+            for gram in trigrams:
+                fuzzy_postings[gram].append(rank)
+        # Ranks are appended in order, so every posting list is already sorted
+        self._postings = {gram: np.array(ranks, dtype=np.int32) for gram, ranks in postings.items()}
+        self._fuzzy_postings = {gram: np.array(ranks, dtype=np.int32) for gram, ranks in fuzzy_postings.items()}
+        self._fuzzy_sizes = fuzzy_sizes
+
+    @classmethod
+    def from_product_info(cls, product_info, name_col='Description', rank_col='Total_Revenue'):
+        return cls(product_info[name_col].tolist(), product_info[rank_col].to_numpy())
+
+    def __len__(self):
+        return len(self.names)
+
+    def top(self, limit=SEARCH_LIMIT):
+        """Highest-revenue products"""
+        return self.names[:limit]
+
+    def _substring_ranks(self, key, limit):
+        if len(key) <= MAX_GRAM:
+            return self._postings.get(key, np.array([], dtype=np.int32))[:limit].tolist()
+        postings = [self._postings.get(key[start:start + MAX_GRAM]) for start in range(len(key) - MAX_GRAM + 1)]
+        if any(posting is None for posting in postings):
+            return []
+        # Every match contains all of the query's trigrams: intersect from the rarest, then verify the order
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            candidates = candidates[contains(posting, candidates)]
+        matches = []
+        for rank in candidates.tolist():
+            if key in self._keys[rank]:
+                matches.append(rank)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def _fuzzy_ranks(self, query, limit, exclude=()):
+        trigrams = word_trigrams(query, partial_last=True)
+        postings = [self._fuzzy_postings[gram] for gram in trigrams if gram in self._fuzzy_postings]
+        if not postings:
+            return []
+        candidates, shared = np.unique(np.concatenate(postings), return_counts=True)
+        similarity = shared / len(trigrams)
+        keep = (similarity >= FUZZY_THRESHOLD) & ~np.isin(candidates, list(exclude))
+        candidates, similarity = candidates[keep], similarity[keep]
+        # Most similar first; among equals, shorter names (closer to the query), then revenue
+        order = np.lexsort((candidates, self._fuzzy_sizes[candidates], -similarity))[:limit]
+        return candidates[order].tolist()
+
+    def search(self, query, limit=SEARCH_LIMIT, prefix=False, fuzzy=True):
+        """Names containing query (or starting with it) by revenue, then fuzzy matches if there are hardly any"""
+        query = normalize(query)
+        if not query:
+            return self.top(limit)
+        ranks = self._substring_ranks(START + query if prefix else query, limit)
+        if fuzzy and len(ranks) < min(limit, FUZZY_BELOW) and len(query) > MAX_GRAM:
+            ranks += self._fuzzy_ranks(query, limit - len(ranks), exclude=ranks)
+        return [self.names[rank] for rank in ranks]
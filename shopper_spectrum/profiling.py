@@ -0,0 +1,156 @@
+"""Opt-in render profiler behind the app's performance HUD
+
+A RenderProfiler lives for one script run (one page render). It records
+data loads, the time spent between charts (pandas work and figure
+construction, measured as laps since the previous record), the time
+Streamlit takes to serialise each chart, the process's RSS change over
+each step and the size of every figure's JSON payload. Records can be
+exported as JSON or as Prometheus text exposition, which is also written
+to artifacts/render_profile/ for a textfile collector to scrape.
+
+When disabled, every method reduces to running the wrapped call.
+"""
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+PROFILE_DIR = os.path.join('artifacts', 'render_profile')
+# Set to 1 to turn the HUD on by default
+PROFILE_ENV = 'SHOPPER_SPECTRUM_PROFILE'
+METRIC_PREFIX = 'shopper_spectrum_render'
+RECORD_COLUMNS = ['Page', 'Section', 'Kind', 'Seconds', 'Memory_MB', 'Payload_KB']
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def enabled_by_default():
+    return os.environ.get(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+def rss_mb():
+    """Resident memory of this process in MB, or None where /proc is unavailable"""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2**20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _delta(before, after):
+    return None if before is None or after is None else after - before
+
+
+class RenderProfiler:
+    """Per-section wall time, memory delta and chart payload size for one page render"""
+
+    def __init__(self, page, enabled=True):
+        self.page = page
+        self.enabled = enabled
+        self.records = []
+        self._start = self._mark = time.perf_counter()
+        self._start_rss = self._mark_rss = rss_mb() if enabled else None
+
+    def record(self, section, kind, seconds, memory_mb=None, payload_kb=None):
+        if not self.enabled:
+            return
+        self.records.append({'Page': self.page, 'Section': section, 'Kind': kind, 'Seconds': seconds,
+                             'Memory_MB': memory_mb, 'Payload_KB': payload_kb})
+        # The next lap starts after whatever was just recorded
+        self._mark, self._mark_rss = time.perf_counter(), rss_mb()
+
+    def lap(self, section, kind='build'):
+        """Record the time since the previous record as one step"""
+        if self.enabled:
+            self.record(section, kind, time.perf_counter() - self._mark, _delta(self._mark_rss, rss_mb()))
+
+    @contextmanager
+    def section(self, section, kind='section'):
+        if not self.enabled:
+            yield
+            return
+        start, start_rss = time.perf_counter(), rss_mb()
+        try:
+            yield
+        finally:
+            self.record(section, kind, time.perf_counter() - start, _delta(start_rss, rss_mb()))
+
+    def chart(self, section, fig, render):
+        """Lap for building fig, then time render() (Streamlit's serialisation) and measure the payload"""
+        if not self.enabled:
+            return render()
+        self.lap(section, 'build')
+        payload_kb = len(fig.to_json()) / 1024
+        start, start_rss = time.perf_counter(), rss_mb()
+        result = render()
+        self.record(section, 'render', time.perf_counter() - start, _delta(start_rss, rss_mb()), payload_kb)
+        return result
+
+    def finish(self):
+        """Record the whole render so far as the page total"""
+        if self.enabled:
+            # Tables and widgets after the last chart
+            self.lap('After last chart', 'build')
+            self.record('Total', 'total', time.perf_counter() - self._start, _delta(self._start_rss, rss_mb()),
+                        sum(record['Payload_KB'] or 0 for record in self.records))
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=RECORD_COLUMNS)
+
+    def to_json(self):
+        return json.dumps({'page': self.page, 'timestamp': time.time(), 'records': self.records}, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus text exposition, one gauge family per measure
+
+        Repeated steps (e.g. a dataset fetched twice) are summed, as a series
+        may only appear once per scrape.
+        """
+        families = [('seconds', 'Seconds', 'Wall time of a page section or chart step'),
+                    ('memory_delta_megabytes', 'Memory_MB', 'Change in process RSS over the step'),
+                    ('payload_kilobytes', 'Payload_KB', 'Size of the chart JSON sent to the browser')]
+        lines = []
+        for suffix, column, help_text in families:
+            name = f'{METRIC_PREFIX}_{suffix}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            totals = {}
+            for record in self.records:
+                if record[column] is not None:
+                    key = (record['Page'], record['Section'], record['Kind'])
+                    totals[key] = totals.get(key, 0) + record[column]
+            for (page, section, kind), value in totals.items():
+                lines.append(f'{name}{{page="{_escape(page)}",section="{_escape(section)}",kind="{kind}"}} '
+                             f'{value:.6g}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, directory=PROFILE_DIR):
+        """Write this page's latest records as <page>.json and <page>.prom
+
+        Sessions render concurrently, so each write goes through its own
+        temporary file; the last session to finish wins.
+        """
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^a-z0-9]+', '_', self.page.lower()).strip('_') or 'page'
+        for extension, text in [('json', self.to_json()), ('prom', self.to_prometheus())]:
+            path = os.path.join(directory, f'{slug}.{extension}')
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, prefix=f'.{slug}.',
+                                             suffix='.tmp', delete=False) as f:
+                f.write(text)
+            try:
+                os.replace(f.name, path)
+            except OSError:
+                os.remove(f.name)
+                raise
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
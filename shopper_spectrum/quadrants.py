@@ -0,0 +1,44 @@
+"""Revenue x quantity performance quadrants for the Product Analysis page
+
+Products at or above the revenue threshold and at or above the quantity
+threshold are Star Products, high revenue only is Premium, high quantity
+only is Volume, and the rest are Underperformers. Thresholds are a
+percentile of each column (the median by default), either over the whole
+catalogue or within each group of group_col.
+"""
+import numpy as np
+import pandas as pd
+
+QUADRANTS = ['Star Products', 'Premium Products', 'Volume Products', 'Underperformers']
+THRESHOLD_METHODS = ('median', 'percentile')
+
+
+def quadrant_thresholds(products, method='median', percentile=50, group_col=None,
+                        revenue_col='Total_Revenue', quantity_col='Total_Quantity'):
+    """Revenue and quantity thresholds: scalars, or per-row Series aligned with products when grouped"""
+    if method not in THRESHOLD_METHODS:
+        raise ValueError(f"Unknown threshold method '{method}', expected one of {THRESHOLD_METHODS}")
+    q = 0.5 if method == 'median' else percentile / 100
+    if group_col is None:
+        return products[revenue_col].quantile(q), products[quantity_col].quantile(q)
+    grouped = products.groupby(group_col, observed=True)
+    return grouped[revenue_col].transform('quantile', q), grouped[quantity_col].transform('quantile', q)
+
+
+def classify_quadrants(revenue, quantity, revenue_threshold, quantity_threshold):
+    """Quadrant of every product as a Categorical, from two boolean comparisons per row"""
+    revenue = np.asarray(revenue)
+    quantity = np.asarray(quantity)
+    # Code = 2 * low revenue + low quantity indexes QUADRANTS; NaNs count as low, as in the old row-wise rule
+    codes = 2 * ~(revenue >= np.asarray(revenue_threshold)) + ~(quantity >= np.asarray(quantity_threshold))
+    return pd.Categorical.from_codes(codes.astype(np.int8), QUADRANTS)
+
+
+def categorize_products(products, method='median', percentile=50, group_col=None,
+                        revenue_col='Total_Revenue', quantity_col='Total_Quantity'):
+    """Quadrant Series aligned with products, plus the thresholds used"""
+    revenue_threshold, quantity_threshold = quadrant_thresholds(products, method, percentile, group_col,
+                                                                revenue_col, quantity_col)
+    categories = classify_quadrants(products[revenue_col], products[quantity_col], revenue_threshold,
+                                    quantity_threshold)
+    return pd.Series(categories, index=products.index, name='Category'), (revenue_threshold, quantity_threshold)
@@ -0,0 +1,199 @@
+"""Item-to-item collaborative filtering for the Product Recommendations page"""
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from shopper_spectrum.ann import IVFIndex
+from shopper_spectrum.artifact_store import replacing
+from shopper_spectrum.similarity import normalize_columns, top_k_neighbours
+
+# Where the precomputed neighbour index lives (rebuilt when the catalogue changes)
+SIMILARITY_INDEX_DIR = os.path.join('artifacts', 'similarity_index')
+DEFAULT_TOP_K = 50
+BACKENDS = ('exact', 'ivf')
+# Above this many products the exact O(products^2) build switches to the IVF index
+EXACT_PRODUCT_LIMIT = 20000
+
+
+def build_similarity_index(customer_product_matrix, k=DEFAULT_TOP_K, block_size=256, backend='exact',
+                           **ann_options):
+    """Compute the top-k cosine neighbours of every product
+
+    The exact backend uses blocked sparse products: only a block_size x
+    n_products slice of the similarity matrix is ever dense, so memory stays
+    bounded, but the work is still O(products^2). The ivf backend only scores
+    products in the closest inverted lists; ann_options are passed to
+    IVFIndex to trade recall for build time.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    n_products = customer_product_matrix.shape[1]
+    k = max(1, min(k, n_products - 1))
+    if backend == 'ivf':
+        return IVFIndex(**ann_options).fit(customer_product_matrix).build_neighbours(k)
+
+    normalized = normalize_columns(customer_product_matrix)
+    product_vectors = normalized.T.tocsr()
+
+    neighbours = np.zeros((n_products, k), dtype=np.int32)
+    scores = np.zeros((n_products, k), dtype=np.float32)
+    for start in range(0, n_products, block_size):
+        stop = min(start + block_size, n_products)
+        block = (product_vectors[start:stop] @ normalized).toarray()
+        block_neighbours, block_scores = top_k_neighbours(block, k, exclude=np.arange(start, stop))
+        neighbours[start:stop] = block_neighbours
+        scores[start:stop] = block_scores
+    return neighbours, scores
+
+
+def _atomic_save(path, write):
+    with replacing(path) as tmp_path, open(tmp_path, 'wb') as f:
+        write(f)
+
+
+def save_similarity_index(directory, products, neighbours, scores, weighting='quantity', backend='exact',
+                          source_version=None):
+    """Write the neighbour arrays as .npy files so they can be memory-mapped
+
+    source_version (e.g. the transactions' dataset_version) is recorded so a
+    refreshed dataset with the same catalogue still triggers a rebuild.
+    """
+    os.makedirs(directory, exist_ok=True)
+    _atomic_save(os.path.join(directory, 'neighbours.npy'), lambda f: np.save(f, neighbours))
+    _atomic_save(os.path.join(directory, 'scores.npy'), lambda f: np.save(f, scores))
+
+    meta = {'products': list(products), 'k': int(neighbours.shape[1]), 'weighting': weighting,
+            'backend': backend, 'source_version': source_version}
+    # Written last: its presence marks the index as complete
+    _atomic_save(os.path.join(directory, 'products.json'),
+                 lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+
+class SimilarityIndex:
+    """Read-only top-k neighbour table; each lookup reads a single row"""
+
+    def __init__(self, products, neighbours, scores, weighting='quantity', backend='exact', source_version=None):
+        self.products = list(products)
+        self.weighting = weighting
+        self.backend = backend
+        self.source_version = source_version
+        self.product_index = {name: idx for idx, name in enumerate(self.products)}
+        self.neighbours = neighbours
+        self.scores = scores
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1]
+
+    def __contains__(self, product_name):
+        return product_name in self.product_index
+
+    def recommend(self, product_name, n_recommendations=5):
+        """Most similar products to product_name, best first"""
+        product_idx = self.product_index.get(product_name)
+        if product_idx is None:
+            return None
+
+        neighbour_row = self.neighbours[product_idx, :n_recommendations]
+        score_row = self.scores[product_idx, :n_recommendations]
+        return [
+            {'Product': self.products[idx], 'Similarity_Score': float(score), 'Index': int(idx)}
+            for idx, score in zip(neighbour_row, score_row)
+            if idx >= 0  # IVF rows are padded with -1 when a product has few candidates
+        ]
+
+
+def load_similarity_index(directory=SIMILARITY_INDEX_DIR):
+    """Memory-map a saved index, or return None if it has not been built yet"""
+    try:
+        with open(os.path.join(directory, 'products.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        neighbours = np.load(os.path.join(directory, 'neighbours.npy'), mmap_mode='r')
+        scores = np.load(os.path.join(directory, 'scores.npy'), mmap_mode='r')
+    except (FileNotFoundError, ValueError):
+        return None
+    return SimilarityIndex(meta['products'], neighbours, scores, meta.get('weighting', 'quantity'),
+                           meta.get('backend', 'exact'), meta.get('source_version'))
+
+
+def default_backend(n_products):
+    """Exact neighbours for small catalogues, IVF once the quadratic build gets too slow"""
+    return 'exact' if n_products <= EXACT_PRODUCT_LIMIT else 'ivf'
+
+
+def get_or_build_similarity_index(interactions, directory=SIMILARITY_INDEX_DIR, k=DEFAULT_TOP_K, backend=None,
+                                  source_version=None):
+    """Load the saved index, rebuilding it first if the interaction data changed
+
+    source_version identifies the data the interactions came from (e.g. the
+    dataset_version of the transactions); an index saved from another
+    version is rebuilt even when the catalogue is unchanged.
+    """
+    products = list(interactions.products)
+    backend = backend or default_backend(len(products))
+    index = load_similarity_index(directory)
+    if (index is None or index.products != products or index.weighting != interactions.weighting
+            or index.backend != backend or index.k < min(k, len(products) - 1)
+            or index.source_version != source_version):
+        neighbours, scores = build_similarity_index(interactions.matrix, k=k, backend=backend)
+        save_similarity_index(directory, products, neighbours, scores, interactions.weighting, backend,
+                              source_version)
+        index = load_similarity_index(directory)
+    return index
+
+
+class RecommendationService:
+    """Similarity index plus per-product stats, with an LRU of recent queries
+
+    Product stats are stored as arrays in the index's product order, so a
+    recommendation with its stats is a dict lookup plus array reads. Build
+    one service per dataset version; cached results are shared, read-only
+    tuples.
+    """
+
+    def __init__(self, similarity_index, product_info, version=None, cache_size=1024):
+        self.index = similarity_index
+        self.version = version
+        # product_info rows reordered to match the similarity index's product positions
+        aligned = product_info.set_index('Description').reindex(similarity_index.products)
+        self.product_info = aligned.reset_index()
+        self.stat_columns = list(aligned.columns)
+        self._stats = {column: aligned[column].to_numpy() for column in self.stat_columns}
+        self._recommend = lru_cache(maxsize=cache_size)(self._compute_recommendations)
+
+    @property
+    def products(self):
+        return self.index.products
+
+    def __contains__(self, product_name):
+        return product_name in self.index
+
+    def _stats_at(self, position):
+        return {column: self._stats[column][position].item() for column in self.stat_columns}
+
+    def product_stats(self, product_name):
+        """Stats of one product as a dict, or None if it is not in the index"""
+        position = self.index.product_index.get(product_name)
+        return None if position is None else self._stats_at(position)
+
+    def _compute_recommendations(self, product_name, n_recommendations):
+        recommendations = self.index.recommend(product_name, n_recommendations)
+        if recommendations is None:
+            return None
+        return tuple({**rec, **self._stats_at(rec['Index'])} for rec in recommendations)
+
+    def recommend(self, product_name, n_recommendations=5):
+        """Most similar products with their stats, best first (memoized)"""
+        return self._recommend(product_name, n_recommendations)
+
+    def cache_stats(self):
+        info = self._recommend.cache_info()
+        lookups = info.hits + info.misses
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize,
+                'hit_rate': info.hits / lookups if lookups else 0.0}
+
+    def clear_cache(self):
+        self._recommend.cache_clear()
@@ -0,0 +1,151 @@
+"""Refresh the customer segmentation without rerunning the notebook
+
+    python -m shopper_spectrum.retrain
+    python -m shopper_spectrum.retrain --data customer_features.csv --k 2,3,4,5,6,7,8,9,10
+
+The notebook fits KMeans(n_init=10) for every k and scores each fit with a
+full O(n^2) silhouette. Here every k is fitted with MiniBatchKMeans, warm
+started from the centroids in model_info.pkl, the k candidates run in a
+process pool, and silhouette is estimated on a fixed random sample of
+customers. The winning scaler and model are written together to
+segment_model.pkl, replaced atomically, which scoring then prefers over
+the notebook's scaler.pkl/model_info.pkl.
+
+With warm starting, a refresh at the current k keeps the existing cluster
+ids, so dashboards and downstream reports don't relabel segments.
+"""
+import argparse
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from shopper_spectrum.artifact_store import read_dataset, replacing
+from shopper_spectrum.scoring import MODEL_PATH, read_scorer
+
+K_RANGE = range(2, 11)
+SILHOUETTE_SAMPLE_SIZE = 10000
+BATCH_SIZE = 4096
+
+# Set once per worker process so the feature matrix is not pickled for every k
+_worker_features = None
+_worker_sample = None
+
+
+def warm_start_centres(current, scaled, k, seed=42):
+    """k initial centres: the current ones first, topped up or thinned with k-means++ style D^2 picks"""
+    rng = np.random.default_rng(seed)
+    if k <= len(current):
+        # Keep a spread-out subset: farthest-first over the current centres
+        chosen = [0]
+        while len(chosen) < k:
+            distances = ((current[:, None, :] - current[chosen][None, :, :]) ** 2).sum(axis=2).min(axis=1)
+            chosen.append(int(distances.argmax()))
+        return current[sorted(chosen)]
+
+    centres = list(current)
+    candidates = scaled[rng.choice(len(scaled), min(len(scaled), SILHOUETTE_SAMPLE_SIZE), replace=False)]
+    while len(centres) < k:
+        distances = ((candidates[:, None, :] - np.array(centres)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        centres.append(candidates[rng.choice(len(candidates), p=distances / distances.sum())])
+    return np.array(centres)
+
+
+def _init_worker(scaled, sample):
+    global _worker_features, _worker_sample
+    _worker_features, _worker_sample = scaled, sample
+
+
+def _fit_k(k, init, batch_size, seed):
+    model = MiniBatchKMeans(n_clusters=k, init=init, n_init=1, batch_size=batch_size, random_state=seed)
+    model.fit(_worker_features)
+    sample = _worker_features[_worker_sample]
+    sample_labels = model.predict(sample)
+    # A degenerate fit (everything sampled in one cluster) has no silhouette
+    score = silhouette_score(sample, sample_labels) if len(np.unique(sample_labels)) > 1 else -1.0
+    return k, model.cluster_centers_, float(model.inertia_), float(score)
+
+
+def retrain_segments(customers, current=None, k_values=K_RANGE, sample_size=SILHOUETTE_SAMPLE_SIZE,
+                     batch_size=BATCH_SIZE, n_jobs=None, seed=42):
+    """Sweep k with warm-started MiniBatchKMeans; returns (scaler, model_info, sweep results)"""
+    current = current or read_scorer()
+    features = customers[current.feature_names]
+    # Same imputation as the notebook
+    features = features.fillna(features.median())
+    scaler = StandardScaler().fit(features)
+    scaled = scaler.transform(features)
+    # Express the current centroids in the refitted scaler's space
+    current_centres = scaler.transform(pd.DataFrame(current.cluster_centers * current.scale + current.mean,
+                                                    columns=current.feature_names))
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(scaled), min(len(scaled), sample_size), replace=False)
+    tasks = [(k, warm_start_centres(current_centres, scaled, k, seed), batch_size, seed) for k in k_values]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+    if n_jobs == 1:
+        _init_worker(scaled, sample)
+        results = [_fit_k(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(scaled, sample)) as pool:
+            results = list(pool.map(_fit_k, *zip(*tasks)))
+
+    sweep = pd.DataFrame([(k, inertia, score) for k, _, inertia, score in results],
+                         columns=['k', 'inertia', 'silhouette_score'])
+    # Highest silhouette wins, as in the notebook
+    best_k, best_centres, _, best_score = max(results, key=lambda result: result[3])
+    model_info = {
+        'cluster_centers': best_centres,
+        'n_clusters': best_k,
+        'feature_names': current.feature_names,
+        'silhouette_score': best_score,
+        'silhouette_sample_size': len(sample),
+    }
+    return scaler, model_info, sweep
+
+
+def save_model(scaler, model_info, model_path=MODEL_PATH):
+    """Write scaler and model_info as one pickle, so readers never pair a new scaler with old centres"""
+    with replacing(model_path) as tmp_path, open(tmp_path, 'wb') as f:
+        pickle.dump({'scaler': scaler, 'model_info': model_info}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', help="Customer features CSV (default: the 'customer_features' dataset)")
+    parser.add_argument('--k', default=f'{K_RANGE.start}-{K_RANGE.stop - 1}',
+                        help='Candidate cluster counts, e.g. 2-10 or 2,4,6')
+    parser.add_argument('--sample-size', type=int, default=SILHOUETTE_SAMPLE_SIZE,
+                        help='Customers used to estimate silhouette')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--jobs', type=int, help='Processes for the k sweep (default: all cores)')
+    parser.add_argument('--dry-run', action='store_true', help='Report the sweep without writing the model')
+    args = parser.parse_args()
+
+    if '-' in args.k:
+        low, high = map(int, args.k.split('-'))
+        k_values = range(low, high + 1)
+    else:
+        k_values = [int(k) for k in args.k.split(',')]
+
+    customers = pd.read_csv(args.data) if args.data else read_dataset('customer_features')
+    start = time.perf_counter()
+    scaler, model_info, sweep = retrain_segments(customers, k_values=k_values, sample_size=args.sample_size,
+                                                 batch_size=args.batch_size, n_jobs=args.jobs)
+    print(sweep.to_string(index=False))
+    print(f"Best k={model_info['n_clusters']} (silhouette {model_info['silhouette_score']:.3f}) "
+          f"on {len(customers):,} customers in {time.perf_counter() - start:.1f}s")
+    if not args.dry_run:
+        save_model(scaler, model_info)
+        print(f"Model written to {MODEL_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Assign customer segments with the notebook's scaler.pkl and model_info.pkl
+
+    python -m shopper_spectrum.scoring customers.csv -o scored.csv
+
+A retrained model (shopper_spectrum.retrain) is read from segment_model.pkl
+instead, which holds both in one file, unless the notebook's pickles have
+been exported again since.
+
+Input rows carry the raw clustering features (Recency, Frequency, Monetary,
+Avg_Order_Value, Unique_Products, Customer_Lifetime), as written by the
+notebook or 'python -m shopper_spectrum.pipeline'. Scoring is one
+standardisation and one (rows x clusters) matrix product, so it does not
+need sklearn at prediction time.
+"""
+import argparse
+import os
+import pickle
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+SCALER_PATH = 'scaler.pkl'
+MODEL_INFO_PATH = 'model_info.pkl'
+# Scaler and model_info bundled, so the pair is always replaced together
+MODEL_PATH = 'segment_model.pkl'
+
+
+class SegmentScorer:
+    """Nearest-centroid KMeans assignment in the scaler's standardised space"""
+
+    def __init__(self, mean, scale, cluster_centers, feature_names):
+        self.feature_names = list(feature_names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.cluster_centers = np.asarray(cluster_centers, dtype=np.float64)
+        # ||z - c||^2 = ||z||^2 - 2 z.c + ||c||^2; the ||z||^2 term does not change the argmin
+        self._center_norms = (self.cluster_centers ** 2).sum(axis=1)
+
+    @classmethod
+    def from_artifacts(cls, scaler, model_info):
+        n_features = len(model_info['feature_names'])
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+        return cls(mean, scale, model_info['cluster_centers'], model_info['feature_names'])
+
+    @property
+    def n_clusters(self):
+        return len(self.cluster_centers)
+
+    def feature_matrix(self, customers):
+        """Raw feature columns as a float array, in the order the scaler was fitted on"""
+        missing = [name for name in self.feature_names if name not in customers.columns]
+        if missing:
+            raise ValueError(f"Missing clustering features: {missing}")
+        return customers[self.feature_names].to_numpy(dtype=np.float64)
+
+    def transform(self, features):
+        """Standardise raw features; missing values land on the training mean"""
+        scaled = (features - self.mean) / self.scale
+        # The notebook imputed medians before fitting; those were not saved, the mean is the closest we have
+        return np.nan_to_num(scaled, nan=0.0)
+
+    def predict(self, features, return_distance=False):
+        scaled = self.transform(features)
+        squared = self._center_norms - 2 * (scaled @ self.cluster_centers.T)
+        labels = squared.argmin(axis=1)
+        if not return_distance:
+            return labels
+        nearest = squared[np.arange(len(labels)), labels] + (scaled ** 2).sum(axis=1)
+        return labels, np.sqrt(np.maximum(nearest, 0))
+
+    def score(self, customers):
+        """Copy of customers with Cluster, Cluster_Name and Cluster_Distance added"""
+        labels, distances = self.predict(self.feature_matrix(customers), return_distance=True)
+        scored = customers.copy()
+        scored['Cluster'] = labels
+        scored['Cluster_Name'] = pd.Categorical.from_codes(
+            labels, [f'Cluster_{label}' for label in range(self.n_clusters)])
+        scored['Cluster_Distance'] = distances
+        return scored
+
+
+def _use_bundle(model_info_path, model_path):
+    return os.path.exists(model_path) and not (
+        os.path.exists(model_info_path) and os.path.getmtime(model_info_path) > os.path.getmtime(model_path))
+
+
+def read_artifacts(scaler_path=SCALER_PATH, model_info_path=MODEL_INFO_PATH, model_path=MODEL_PATH):
+    """(scaler, model_info) from the retrained bundle, or from the notebook's pickles if those are newer"""
+    if _use_bundle(model_info_path, model_path):
+        with open(model_path, 'rb') as f:
+            bundle = pickle.load(f)
+        return bundle['scaler'], bundle['model_info']
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    with open(model_info_path, 'rb') as f:
+        model_info = pickle.load(f)
+    return scaler, model_info
+
+
+def model_version(model_info_path=MODEL_INFO_PATH, model_path=MODEL_PATH):
+    """Modification time of the artifacts read_artifacts would load, used to key caches"""
+    return os.path.getmtime(model_path if _use_bundle(model_info_path, model_path) else model_info_path)
+
+
+def read_scorer(scaler_path=SCALER_PATH, model_info_path=MODEL_INFO_PATH, model_path=MODEL_PATH):
+    """Unpickle the model artifacts"""
+    return SegmentScorer.from_artifacts(*read_artifacts(scaler_path, model_info_path, model_path))
+
+
+@lru_cache(maxsize=None)
+def load_scorer(scaler_path=SCALER_PATH, model_info_path=MODEL_INFO_PATH, model_path=MODEL_PATH):
+    """read_scorer, once per process"""
+    return read_scorer(scaler_path, model_info_path, model_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('customers_path', help='CSV with one row of clustering features per customer')
+    parser.add_argument('-o', '--output', help='Where to write the scored rows (default: print a summary only)')
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--model-info', default=MODEL_INFO_PATH)
+    parser.add_argument('--model', default=MODEL_PATH, help='Retrained scaler and model_info, used if newer')
+    args = parser.parse_args()
+
+    scorer = load_scorer(args.scaler, args.model_info, args.model)
+    scored = scorer.score(pd.read_csv(args.customers_path))
+    if args.output:
+        scored.to_csv(args.output, index=False)
+    print(scored['Cluster_Name'].value_counts().sort_index().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Read-only datasets shared by every session and worker process on a host
+
+Each dataset is published once as an uncompressed Arrow IPC file under
+artifacts/shared/ and opened with a memory map. Numeric and timestamp
+columns without nulls come back as read-only NumPy views over the mapped
+file, so the operating system keeps a single copy of the data in the page
+cache however many processes have it open. Within a process the opened
+frame is reused, not copied per caller.
+
+The interaction matrix behind the recommendations is shared the same way,
+as memory-mapped .npy arrays of its CSR components.
+"""
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+from shopper_spectrum.artifact_store import HAS_PARQUET, csv_path, parquet_path, read_dataset, replacing
+from shopper_spectrum.interactions import InteractionMatrix, build_interaction_matrix
+
+if HAS_PARQUET:
+    import pyarrow as pa
+
+SHARED_DIR = os.path.join('artifacts', 'shared')
+INTERACTIONS_DIR = os.path.join(SHARED_DIR, 'interactions')
+INTERACTION_COLUMNS = ['CustomerID', 'Description', 'Quantity']
+
+
+def arrow_path(name):
+    return os.path.join(SHARED_DIR, f'{name}.arrow')
+
+
+def dataset_version(name):
+    """Modification time of the stored dataset, used to key caches built from it"""
+    paths = [path for path in (parquet_path(name), csv_path(name)) if os.path.exists(path)]
+    if not paths:
+        raise FileNotFoundError(f"No stored dataset '{name}' in {csv_path(name)} or {parquet_path(name)}")
+    return max(os.path.getmtime(path) for path in paths)
+
+
+def publish_dataset(name):
+    """Write the dataset as an uncompressed Arrow IPC file that workers can memory-map"""
+    table = pa.Table.from_pandas(read_dataset(name), preserve_index=False)
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    # Processes that already mapped the old file keep reading it until they reopen
+    with replacing(arrow_path(name)) as tmp_path:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def open_dataset(name, columns=None):
+    """DataFrame over the memory-mapped Arrow file, (re)publishing it if missing or stale
+
+    Without pyarrow this falls back to an ordinary read_dataset copy.
+    """
+    if not HAS_PARQUET:
+        return read_dataset(name, columns=columns)
+    path = arrow_path(name)
+    if not os.path.exists(path) or os.path.getmtime(path) < dataset_version(name):
+        publish_dataset(name)
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    # split_blocks keeps one block per column so null-free numeric columns stay zero-copy views
+    return table.to_pandas(split_blocks=True)
+
+
+def is_shared(frame, column):
+    """Whether a column is a read-only view over shared memory rather than a private copy"""
+    values = frame[column].to_numpy()
+    return not values.flags.writeable and not values.flags.owndata
+
+
+def _replace_with(path, write):
+    with replacing(path) as tmp_path, open(tmp_path, 'wb') as f:
+        write(f)
+
+
+def save_shared_interactions(directory, interactions, source_mtime):
+    """Save the CSR components as .npy files; every file is swapped in whole so readers never see a partial one"""
+    os.makedirs(directory, exist_ok=True)
+    arrays = {part: getattr(interactions.matrix, part) for part in ['data', 'indices', 'indptr']}
+    # Customer ids are integers in the stored datasets, which keeps them mappable (object arrays are not)
+    arrays['customer_ids'] = np.asarray(interactions.customer_ids, dtype=np.int64)
+    for part, values in arrays.items():
+        _replace_with(os.path.join(directory, f'{part}.npy'), lambda f: np.save(f, values))
+    meta = {'products': list(interactions.products), 'shape': list(interactions.shape),
+            'weighting': interactions.weighting, 'source_mtime': source_mtime}
+    # Written last: its presence marks the arrays as complete
+    _replace_with(os.path.join(directory, 'meta.json'), lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+
+def load_shared_interactions(directory):
+    """Memory-map saved CSR components as (meta, InteractionMatrix), or (None, None) if absent"""
+    try:
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        parts = {part: np.load(os.path.join(directory, f'{part}.npy'), mmap_mode='r')
+                 for part in ['data', 'indices', 'indptr', 'customer_ids']}
+    except (FileNotFoundError, ValueError):
+        return None, None
+    matrix = sparse.csr_matrix((parts['data'], parts['indices'], parts['indptr']), shape=tuple(meta['shape']),
+                               copy=False)
+    products = np.asarray(meta['products'], dtype=object)
+    return meta, InteractionMatrix(matrix, parts['customer_ids'], products, meta['weighting'])
+
+
+def shared_interaction_matrix(name='retail_data_sample', weighting='quantity', directory=INTERACTIONS_DIR):
+    """Memory-mapped interaction matrix of a dataset, rebuilt when the dataset changes"""
+    source_mtime = dataset_version(name)
+    meta, interactions = load_shared_interactions(directory)
+    # Float customer ids were written before CustomerID became an integer column
+    if (meta is None or meta['source_mtime'] != source_mtime or meta['weighting'] != weighting
+            or interactions.customer_ids.dtype.kind != 'i'):
+        transactions = open_dataset(name, columns=INTERACTION_COLUMNS)
+        save_shared_interactions(directory, build_interaction_matrix(transactions, weighting=weighting),
+                                 source_mtime)
+        meta, interactions = load_shared_interactions(directory)
+    return interactions
@@ -0,0 +1,25 @@
+"""Cosine-similarity building blocks shared by the exact and approximate indexes"""
+import numpy as np
+from scipy import sparse
+
+
+def normalize_columns(matrix):
+    """Scale every product column of a customer x product matrix to unit L2 norm"""
+    matrix = sparse.csc_matrix(matrix, dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return (matrix @ sparse.diags(inverse)).tocsc()
+
+
+def top_k_neighbours(scores, k, exclude=None):
+    """Return (indices, scores) of the k best columns in each row of a dense block"""
+    if exclude is not None:
+        # Never recommend a product as similar to itself
+        scores[np.arange(len(exclude)), exclude] = -np.inf
+    k = min(k, scores.shape[1] - 1 if exclude is not None else scores.shape[1])
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    # Break ties on the lower product index, like a stable sort of the full row
+    order = np.lexsort((candidates, -candidate_scores), axis=1)
+    return (np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1))
@@ -0,0 +1,305 @@
+"""Embedded SQL store that answers dashboard aggregations over the transaction log
+
+    python -m shopper_spectrum.sql_store --raw online_retail.csv --chunksize 200000
+    python -m shopper_spectrum.sql_store --dataset retail_data_sample
+
+Cleaned transactions are written once to an in-process database file under
+artifacts/, DuckDB when it is installed and the standard library's SQLite
+otherwise, with the calendar keys the pages group by (Date, Month, Hour,
+DayOfWeek) precomputed as columns. Pages send GROUP BY queries and receive
+only the aggregated rows, so the full history can back the dashboard
+without any worker loading the transaction rows. SQLite gets covering
+indexes for each query shape; DuckDB scans its columnar storage, where
+rows inserted in date order let min/max zone maps skip blocks.
+
+--raw (or 'python -m shopper_spectrum.ingest ... --sql-store') cleans a
+raw log in chunks with the pipeline's rules, taking clusters from the
+customer_segments dataset; this full-history store is the one the Time
+Patterns page switches to. --dataset loads an already cleaned dataset
+such as retail_data_sample instead, for trying queries out: the page
+ignores such a store, as a sample would understate every total. The
+store records what it was built from and is ignored once that source is
+newer.
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from shopper_spectrum.artifact_store import read_dataset, replacing
+from shopper_spectrum.shared_store import dataset_version
+from shopper_spectrum.time_cube import WEEKDAYS
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+STORE_DIR = 'artifacts'
+DEFAULT_DATASET = 'retail_data_sample'
+TABLE_COLUMNS = [
+    ('InvoiceNo', 'TEXT'), ('InvoiceDate', 'TEXT'), ('Date', 'TEXT'), ('Month', 'TEXT'), ('Hour', 'INTEGER'),
+    ('DayOfWeek', 'INTEGER'), ('CustomerID', 'INTEGER'), ('StockCode', 'TEXT'), ('Description', 'TEXT'),
+    ('Country', 'TEXT'), ('Cluster', 'INTEGER'), ('Quantity', 'INTEGER'), ('UnitPrice', 'DOUBLE'),
+    ('TotalAmount', 'DOUBLE'),
+]
+# Covering indexes (SQLite only), one per query shape, so each GROUP BY reads an index instead of the table
+INDEXES = {
+    'transactions_date': ['Date', 'Country', 'Cluster', 'TotalAmount'],
+    'transactions_weekday_hour': ['DayOfWeek', 'Hour', 'Country', 'Cluster', 'TotalAmount'],
+    'transactions_month': ['Month', 'Country', 'Cluster', 'InvoiceNo', 'CustomerID', 'Quantity', 'TotalAmount'],
+}
+
+
+def default_backend():
+    return 'duckdb' if HAS_DUCKDB else 'sqlite'
+
+
+def store_path(backend=None):
+    return os.path.join(STORE_DIR, f"transactions.{backend or default_backend()}")
+
+
+def _connect(path, backend, read_only=False):
+    if backend == 'duckdb':
+        return duckdb.connect(path, read_only=read_only)
+    if read_only:
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    return sqlite3.connect(path)
+
+
+def store_rows(clean, customer_clusters=None):
+    """Table rows (TABLE_COLUMNS) from cleaned transactions
+
+    Cluster comes from the transactions themselves when they have one,
+    otherwise from customer_clusters (a Series indexed by CustomerID).
+    """
+    dates = clean['InvoiceDate']
+    if 'Cluster' in clean.columns:
+        clusters = clean['Cluster']
+    elif customer_clusters is not None:
+        clusters = clean['CustomerID'].map(customer_clusters)
+    else:
+        clusters = pd.Series(pd.NA, index=clean.index)
+    return pd.DataFrame({
+        'InvoiceNo': clean['InvoiceNo'].astype(str),
+        'InvoiceDate': dates.dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'Date': dates.dt.strftime('%Y-%m-%d'),
+        'Month': dates.dt.strftime('%Y-%m-01'),
+        'Hour': dates.dt.hour.astype('int64'),
+        'DayOfWeek': dates.dt.dayofweek.astype('int64'),
+        'CustomerID': clean['CustomerID'].astype('int64'),
+        'StockCode': clean['StockCode'].astype(str),
+        'Description': clean['Description'].astype(str),
+        'Country': clean['Country'].astype(str),
+        'Cluster': clusters.astype('Int64'),
+        'Quantity': clean['Quantity'].astype('int64'),
+        'UnitPrice': clean['UnitPrice'].astype('float64'),
+        'TotalAmount': clean['TotalAmount'].astype('float64'),
+    })
+
+
+def build_store(chunks, source, source_version, path=None, backend=None):
+    """Write cleaned transaction chunks to a new store file, swapped in once complete; returns rows written"""
+    backend = backend or default_backend()
+    path = path or store_path(backend)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    columns = ', '.join(f'{name} {sql_type}' for name, sql_type in TABLE_COLUMNS)
+    rows = 0
+    with replacing(path) as tmp_path:
+        # The database creates its own file under the unique name; an empty placeholder is not a valid DuckDB file
+        os.remove(tmp_path)
+        connection = _connect(tmp_path, backend)
+        try:
+            connection.execute(f'CREATE TABLE transactions ({columns})')
+            connection.execute('CREATE TABLE meta (key TEXT, value TEXT)')
+            for chunk in chunks:
+                if backend == 'duckdb':
+                    connection.register('chunk', chunk)
+                    connection.execute('INSERT INTO transactions SELECT * FROM chunk')
+                    connection.unregister('chunk')
+                else:
+                    chunk.to_sql('transactions', connection, if_exists='append', index=False)
+                rows += len(chunk)
+            if backend == 'sqlite':
+                for name, index_columns in INDEXES.items():
+                    connection.execute(f"CREATE INDEX {name} ON transactions ({', '.join(index_columns)})")
+                connection.execute('ANALYZE')
+            connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('source', source), ('source_version', repr(source_version)), ('rows', str(rows))])
+            connection.commit()
+        finally:
+            connection.close()
+    return rows
+
+
+def build_from_dataset(name=DEFAULT_DATASET, path=None, backend=None):
+    """Store built from an already cleaned transactions dataset"""
+    transactions = read_dataset(name).sort_values('InvoiceDate', kind='stable')
+    return build_store([store_rows(transactions)], f'dataset:{name}', dataset_version(name), path, backend)
+
+
+def build_from_raw(raw_path, chunksize=None, amount_bounds=None, path=None, backend=None):
+    """Store built from a raw online_retail.csv-style log, cleaned chunk by chunk"""
+    # Imported here because ingest imports this module for its --sql-store option
+    from shopper_spectrum.ingest import DEFAULT_CHUNKSIZE, read_raw_chunks, stream_amount_bounds
+    from shopper_spectrum.pipeline import apply_cleaning_rules, remove_amount_outliers
+
+    chunksize = chunksize or DEFAULT_CHUNKSIZE
+    if amount_bounds is None:
+        amount_bounds = stream_amount_bounds(raw_path, chunksize)
+    try:
+        customer_clusters = read_dataset('customer_segments', columns=['CustomerID', 'Cluster']).set_index(
+            'CustomerID')['Cluster']
+    except FileNotFoundError:
+        customer_clusters = None
+    chunks = (store_rows(remove_amount_outliers(apply_cleaning_rules(chunk), amount_bounds), customer_clusters)
+              for chunk in read_raw_chunks(raw_path, chunksize))
+    return build_store(chunks, f'raw:{os.path.abspath(raw_path)}', os.path.getmtime(raw_path), path, backend)
+
+
+def _filters(countries=None, clusters=None):
+    """WHERE clause and parameters restricting to the given countries and clusters (None or empty keeps all)"""
+    clauses, params = [], []
+    if countries:
+        clauses.append(f"Country IN ({', '.join('?' * len(countries))})")
+        params += [str(country) for country in countries]
+    if clusters:
+        clauses.append(f"Cluster IN ({', '.join('?' * len(clusters))})")
+        params += [int(cluster) for cluster in clusters]
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+class TransactionStore:
+    """Read-only connection to a built store; every method returns an aggregated DataFrame"""
+
+    def __init__(self, path, backend):
+        self.path = path
+        self.backend = backend
+        self._connection = _connect(path, backend, read_only=True)
+        # One connection is shared by every session's thread
+        self._lock = threading.Lock()
+        self.meta = dict(self._execute('SELECT key, value FROM meta'))
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, list(params)).fetchall()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            cursor = self._connection.execute(sql, list(params))
+            columns = [column[0] for column in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @property
+    def full_history(self):
+        """Built from a raw log rather than a sampled dataset"""
+        return self.meta['source'].startswith('raw:')
+
+    def is_current(self):
+        """Whether the source the store was built from has not changed since"""
+        kind, _, name = self.meta['source'].partition(':')
+        try:
+            version = dataset_version(name) if kind == 'dataset' else os.path.getmtime(name)
+        except (FileNotFoundError, OSError):
+            # A raw log that has been moved away can no longer make the store stale
+            return kind == 'raw'
+        return repr(version) == self.meta['source_version']
+
+    def countries(self):
+        return [row[0] for row in self._execute('SELECT DISTINCT Country FROM transactions ORDER BY Country')]
+
+    def clusters(self):
+        return [row[0] for row in self._execute(
+            'SELECT DISTINCT Cluster FROM transactions WHERE Cluster IS NOT NULL ORDER BY Cluster')]
+
+    def daily_revenue(self, countries=None, clusters=None):
+        where, params = _filters(countries, clusters)
+        daily = self.query(f'SELECT Date, SUM(TotalAmount) AS Revenue FROM transactions{where} '
+                           'GROUP BY Date ORDER BY Date', params)
+        return daily.assign(Date=pd.to_datetime(daily['Date']))
+
+    def hourly_revenue(self, countries=None, clusters=None):
+        where, params = _filters(countries, clusters)
+        return self.query(f'SELECT Hour, SUM(TotalAmount) AS Revenue FROM transactions{where} '
+                          'GROUP BY Hour ORDER BY Hour', params)
+
+    def monthly(self, countries=None, clusters=None):
+        """Revenue, quantity, distinct orders and distinct customers per month"""
+        where, params = _filters(countries, clusters)
+        monthly = self.query(
+            'SELECT Month, SUM(TotalAmount) AS Revenue, SUM(Quantity) AS Quantity, '
+            'COUNT(DISTINCT InvoiceNo) AS Orders, COUNT(DISTINCT CustomerID) AS Customers '
+            f'FROM transactions{where} GROUP BY Month ORDER BY Month', params)
+        return monthly.assign(Month=pd.to_datetime(monthly['Month']))
+
+    def weekday_hour_heatmap(self, countries=None, clusters=None):
+        where, params = _filters(countries, clusters)
+        cells = self.query(f'SELECT DayOfWeek, Hour, SUM(TotalAmount) AS Revenue FROM transactions{where} '
+                           'GROUP BY DayOfWeek, Hour', params)
+        heatmap = cells.pivot(index='DayOfWeek', columns='Hour', values='Revenue').fillna(0)
+        heatmap = heatmap.reindex(range(7), fill_value=0)
+        heatmap.index = WEEKDAYS
+        return heatmap
+
+    def time_pattern_rollups(self, countries=None, clusters=None):
+        """The Time Patterns page's aggregates, shaped like the TimeCube roll-ups"""
+        return {
+            'daily': self.daily_revenue(countries, clusters),
+            'hourly': self.hourly_revenue(countries, clusters),
+            'monthly': self.monthly(countries, clusters),
+            'heatmap': self.weekday_hour_heatmap(countries, clusters),
+        }
+
+
+def find_store():
+    """(path, backend) of the store to read, preferring DuckDB when it is installed, or (None, None)"""
+    backends = ['duckdb', 'sqlite'] if HAS_DUCKDB else ['sqlite']
+    for backend in backends:
+        if os.path.exists(store_path(backend)):
+            return store_path(backend), backend
+    return None, None
+
+
+def store_version():
+    """Modification time of the store file, or None when no store has been built"""
+    path, _ = find_store()
+    return os.path.getmtime(path) if path else None
+
+
+def open_store():
+    """The built store if there is one and its source has not changed since, else None"""
+    path, backend = find_store()
+    if path is None:
+        return None
+    store = TransactionStore(path, backend)
+    return store if store.is_current() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--raw', help='Raw transactions CSV to clean and load (the store the dashboard uses)')
+    source.add_argument('--dataset', help=f"Cleaned transactions dataset to load, e.g. {DEFAULT_DATASET} "
+                                          '(not used by the dashboard)')
+    parser.add_argument('--chunksize', type=int, help='Raw rows cleaned per chunk')
+    parser.add_argument('--backend', choices=['duckdb', 'sqlite'], default=default_backend())
+    args = parser.parse_args()
+    if args.backend == 'duckdb' and not HAS_DUCKDB:
+        parser.error('the duckdb backend needs the duckdb package; use --backend sqlite')
+
+    start = time.perf_counter()
+    if args.raw:
+        rows = build_from_raw(args.raw, args.chunksize, backend=args.backend)
+    else:
+        rows = build_from_dataset(args.dataset, backend=args.backend)
+    print(f"{rows:,} transactions written to {store_path(args.backend)} in {time.perf_counter() - start:.1f}s")
+    if not args.raw:
+        print("Built from a dataset, not the full history: the Time Patterns page keeps using the time cube")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Pre-aggregated time cube behind the Time Patterns page
+
+    python -m shopper_spectrum.time_cube
+
+Cells hold additive measures (Revenue, Quantity, Orders) at the grain
+Date x Hour x DayOfWeek x Country x Cluster, so any roll-up or filter is a
+groupby over a few thousand cells instead of the transaction rows. Distinct
+customers are not additive across cells, so they are kept separately as
+distinct (Month, Country, Cluster, CustomerID) rows.
+
+The cube is built from the transaction_summary export (one row per
+InvoiceDate and customer). Orders counts invoices per timestamp, so an
+invoice whose lines carry two different timestamps counts twice, which is
+rare.
+"""
+import argparse
+
+from shopper_spectrum.artifact_store import read_dataset, write_dataset
+
+DIMENSIONS = ['Date', 'Hour', 'DayOfWeek', 'Country', 'Cluster']
+MEASURES = ['Revenue', 'Quantity', 'Orders']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def build_time_cube(transaction_summary):
+    """Cube cells and distinct customer-months from the transaction_summary export"""
+    invoice_dates = transaction_summary['InvoiceDate']
+    keyed = transaction_summary.assign(
+        Date=invoice_dates.dt.normalize(),
+        Hour=invoice_dates.dt.hour,
+        DayOfWeek=invoice_dates.dt.dayofweek,
+        Month=invoice_dates.dt.to_period('M').dt.to_timestamp(),
+    )
+    cells = keyed.groupby(DIMENSIONS, observed=True).agg(
+        Revenue=('TotalAmount', 'sum'), Quantity=('Quantity', 'sum'), Orders=('InvoiceNo', 'sum')).reset_index()
+    customers = keyed[['Month', 'Country', 'Cluster', 'CustomerID']].drop_duplicates(ignore_index=True)
+    return cells, customers
+
+
+class TimeCube:
+    """Slice and roll up the time cube without touching transaction rows"""
+
+    def __init__(self, cells, customers):
+        self.cells = cells
+        self.customers = customers
+
+    @classmethod
+    def load(cls):
+        return cls(read_dataset('time_cube'), read_dataset('time_cube_customers'))
+
+    def slice(self, countries=None, clusters=None):
+        """Sub-cube restricted to the given countries and clusters (None keeps all)"""
+        cells, customers = self.cells, self.customers
+        if countries is not None:
+            cells = cells[cells['Country'].isin(countries)]
+            customers = customers[customers['Country'].isin(countries)]
+        if clusters is not None:
+            cells = cells[cells['Cluster'].isin(clusters)]
+            customers = customers[customers['Cluster'].isin(clusters)]
+        return TimeCube(cells, customers)
+
+    def rollup(self, dimensions, measures=MEASURES):
+        """Sum the measures up to the given dimensions ('Month' is derived from Date)"""
+        cells = self.cells
+        if 'Month' in dimensions:
+            cells = cells.assign(Month=cells['Date'].dt.to_period('M').dt.to_timestamp())
+        return cells.groupby(dimensions, observed=True)[measures].sum().reset_index()
+
+    def pivot(self, index, columns, measure='Revenue'):
+        return self.rollup([index, columns], [measure]).pivot(index=index, columns=columns,
+                                                              values=measure).fillna(0)
+
+    def weekday_hour_heatmap(self, measure='Revenue'):
+        heatmap = self.pivot('DayOfWeek', 'Hour', measure).reindex(range(7), fill_value=0)
+        heatmap.index = WEEKDAYS
+        return heatmap
+
+    def monthly(self):
+        """Revenue, quantity and orders per month with distinct active customers"""
+        monthly = self.rollup(['Month'])
+        active = self.customers.groupby('Month')['CustomerID'].nunique().rename('Customers')
+        return monthly.merge(active, left_on='Month', right_index=True, how='left')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--csv-copy', action='store_true', help="Also write CSVs to 'Generated CSV files'")
+    args = parser.parse_args()
+
+    cells, customers = build_time_cube(read_dataset('transaction_summary'))
+    write_dataset('time_cube', cells, csv_copy=args.csv_copy)
+    write_dataset('time_cube_customers', customers, csv_copy=args.csv_copy)
+    print(f"Time cube: {len(cells):,} cells, {len(customers):,} customer-months")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,23 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import seaborn as sns
 import matplotlib.pyplot as plt
-import json
 import pickle
+import time
 from datetime import datetime, timedelta
-from sklearn.metrics.pairwise import cosine_similarity
+from shopper_spectrum.artifact_store import memory_mb
+from shopper_spectrum.basket import BASKET_COLUMNS, format_rules, mine_rules
+from shopper_spectrum.customer_index import CustomerIndex
+from shopper_spectrum.downsample import POINT_BUDGET, TOP_N, downsample_points, histogram_bins, stratified_sample
+from shopper_spectrum.kpis import read_overview_kpis, snapshot_version
+from shopper_spectrum.personalized import CustomerRecommender
+from shopper_spectrum.product_search import ProductSearchIndex
+from shopper_spectrum.profiling import PROFILE_DIR, RenderProfiler, enabled_by_default
+from shopper_spectrum.quadrants import categorize_products
+from shopper_spectrum.recommender import RecommendationService, get_or_build_similarity_index
+from shopper_spectrum.scoring import model_version, read_scorer
+from shopper_spectrum.shared_store import dataset_version, open_dataset, shared_interaction_matrix
+from shopper_spectrum.sql_store import open_store, store_version
+from shopper_spectrum.time_cube import TimeCube
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -146,76 +159,205 @@ st.sidebar.title("📊 Navigation")
 page = st.sidebar.selectbox(
     "Choose Analysis View",
     ["📈 Overview Dashboard", "👥 Customer Segments", "🛒 Product Analysis", 
-     "🌍 Geographic Analysis", "⏰ Time Patterns", "🔍 Customer Explorer", "🎯 Product Recommendations"]
+     "🌍 Geographic Analysis", "⏰ Time Patterns", "🔍 Customer Explorer", "🎯 Product Recommendations",
+     "🧮 Score Customers"]
 )
 
-# Load data function
+# Opt-in timing of every data load and chart on this page
+show_profile = st.sidebar.checkbox("🩺 Performance HUD", value=enabled_by_default(),
+                                   help="Time each section and chart, with memory and payload size")
+profiler = RenderProfiler(page, enabled=show_profile)
+
+def show_chart(fig, name=None):
+    """st.plotly_chart, with build time, serialisation time and payload size recorded by the profiler"""
+    profiler.chart(name or fig.layout.title.text or 'Chart', fig,
+                   lambda: st.plotly_chart(fig, use_container_width=True))
+
+# Scatter charts with more points than this are downsampled on the server
+CHART_POINT_BUDGET = POINT_BUDGET
+
+# The transaction sample holds few lines per invoice, so baskets need low thresholds
+BASKET_MIN_SUPPORT = 0.0001
+BASKET_MIN_CONFIDENCE = 0.1
+
+def sample_note(shown, total):
+    """Chart title suffix saying how many points a downsampled chart shows"""
+    return f" ({len(shown):,} of {len(total):,} shown)" if len(shown) < len(total) else ""
+
+# Columns of the transaction sample the pages actually use
+RETAIL_SAMPLE_COLUMNS = ['InvoiceNo', 'InvoiceDate', 'CustomerID', 'Description', 'Quantity',
+                         'UnitPrice', 'TotalAmount', 'Hour']
+
+# Datasets read from disk or rebuilt during this run (cache misses), filled in by the loaders below
+datasets_read_from_disk = set()
+datasets_built = set()
+# (dataset, rows, seconds, source) for every dataset this page touched
+data_load_log = []
+
 @st.cache_data
-def load_data():
-    """Load all necessary data files"""
+def load_overview_kpis(snapshot_version):
+    """Load the Overview KPI snapshot, rebuilding it if its sources changed"""
+    datasets_read_from_disk.add('overview_kpis')
+    return read_overview_kpis()
+
+# Store name and column projection behind each dataset the pages ask for
+DATASET_SOURCES = {
+    'customer_segments': ('customer_segments', None),
+    'cluster_characteristics': ('cluster_characteristics', None),
+    'product_analysis': ('product_analysis', None),
+    'geographical_analysis': ('geographical_analysis', None),
+    'time_analysis': ('time_analysis', None),
+    'time_cube': ('time_cube', None),
+    'time_cube_customers': ('time_cube_customers', None),
+    'retail_sample': ('retail_data_sample', RETAIL_SAMPLE_COLUMNS)
+}
+
+@st.cache_resource
+def load_dataset(name, version):
+    """Open one dataset as a read-only view over its memory-mapped Arrow file
+
+    cache_resource hands every session the same frame instead of a copy, and
+    the mapped pages are shared with the other worker processes on the host.
+    version (the stored dataset's dataset_version) is part of the key, so a
+    refreshed dataset is reopened. Pages must not modify the returned frames.
+    """
+    datasets_read_from_disk.add(name)
+    store_name, columns = DATASET_SOURCES[name]
+    return open_dataset(store_name, columns=columns)
+
+def get_data(name):
+    """Load a dataset on first use by the current page and record how long it took"""
+    start = time.perf_counter()
     try:
-        # Load summary stats
-        with open('summary_stats.json', 'r') as f:
-            summary_stats = json.load(f)
-        
-        # Load main datasets from Generated CSV files folder
-        customer_segments = pd.read_csv('Generated CSV files/customer_segments.csv')
-        cluster_characteristics = pd.read_csv('Generated CSV files/cluster_characteristics.csv')
-        product_analysis = pd.read_csv('Generated CSV files/product_analysis.csv')
-        geographical_analysis = pd.read_csv('Generated CSV files/geographical_analysis.csv')
-        time_analysis = pd.read_csv('Generated CSV files/time_analysis.csv')
-        retail_sample = pd.read_csv('Generated CSV files/retail_data_sample.csv')
-        
-        # Convert date columns
-        retail_sample['InvoiceDate'] = pd.to_datetime(retail_sample['InvoiceDate'])
-        time_analysis['Date'] = pd.to_datetime(time_analysis['Date'])
-        
-        return {
-            'summary_stats': summary_stats,
-            'customer_segments': customer_segments,
-            'cluster_characteristics': cluster_characteristics,
-            'product_analysis': product_analysis,
-            'geographical_analysis': geographical_analysis,
-            'time_analysis': time_analysis,
-            'retail_sample': retail_sample
-        }
+        if name == 'overview_kpis':
+            result = load_overview_kpis(snapshot_version())
+        else:
+            result = load_dataset(name, dataset_version(DATASET_SOURCES[name][0]))
     except FileNotFoundError as e:
         st.error(f"Data file not found: {e}")
         st.error("Please run the Jupyter notebook first to generate the required data files.")
-        return None
+        st.stop()
+    
+    record_load(name, result, time.perf_counter() - start)
+    return result
+
+def get_built(name, build, *args):
+    """Fetch a dataset derived by a cache_resource builder and record it in the load log
+
+    The builder's own loads are logged separately when it runs, so their
+    time is left out of this entry.
+    """
+    logged = len(data_load_log)
+    start = time.perf_counter()
+    result = build(*args)
+    nested = sum(entry['Seconds'] for entry in data_load_log[logged:])
+    record_load(name, result, time.perf_counter() - start - nested)
+    return result
+
+def record_load(name, result, seconds):
+    is_frame = isinstance(result, pd.DataFrame)
+    if name in datasets_built:
+        source = 'built'
+    else:
+        source = 'disk' if name in datasets_read_from_disk else 'cache'
+    data_load_log.append({
+        'Dataset': name,
+        'Rows': len(result) if is_frame else None,
+        'Memory_MB': memory_mb(result) if is_frame else None,
+        'Seconds': seconds,
+        'Source': source
+    })
+    profiler.record(f"load {name}", 'load', seconds)
+
+@st.cache_resource
+def prepare_recommendation_data(dataset_version):
+    """Prepare data for product recommendations, shared by all sessions"""
+    datasets_built.add('recommendation_data')
+    retail_sample = get_data('retail_sample')
+    
+    # Sparse customer-product matrix, memory-mapped so worker processes share one copy
+    customer_product_matrix = shared_interaction_matrix('retail_data_sample', weighting='quantity')
+    
+    # Get product information
+    product_info = retail_sample.groupby('Description', observed=True).agg({
+        'UnitPrice': 'mean',
+        'Quantity': 'sum',
+        'CustomerID': 'nunique',
+        'TotalAmount': 'sum'
+    }).reset_index()
+    product_info.columns = ['Description', 'Avg_Price', 'Total_Quantity', 'Unique_Customers', 'Total_Revenue']
+    
+    return customer_product_matrix, product_info
 
-# Load all data
-data = load_data()
+@st.cache_resource
+def get_recommendation_service(dataset_version):
+    """Similarity index, product stats and query cache, built once per version of the transaction data"""
+    datasets_built.add('recommendation_service')
+    customer_product_matrix, product_info = get_built('recommendation_data', prepare_recommendation_data,
+                                                      dataset_version)
+    similarity_index = get_or_build_similarity_index(customer_product_matrix, source_version=dataset_version)
+    return RecommendationService(similarity_index, product_info, version=dataset_version)
 
-if data is None:
-    st.stop()
+@st.cache_resource
+def get_product_search(dataset_version):
+    """Search index over product descriptions, ranked by revenue"""
+    datasets_built.add('product_search')
+    recommendation_service = get_built('recommendation_service', get_recommendation_service, dataset_version)
+    return ProductSearchIndex.from_product_info(recommendation_service.product_info)
 
-# Extract data
-summary_stats = data['summary_stats']
-customer_segments = data['customer_segments']
-cluster_characteristics = data['cluster_characteristics']
-product_analysis = data['product_analysis']
-geographical_analysis = data['geographical_analysis']
-time_analysis = data['time_analysis']
-retail_sample = data['retail_sample']
+@st.cache_resource
+def get_customer_recommender(transactions_version, segments_version):
+    """Per-customer recommender over the shared interaction matrix and similarity index; the boost is per query"""
+    datasets_built.add('customer_recommender')
+    customer_product_matrix, _ = get_built('recommendation_data', prepare_recommendation_data, transactions_version)
+    similarity_index = get_built('recommendation_service', get_recommendation_service, transactions_version).index
+    customer_clusters = get_data('customer_segments').set_index('CustomerID')['Cluster']
+    return CustomerRecommender(customer_product_matrix, similarity_index, customer_clusters)
+
+@st.cache_resource
+def get_basket_rules(dataset_version):
+    """Association rules over invoice baskets, mined once per version of the transaction data"""
+    datasets_built.add('basket_rules')
+    transactions = get_data('retail_sample')[BASKET_COLUMNS]
+    # In-process: the sample is small, and a server should not fork a pool per rerun
+    return mine_rules(transactions, min_support=BASKET_MIN_SUPPORT, min_confidence=BASKET_MIN_CONFIDENCE,
+                      n_jobs=1)
+
+@st.cache_resource
+def get_transaction_store(store_version):
+    """Read-only connection to the SQL store, opened once per build and shared by all sessions"""
+    return open_store()
+
+def current_transaction_store():
+    """The SQL store if one was built and its source has not changed since, else None"""
+    transaction_store = get_transaction_store(store_version())
+    return transaction_store if transaction_store is not None and transaction_store.is_current() else None
+
+def get_product_recommendations(product_name, recommendation_service, n_recommendations=5):
+    """Get product recommendations using collaborative filtering"""
+    # Neighbours are precomputed and repeat queries come from the service's LRU cache
+    return recommendation_service.recommend(product_name, n_recommendations)
 
 # Overview Dashboard
 if page == "📈 Overview Dashboard":
     st.header("📈 Business Overview")
+    # Every value on this page comes from the precomputed KPI snapshot
+    overview_kpis = get_data('overview_kpis')
+    headline = overview_kpis['headline']
     
     # Key Metrics Row
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.metric("Total Revenue", f"${summary_stats['total_revenue']:,.0f}")
+        st.metric("Total Revenue", f"${headline['total_revenue']:,.0f}")
     with col2:
-        st.metric("Total Customers", f"{summary_stats['total_customers']:,}")
+        st.metric("Total Customers", f"{headline['total_customers']:,}")
     with col3:
-        st.metric("Total Orders", f"{summary_stats['total_orders']:,}")
+        st.metric("Total Orders", f"{headline['total_orders']:,}")
     with col4:
-        st.metric("Avg Order Value", f"${summary_stats['avg_order_value']:.2f}")
+        st.metric("Avg Order Value", f"${headline['avg_order_value']:.2f}")
     with col5:
-        st.metric("Customer Segments", f"{summary_stats['cluster_info']['n_clusters']}")
+        st.metric("Customer Segments", f"{overview_kpis['n_clusters']}")
     
     st.markdown("---")
     
@@ -224,8 +366,7 @@ if page == "📈 Overview Dashboard":
     
     with col1:
         st.subheader("📊 Revenue by Customer Segment")
-        cluster_revenue = customer_segments.groupby('Cluster')['Monetary'].sum().reset_index()
-        cluster_revenue['Percentage'] = (cluster_revenue['Monetary'] / cluster_revenue['Monetary'].sum()) * 100
+        cluster_revenue = pd.DataFrame(overview_kpis['cluster_revenue'])
         
         fig_pie = px.pie(
             cluster_revenue, 
@@ -236,12 +377,11 @@ if page == "📈 Overview Dashboard":
         )
         fig_pie.update_traces(textposition='inside', textinfo='percent+label')
         fig_pie = update_chart_layout(fig_pie)
-        st.plotly_chart(fig_pie, use_container_width=True)
+        show_chart(fig_pie)
     
     with col2:
         st.subheader("👥 Customer Distribution")
-        cluster_counts = customer_segments['Cluster'].value_counts().reset_index()
-        cluster_counts.columns = ['Cluster', 'Count']
+        cluster_counts = pd.DataFrame(overview_kpis['cluster_counts'])
         
         fig_bar = px.bar(
             cluster_counts, 
@@ -252,11 +392,14 @@ if page == "📈 Overview Dashboard":
             color_discrete_sequence=px.colors.qualitative.Set3
         )
         fig_bar = update_chart_layout(fig_bar)
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_chart(fig_bar)
     
     # Daily Revenue Trend
     st.subheader("📈 Daily Revenue Trend")
-    daily_revenue = time_analysis.groupby('Date')['Revenue'].sum().reset_index()
+    daily_revenue = pd.DataFrame({
+        'Date': pd.to_datetime(list(overview_kpis['daily_revenue'])),
+        'Revenue': list(overview_kpis['daily_revenue'].values())
+    }).sort_values('Date')
     
     fig_line = px.line(
         daily_revenue, 
@@ -267,25 +410,18 @@ if page == "📈 Overview Dashboard":
     )
     fig_line.update_layout(xaxis_title="Date", yaxis_title="Revenue ($)")
     fig_line = update_chart_layout(fig_line)
-    st.plotly_chart(fig_line, use_container_width=True)
+    show_chart(fig_line)
     
     # Top Insights
     st.subheader("🔍 Key Insights")
-    
-    # Calculate insights
-    top_cluster = customer_segments.groupby('Cluster')['Monetary'].sum().idxmax()
-    top_cluster_revenue_pct = (customer_segments[customer_segments['Cluster'] == top_cluster]['Monetary'].sum() / 
-                              customer_segments['Monetary'].sum()) * 100
-    
-    avg_clv = customer_segments['CLV_Estimate'].mean()
-    high_value_customers = len(customer_segments[customer_segments['CLV_Estimate'] > avg_clv * 2])
+    insight_values = overview_kpis['insights']
     
     insights = [
-        f"🎯 Cluster {top_cluster} generates {top_cluster_revenue_pct:.1f}% of total revenue",
-        f"💎 {high_value_customers} customers have CLV 2x above average",
-        f"🌍 Business operates in {summary_stats['unique_countries']} countries",
-        f"🛒 Average customer makes {customer_segments['Frequency'].mean():.1f} orders",
-        f"⏱️ Analysis covers {summary_stats['analysis_period_days']} days of data"
+        f"🎯 Cluster {insight_values['top_cluster']} generates {insight_values['top_cluster_revenue_pct']:.1f}% of total revenue",
+        f"💎 {insight_values['high_value_customers']} customers have CLV 2x above average",
+        f"🌍 Business operates in {headline['unique_countries']} countries",
+        f"🛒 Average customer makes {insight_values['avg_frequency']:.1f} orders",
+        f"⏱️ Analysis covers {headline['analysis_period_days']} days of data"
     ]
     
     for insight in insights:
@@ -294,6 +430,8 @@ if page == "📈 Overview Dashboard":
 # Customer Segments Page
 elif page == "👥 Customer Segments":
     st.header("👥 Customer Segmentation Analysis")
+    cluster_characteristics = get_data('cluster_characteristics')
+    customer_segments = get_data('customer_segments')
     
     # Segment Overview
     st.subheader("📊 Segment Characteristics")
@@ -343,7 +481,7 @@ elif page == "👥 Customer Segments":
             title="RFM Scores by Segment"
         )
         
-        st.plotly_chart(fig_radar, use_container_width=True)
+        show_chart(fig_radar)
     
     with col2:
         st.subheader("💰 Customer Lifetime Value")
@@ -357,7 +495,7 @@ elif page == "👥 Customer Segments":
             color_discrete_sequence=px.colors.qualitative.Set3
         )
         fig_clv.update_layout(yaxis_title="Estimated CLV ($)")
-        st.plotly_chart(fig_clv, use_container_width=True)
+        show_chart(fig_clv)
     
     # Segment Deep Dive
     st.subheader("🔍 Segment Deep Dive")
@@ -382,30 +520,36 @@ elif page == "👥 Customer Segments":
     col1, col2 = st.columns(2)
     
     with col1:
-        # Recency distribution
-        fig_hist = px.histogram(
-            cluster_data,
-            x='Recency',
-            title=f"Recency Distribution - Cluster {selected_cluster}",
-            nbins=30
+        # Recency distribution, binned here so only 30 bars are sent to the browser
+        fig_hist = px.bar(
+            histogram_bins(cluster_data['Recency'], nbins=30),
+            x='Bin_Centre',
+            y='Count',
+            hover_data=['Bin_Start', 'Bin_End'],
+            labels={'Bin_Centre': 'Recency'},
+            title=f"Recency Distribution - Cluster {selected_cluster}"
         )
-        st.plotly_chart(fig_hist, use_container_width=True)
+        fig_hist.update_layout(bargap=0)
+        show_chart(fig_hist)
     
     with col2:
         # Frequency vs Monetary scatter
+        scatter_points = downsample_points(cluster_data, CHART_POINT_BUDGET, keep_top=['Monetary', 'CLV_Estimate'],
+                                           outlier_cols=['Frequency', 'Monetary'])
         fig_scatter = px.scatter(
-            cluster_data,
+            scatter_points,
             x='Frequency',
             y='Monetary',
-            title=f"Frequency vs Monetary - Cluster {selected_cluster}",
+            title=f"Frequency vs Monetary - Cluster {selected_cluster}" + sample_note(scatter_points, cluster_data),
             size='CLV_Estimate',
             hover_data=['CustomerID']
         )
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        show_chart(fig_scatter)
 
 # Product Analysis Page
 elif page == "🛒 Product Analysis":
     st.header("🛒 Product Performance Analysis")
+    product_analysis = get_data('product_analysis')
     
     # Top Products Overview
     col1, col2 = st.columns(2)
@@ -424,7 +568,7 @@ elif page == "🛒 Product Analysis":
         )
         fig_bar.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
         fig_bar.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_chart(fig_bar)
     
     with col2:
         st.subheader("📦 Top Products by Quantity")
@@ -442,52 +586,58 @@ elif page == "🛒 Product Analysis":
         )
         fig_bar2.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
         fig_bar2.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_bar2, use_container_width=True)
+        show_chart(fig_bar2)
     
     # Product Performance Matrix
     st.subheader("📊 Product Performance Matrix")
     
-    # Create performance categories
-    revenue_median = product_analysis['Total_Revenue'].median()
-    quantity_median = product_analysis['Total_Quantity'].median()
-    
-    def categorize_product(row):
-        if row['Total_Revenue'] >= revenue_median and row['Total_Quantity'] >= quantity_median:
-            return "Star Products"
-        elif row['Total_Revenue'] >= revenue_median and row['Total_Quantity'] < quantity_median:
-            return "Premium Products"
-        elif row['Total_Revenue'] < revenue_median and row['Total_Quantity'] >= quantity_median:
-            return "Volume Products"
-        else:
-            return "Underperformers"
-    
-    product_analysis['Category'] = product_analysis.apply(categorize_product, axis=1)
+    # Quadrant thresholds
+    col1, col2 = st.columns(2)
+    with col1:
+        threshold_method = st.selectbox("Threshold", ['median', 'percentile'], format_func=str.title)
+    with col2:
+        threshold_percentile = st.slider("Percentile", min_value=5, max_value=95, value=50, step=5,
+                                         disabled=threshold_method == 'median')
     
+    @st.cache_data
+    def product_categories(method, percentile, products_version, _product_analysis):
+        """Performance quadrant of every product, cached per threshold setting and version of the products"""
+        return categorize_products(_product_analysis, method, percentile)
+    
+    categories, (revenue_threshold, quantity_threshold) = product_categories(
+        threshold_method, threshold_percentile, dataset_version('product_analysis'), product_analysis)
+    # assign returns a new frame, so the cached dataset is left untouched
+    product_analysis = product_analysis.assign(Category=categories)
+    threshold_label = "Median" if threshold_method == 'median' else f"P{threshold_percentile}"
+    
+    matrix_points = downsample_points(product_analysis, CHART_POINT_BUDGET, stratify='Category',
+                                      keep_top=['Total_Revenue', 'Total_Quantity'],
+                                      outlier_cols=['Total_Quantity', 'Total_Revenue'])
     fig_scatter = px.scatter(
-        product_analysis,
+        matrix_points,
         x='Total_Quantity',
         y='Total_Revenue',
         color='Category',
         size='Unique_Customers',
         hover_data=['Description', 'Avg_Price'],
-        title="Product Performance Matrix",
+        title="Product Performance Matrix" + sample_note(matrix_points, product_analysis),
         log_x=True,
         log_y=True
     )
     
-    # Add median lines
-    fig_scatter.add_hline(y=revenue_median, line_dash="dash", line_color="red", 
-                         annotation_text="Revenue Median")
-    fig_scatter.add_vline(x=quantity_median, line_dash="dash", line_color="red", 
-                         annotation_text="Quantity Median")
+    # Add threshold lines
+    fig_scatter.add_hline(y=revenue_threshold, line_dash="dash", line_color="red", 
+                         annotation_text=f"Revenue {threshold_label}")
+    fig_scatter.add_vline(x=quantity_threshold, line_dash="dash", line_color="red", 
+                         annotation_text=f"Quantity {threshold_label}")
     
-    st.plotly_chart(fig_scatter, use_container_width=True)
+    show_chart(fig_scatter)
     
     # Product Categories Analysis
     col1, col2 = st.columns(2)
     
     with col1:
-        category_summary = product_analysis.groupby('Category').agg({
+        category_summary = product_analysis.groupby('Category', observed=True).agg({
             'Total_Revenue': 'sum',
             'Description': 'count'
         }).reset_index()
@@ -499,7 +649,7 @@ elif page == "🛒 Product Analysis":
             names='Category',
             title="Revenue by Product Category"
         )
-        st.plotly_chart(fig_pie, use_container_width=True)
+        show_chart(fig_pie)
     
     with col2:
         st.subheader("📈 Category Performance")
@@ -514,6 +664,7 @@ elif page == "🛒 Product Analysis":
 # Geographic Analysis Page
 elif page == "🌍 Geographic Analysis":
     st.header("🌍 Geographic Performance Analysis")
+    geographical_analysis = get_data('geographical_analysis')
     
     # Top Countries Overview
     col1, col2 = st.columns(2)
@@ -534,7 +685,7 @@ elif page == "🌍 Geographic Analysis":
         )
         fig_bar.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
         fig_bar.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_chart(fig_bar)
     
     with col2:
         st.subheader("👥 Customer Distribution")
@@ -551,7 +702,7 @@ elif page == "🌍 Geographic Analysis":
         )
         fig_bar2.update_traces(texttemplate='%{text:,.0f}', textposition='outside')
         fig_bar2.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_bar2, use_container_width=True)
+        show_chart(fig_bar2)
     
     # Performance Metrics
     col1, col2 = st.columns(2)
@@ -572,7 +723,7 @@ elif page == "🌍 Geographic Analysis":
         )
         fig_bar3.update_traces(texttemplate='$%{text:.2f}', textposition='outside')
         fig_bar3.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_bar3, use_container_width=True)
+        show_chart(fig_bar3)
     
     with col2:
         st.subheader("📊 Revenue vs Customers Scatter")
@@ -587,7 +738,7 @@ elif page == "🌍 Geographic Analysis":
             log_x=True,
             log_y=True
         )
-        st.plotly_chart(fig_scatter, use_container_width=True)
+        show_chart(fig_scatter)
     
     # Geographic Performance Table
     st.subheader("📋 Geographic Performance Summary")
@@ -607,13 +758,58 @@ elif page == "🌍 Geographic Analysis":
 # Time Patterns Page
 elif page == "⏰ Time Patterns":
     st.header("⏰ Temporal Analysis")
+    # A SQL store holding the full history answers every roll-up with a query; otherwise the time cube does
+    transaction_store = current_transaction_store()
+    use_sql_store = transaction_store is not None and transaction_store.full_history
+    if use_sql_store:
+        all_countries, all_clusters = transaction_store.countries(), transaction_store.clusters()
+    else:
+        time_cube = TimeCube(get_data('time_cube'), get_data('time_cube_customers'))
+        all_countries = sorted(time_cube.cells['Country'].unique())
+        all_clusters = sorted(time_cube.cells['Cluster'].unique())
+    
+    # Filters only shrink the cube, so every chart below stays a small roll-up
+    col1, col2 = st.columns(2)
+    with col1:
+        country_filter = st.multiselect("Filter by Country", options=all_countries,
+                                        placeholder="All countries")
+    with col2:
+        cluster_filter = st.multiselect("Filter by Segment", options=all_clusters, placeholder="All segments")
+    
+    @st.cache_data
+    def time_pattern_rollups(countries, clusters, source_version, _store=None):
+        """Every aggregate the Time Patterns charts need, cached per filter selection and data version
+
+        _store is the SQL store the page checked (not part of the key); without it the time cube answers.
+        """
+        if _store is not None:
+            return _store.time_pattern_rollups(countries, clusters)
+        cube = TimeCube(get_data('time_cube'), get_data('time_cube_customers'))
+        cube = cube.slice(countries=countries or None, clusters=clusters or None)
+        return {
+            'daily': cube.rollup(['Date'], ['Revenue']),
+            'hourly': cube.rollup(['Hour'], ['Revenue']),
+            'monthly': cube.monthly(),
+            'heatmap': cube.weekday_hour_heatmap(),
+        }
+    
+    if use_sql_store:
+        source_version = ('sql', store_version())
+    else:
+        source_version = ('cube', dataset_version('time_cube'), dataset_version('time_cube_customers'))
+    with profiler.section("Time roll-ups"):
+        rollups = time_pattern_rollups(tuple(country_filter), tuple(cluster_filter), source_version,
+                                       _store=transaction_store if use_sql_store else None)
+    if use_sql_store:
+        st.caption(f"Aggregated in the {transaction_store.backend} store over "
+                   f"{int(transaction_store.meta['rows']):,} transactions")
     
     # Daily and Hourly Patterns
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📅 Daily Revenue Trend")
-        daily_trend = time_analysis.groupby('Date')['Revenue'].sum().reset_index()
+        daily_trend = rollups['daily']
         
         fig_line = px.line(
             daily_trend,
@@ -622,11 +818,11 @@ elif page == "⏰ Time Patterns":
             title="Daily Revenue Over Time"
         )
         fig_line.update_layout(xaxis_title="Date", yaxis_title="Revenue ($)")
-        st.plotly_chart(fig_line, use_container_width=True)
+        show_chart(fig_line)
     
     with col2:
         st.subheader("🕐 Hourly Sales Pattern")
-        hourly_pattern = time_analysis.groupby('Hour')['Revenue'].sum().reset_index()
+        hourly_pattern = rollups['hourly']
         
         fig_bar = px.bar(
             hourly_pattern,
@@ -636,74 +832,62 @@ elif page == "⏰ Time Patterns":
             color='Revenue',
             color_continuous_scale='viridis'
         )
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_chart(fig_bar)
     
     # Monthly Analysis
-    if 'retail_sample' in locals():
-        st.subheader("📆 Monthly Trends")
-        
-        retail_sample['Month'] = retail_sample['InvoiceDate'].dt.month
-        retail_sample['Year'] = retail_sample['InvoiceDate'].dt.year
-        
-        monthly_data = retail_sample.groupby(['Year', 'Month']).agg({
-            'TotalAmount': 'sum',
-            'CustomerID': 'nunique',
-            'InvoiceNo': 'nunique'
-        }).reset_index()
-        
-        monthly_data['Period'] = monthly_data['Year'].astype(str) + '-' + monthly_data['Month'].astype(str).str.zfill(2)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            fig_monthly = px.line(
-                monthly_data,
-                x='Period',
-                y='TotalAmount',
-                title="Monthly Revenue Trend",
-                markers=True
-            )
-            fig_monthly.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig_monthly, use_container_width=True)
-        
-        with col2:
-            fig_customers = px.line(
-                monthly_data,
-                x='Period',
-                y='CustomerID',
-                title="Monthly Active Customers",
-                markers=True,
-                color_discrete_sequence=['orange']
-            )
-            fig_customers.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig_customers, use_container_width=True)
+    st.subheader("📆 Monthly Trends")
+    
+    monthly_data = rollups['monthly']
+    monthly_data = monthly_data.assign(Period=monthly_data['Month'].dt.strftime('%Y-%m'))
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig_monthly = px.line(
+            monthly_data,
+            x='Period',
+            y='Revenue',
+            title="Monthly Revenue Trend",
+            markers=True
+        )
+        fig_monthly.update_layout(xaxis_tickangle=-45)
+        show_chart(fig_monthly)
+    
+    with col2:
+        fig_customers = px.line(
+            monthly_data,
+            x='Period',
+            y='Customers',
+            title="Monthly Active Customers",
+            markers=True,
+            color_discrete_sequence=['orange']
+        )
+        fig_customers.update_layout(xaxis_tickangle=-45)
+        show_chart(fig_customers)
     
     # Heatmap Analysis
     st.subheader("🔥 Sales Heatmap")
     
-    # Create day of week from sample data
-    if 'retail_sample' in locals():
-        retail_sample['DayOfWeek'] = retail_sample['InvoiceDate'].dt.dayofweek
-        retail_sample['DayName'] = retail_sample['InvoiceDate'].dt.day_name()
-        
-        heatmap_data = retail_sample.groupby(['DayName', 'Hour'])['TotalAmount'].sum().reset_index()
-        heatmap_pivot = heatmap_data.pivot(index='DayName', columns='Hour', values='TotalAmount').fillna(0)
-        
-        # Reorder days
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        heatmap_pivot = heatmap_pivot.reindex(day_order)
-        
-        fig_heatmap = px.imshow(
-            heatmap_pivot,
-            title="Sales Heatmap by Day and Hour",
-            labels=dict(x="Hour", y="Day of Week", color="Revenue"),
-            color_continuous_scale="Viridis"
-        )
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+    fig_heatmap = px.imshow(
+        rollups['heatmap'],
+        title="Sales Heatmap by Day and Hour",
+        labels=dict(x="Hour", y="Day of Week", color="Revenue"),
+        color_continuous_scale="Viridis"
+    )
+    show_chart(fig_heatmap)
 
 # Customer Explorer Page
 elif page == "🔍 Customer Explorer":
     st.header("🔍 Customer Explorer")
+    customer_segments = get_data('customer_segments')
+    
+    @st.cache_resource
+    def get_customer_index(segments_version, _customer_segments):
+        """Cluster partitions, presorted columns and top-N orders, built once per version of the segments"""
+        return CustomerIndex(_customer_segments)
+    
+    # Keyed on the version so index positions always refer to the frame loaded above
+    customer_index = get_customer_index(dataset_version('customer_segments'), customer_segments)
     
     # Customer Search and Filter
     st.subheader("🔎 Find Customers")
@@ -713,15 +897,15 @@ elif page == "🔍 Customer Explorer":
     with col1:
         cluster_filter = st.multiselect(
             "Filter by Segment",
-            options=sorted(customer_segments['Cluster'].unique()),
-            default=sorted(customer_segments['Cluster'].unique())
+            options=customer_index.clusters,
+            default=customer_index.clusters
         )
     
     with col2:
         min_monetary = st.slider(
             "Minimum Total Spent",
             min_value=0,
-            max_value=int(customer_segments['Monetary'].max()),
+            max_value=int(customer_index.maximum('Monetary')),
             value=0
         )
     
@@ -729,58 +913,87 @@ elif page == "🔍 Customer Explorer":
         min_frequency = st.slider(
             "Minimum Order Count",
             min_value=1,
-            max_value=int(customer_segments['Frequency'].max()),
+            max_value=int(customer_index.maximum('Frequency')),
             value=1
         )
     
-    # Apply filters
-    filtered_customers = customer_segments[
-        (customer_segments['Cluster'].isin(cluster_filter)) &
-        (customer_segments['Monetary'] >= min_monetary) &
-        (customer_segments['Frequency'] >= min_frequency)
-    ]
+    # Apply filters (binary searches on the presorted columns instead of full boolean masks)
+    minimums = {'Monetary': min_monetary, 'Frequency': min_frequency}
+    selected_positions = customer_index.select(cluster_filter, minimums)
     
-    st.write(f"Found {len(filtered_customers):,} customers matching criteria")
+    st.write(f"Found {len(selected_positions):,} customers matching criteria")
     
     # Customer Analysis
-    if len(filtered_customers) > 0:
+    if len(selected_positions) > 0:
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("💰 Value Distribution")
-            fig_hist = px.histogram(
-                filtered_customers,
+            value_histogram = customer_index.histogram(selected_positions)
+            fig_hist = px.bar(
+                value_histogram,
                 x='Monetary',
-                nbins=30,
+                y='Customers',
+                hover_data=['Bin_Start', 'Bin_End'],
                 title="Customer Value Distribution"
             )
-            st.plotly_chart(fig_hist, use_container_width=True)
+            fig_hist.update_layout(bargap=0)
+            show_chart(fig_hist)
         
         with col2:
             st.subheader("🎯 RFM Scatter")
+            # Above the point budget: a per-segment sample that always includes the top customers
+            top_positions = [customer_index.top_n(key, TOP_N, cluster_filter, minimums)
+                             for key in ['Monetary', 'CLV_Estimate', 'Frequency']]
+            sample = stratified_sample(customer_index.cluster_codes[selected_positions], CHART_POINT_BUDGET,
+                                       keep=np.flatnonzero(np.isin(selected_positions, np.concatenate(top_positions))))
+            scatter_points = customer_segments.iloc[np.sort(selected_positions[sample])]
             fig_scatter = px.scatter(
-                filtered_customers,
+                scatter_points,
                 x='Frequency',
                 y='Monetary',
                 color='Cluster',
                 size='CLV_Estimate',
                 hover_data=['CustomerID', 'Recency'],
-                title="Frequency vs Monetary Value"
+                title="Frequency vs Monetary Value" + sample_note(scatter_points, selected_positions)
             )
-            st.plotly_chart(fig_scatter, use_container_width=True)
+            show_chart(fig_scatter)
         
         # Top Customers Table
         st.subheader("👑 Top Customers")
         
-        sort_by = st.selectbox(
-            "Sort by",
-            ['Monetary', 'CLV_Estimate', 'Frequency', 'Recency']
-        )
+        col1, col2 = st.columns(2)
+        with col1:
+            sort_by = st.selectbox(
+                "Sort by",
+                ['Monetary', 'CLV_Estimate', 'Frequency', 'Recency']
+            )
+        with col2:
+            segment_boost = st.slider(
+                "Segment popularity boost",
+                min_value=0.0,
+                max_value=1.0,
+                value=0.0,
+                step=0.1,
+                help="Weight of products popular in the customer's segment in the recommendations"
+            )
+        
+        top_customers = customer_segments.iloc[customer_index.top_n(sort_by, 20, cluster_filter, minimums)].copy()
         
-        top_customers = filtered_customers.nlargest(20, sort_by)
+        # Unseen products scored from the customer's purchases; repeat customers come from the cache
+        with profiler.section("Customer recommendations"):
+            customer_recommender = get_built('customer_recommender', get_customer_recommender,
+                                             dataset_version('retail_data_sample'),
+                                             dataset_version('customer_segments'))
+            customer_recommendations = customer_recommender.recommend_many(top_customers['CustomerID'].tolist(), 3,
+                                                                           boost=segment_boost)
+        top_customers['Recommended_Products'] = [
+            ', '.join(rec['Product'].strip() for rec in customer_recommendations[customer_id])
+            for customer_id in top_customers['CustomerID']
+        ]
         
         display_cols = ['CustomerID', 'Cluster', 'Recency', 'Frequency', 'Monetary', 
-                       'Avg_Order_Value', 'CLV_Estimate', 'Country']
+                       'Avg_Order_Value', 'CLV_Estimate', 'Country', 'Recommended_Products']
 
         st.dataframe(
             top_customers[display_cols].style.format({
@@ -798,54 +1011,10 @@ elif page == "🎯 Product Recommendations":
     st.header("🎯 Product Recommendation System")
     st.markdown("### Find Similar Products Using Collaborative Filtering")
     
-    # Load product data for recommendations
-    @st.cache_data
-    def prepare_recommendation_data():
-        """Prepare data for product recommendations"""
-        # Create customer-product matrix
-        customer_product_matrix = retail_sample.groupby(['CustomerID', 'Description'])['Quantity'].sum().unstack(fill_value=0)
-        
-        # Get product information
-        product_info = retail_sample.groupby('Description').agg({
-            'UnitPrice': 'mean',
-            'Quantity': 'sum',
-            'CustomerID': 'nunique',
-            'TotalAmount': 'sum'
-        }).reset_index()
-        product_info.columns = ['Description', 'Avg_Price', 'Total_Quantity', 'Unique_Customers', 'Total_Revenue']
-        
-        return customer_product_matrix, product_info
-    
-    def get_product_recommendations(product_name, customer_product_matrix, n_recommendations=5):
-        """Get product recommendations using collaborative filtering"""
-        
-        if product_name not in customer_product_matrix.columns:
-            return None
-        
-        # Calculate cosine similarity between products
-        product_similarity = cosine_similarity(customer_product_matrix.T)
-        
-        # Get similarity scores for the selected product
-        product_idx = list(customer_product_matrix.columns).index(product_name)
-        similarity_scores = list(enumerate(product_similarity[product_idx]))
-        
-        # Sort by similarity (excluding the product itself)
-        similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)[1:n_recommendations+1]
-        
-        # Get recommended product names
-        recommended_products = []
-        for idx, score in similarity_scores:
-            product_name_rec = customer_product_matrix.columns[idx]
-            recommended_products.append({
-                'Product': product_name_rec,
-                'Similarity_Score': score,
-                'Index': idx
-            })
-        
-        return recommended_products
-    
-    # Prepare data
-    customer_product_matrix, product_info = prepare_recommendation_data()
+    recommendation_service = get_built('recommendation_service', get_recommendation_service,
+                                       dataset_version('retail_data_sample'))
+    product_search = get_built('product_search', get_product_search, dataset_version('retail_data_sample'))
+    product_info = recommendation_service.product_info
     
     # Product selection interface
     st.subheader("🔍 Select a Product")
@@ -856,24 +1025,19 @@ elif page == "🎯 Product Recommendations":
         # Product search
         search_term = st.text_input("🔎 Search for a product:", placeholder="Type product name here...")
         
-        # Filter products based on search
+        # Matches by revenue from the prebuilt n-gram index (typo-tolerant)
         if search_term:
-            filtered_products = [prod for prod in customer_product_matrix.columns if search_term.lower() in prod.lower()]
+            filtered_products = product_search.search(search_term, limit=50)
         else:
-            filtered_products = list(customer_product_matrix.columns)
-        
-        # Show top products if no search
-        if not search_term:
             st.info("💡 Tip: Search for a product name or select from popular products below")
             # Show most popular products
-            popular_products = product_info.nlargest(20, 'Total_Revenue')['Description'].tolist()
-            filtered_products = popular_products
+            filtered_products = product_search.top(20)
         
         # Product selection
         if filtered_products:
             selected_product = st.selectbox(
                 "Choose a product:",
-                options=filtered_products[:50],  # Limit to first 50 for performance
+                options=filtered_products,
                 help="Select a product to get recommendations"
             )
         else:
@@ -884,14 +1048,14 @@ elif page == "🎯 Product Recommendations":
         if st.button("🎯 Get Recommendations", type="primary", disabled=not selected_product):
             if selected_product:
                 with st.spinner("Finding similar products..."):
-                    recommendations = get_product_recommendations(selected_product, customer_product_matrix)
+                    recommendations = get_product_recommendations(selected_product, recommendation_service)
     
     # Display selected product info
     if selected_product:
         st.subheader(f"📦 Selected Product: {selected_product}")
         
         # Get product stats
-        product_stats = product_info[product_info['Description'] == selected_product].iloc[0]
+        product_stats = recommendation_service.product_stats(selected_product)
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -910,34 +1074,25 @@ elif page == "🎯 Product Recommendations":
             st.markdown("*Based on collaborative filtering - customers who bought this product also bought:*")
             
             # Create recommendation cards
+            # Each recommendation already carries its product stats
             for i, rec in enumerate(recommendations, 1):
-                product_name = rec['Product']
-                similarity_score = rec['Similarity_Score']
-                
-                # Get product info for recommendation
-                rec_stats = product_info[product_info['Description'] == product_name]
-                
-                if not rec_stats.empty:
-                    rec_stats = rec_stats.iloc[0]
-                    
-                    with st.container():
-                        st.markdown(f"""
-                        <div class="recommendation-card">
-                            <h4>#{i} {product_name}</h4>
-                            <div style="display: flex; justify-content: space-between; flex-wrap: wrap;">
-                                <span><strong>Similarity:</strong> {similarity_score:.1%}</span>
-                                <span><strong>Avg Price:</strong> ${rec_stats['Avg_Price']:.2f}</span>
-                                <span><strong>Sold:</strong> {rec_stats['Total_Quantity']:,.0f} units</span>
-                                <span><strong>Customers:</strong> {rec_stats['Unique_Customers']:,.0f}</span>
-                            </div>
+                with st.container():
+                    st.markdown(f"""
+                    <div class="recommendation-card">
+                        <h4>#{i} {rec['Product']}</h4>
+                        <div style="display: flex; justify-content: space-between; flex-wrap: wrap;">
+                            <span><strong>Similarity:</strong> {rec['Similarity_Score']:.1%}</span>
+                            <span><strong>Avg Price:</strong> ${rec['Avg_Price']:.2f}</span>
+                            <span><strong>Sold:</strong> {rec['Total_Quantity']:,.0f} units</span>
+                            <span><strong>Customers:</strong> {rec['Unique_Customers']:,.0f}</span>
                         </div>
-                        """, unsafe_allow_html=True)
+                    </div>
+                    """, unsafe_allow_html=True)
             
             # Recommendation insights
             st.subheader("📊 Recommendation Insights")
             
-            rec_df = pd.DataFrame(recommendations)
-            rec_df = rec_df.merge(product_info, left_on='Product', right_on='Description', how='left')
+            rec_df = pd.DataFrame(list(recommendations))
             
             col1, col2 = st.columns(2)
             
@@ -953,15 +1108,15 @@ elif page == "🎯 Product Recommendations":
                 )
                 fig_similarity.update_traces(texttemplate='%{text:.1%}', textposition='outside')
                 fig_similarity.update_layout(yaxis={'categoryorder':'total ascending'})
-                st.plotly_chart(fig_similarity, use_container_width=True)
+                show_chart(fig_similarity)
             
             with col2:
                 # Price comparison
-                all_products = [selected_product] + [rec['Product'] for rec in recommendations]
-                price_comparison = product_info[product_info['Description'].isin(all_products)].copy()
-                price_comparison['Type'] = price_comparison['Description'].apply(
-                    lambda x: 'Selected' if x == selected_product else 'Recommended'
-                )
+                price_comparison = pd.DataFrame({
+                    'Description': [selected_product] + rec_df['Product'].tolist(),
+                    'Avg_Price': [product_stats['Avg_Price']] + rec_df['Avg_Price'].tolist(),
+                    'Type': ['Selected'] + ['Recommended'] * len(rec_df)
+                })
                 
                 fig_price = px.bar(
                     price_comparison,
@@ -973,11 +1128,44 @@ elif page == "🎯 Product Recommendations":
                     text='Avg_Price'
                 )
                 fig_price.update_traces(texttemplate='$%{text:.2f}', textposition='outside')
-                st.plotly_chart(fig_price, use_container_width=True)
+                show_chart(fig_price)
             
         else:
             st.warning("No similar products found for this item.")
     
+    cache_stats = recommendation_service.cache_stats()
+    st.caption(f"Recommendation cache: {cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses "
+               f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['size']:,}/{cache_stats['max_size']:,} entries)")
+    
+    # Market Basket Section
+    st.subheader("🧺 Frequently Bought Together")
+    st.markdown("*Association rules mined from invoice baskets*")
+    
+    with profiler.section("Association rules"):
+        basket_rules = get_built('basket_rules', get_basket_rules, dataset_version('retail_data_sample'))
+    if selected_product:
+        # Antecedents are tuples of product names
+        product_rules = basket_rules[basket_rules['Antecedent'].map(lambda items: selected_product in items)]
+    else:
+        product_rules = basket_rules.iloc[:0]
+    
+    rule_format = {'Support': '{:.3%}', 'Confidence': '{:.1%}', 'Lift': '{:.1f}'}
+    if len(product_rules) > 0:
+        st.dataframe(
+            format_rules(product_rules.head(10))[['Antecedent', 'Consequent', 'Count', 'Support', 'Confidence', 'Lift']]
+            .style.format(rule_format),
+            use_container_width=True
+        )
+    else:
+        st.info("No association rules involve this product at the current support and confidence thresholds.")
+    
+    with st.expander(f"Strongest rules overall ({len(basket_rules):,} rules)"):
+        st.dataframe(
+            format_rules(basket_rules.head(50))[['Antecedent', 'Consequent', 'Count', 'Support', 'Confidence', 'Lift']]
+            .style.format(rule_format),
+            use_container_width=True
+        )
+    
     # Popular Products Section
     st.subheader("🔥 Most Popular Products")
     st.markdown("*Browse our top-selling products*")
@@ -997,7 +1185,7 @@ elif page == "🎯 Product Recommendations":
         )
         fig_revenue.update_traces(texttemplate='$%{text:,.0f}', textposition='outside')
         fig_revenue.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_revenue, use_container_width=True)
+        show_chart(fig_revenue)
     
     with col2:
         fig_customers = px.bar(
@@ -1012,7 +1200,99 @@ elif page == "🎯 Product Recommendations":
         )
         fig_customers.update_traces(texttemplate='%{text:.0f}', textposition='outside')
         fig_customers.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_customers, use_container_width=True)
+        show_chart(fig_customers)
+
+# Customer Scoring Page
+elif page == "🧮 Score Customers":
+    st.header("🧮 Score Customers")
+    st.markdown("### Assign segments to new customers with the trained clustering model")
+    
+    @st.cache_resource
+    def get_segment_scorer(model_mtime):
+        """Load the scaler and model_info once per server process and model version"""
+        return read_scorer()
+    
+    try:
+        # Keyed on the file time so a retrained model (shopper_spectrum.retrain) is picked up
+        scorer = get_segment_scorer(model_version())
+    except FileNotFoundError as e:
+        st.error(f"Model file not found: {e}")
+        st.error("Please run the Jupyter notebook first to export scaler.pkl and model_info.pkl.")
+        st.stop()
+    
+    tab_single, tab_bulk = st.tabs(["👤 Single Customer", "📄 Bulk CSV Upload"])
+    
+    with tab_single:
+        cols = st.columns(3)
+        feature_values = {}
+        for i, (feature, mean) in enumerate(zip(scorer.feature_names, scorer.mean)):
+            with cols[i % 3]:
+                feature_values[feature] = st.number_input(feature, min_value=0.0, value=float(round(mean, 2)))
+        
+        scored_customer = scorer.score(pd.DataFrame([feature_values])).iloc[0]
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Assigned Segment", scored_customer['Cluster_Name'])
+        with col2:
+            st.metric("Distance to Centroid", f"{scored_customer['Cluster_Distance']:.2f}")
+    
+    with tab_bulk:
+        st.markdown(f"*Upload a CSV with one row per customer and the columns: {', '.join(scorer.feature_names)}*")
+        uploaded_file = st.file_uploader("Customer features CSV", type='csv')
+        
+        if uploaded_file is not None:
+            customers = pd.read_csv(uploaded_file)
+            try:
+                start = time.perf_counter()
+                scored_customers = scorer.score(customers)
+                elapsed = time.perf_counter() - start
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            
+            st.success(f"Scored {len(scored_customers):,} customers in {elapsed * 1000:.1f} ms")
+            
+            segment_counts = scored_customers['Cluster_Name'].value_counts().sort_index().reset_index()
+            segment_counts.columns = ['Segment', 'Customers']
+            fig_segments = px.bar(segment_counts, x='Segment', y='Customers', title="Customers per Segment",
+                                  text='Customers')
+            show_chart(fig_segments)
+            
+            st.dataframe(scored_customers.head(100), use_container_width=True)
+            st.download_button("📥 Download scored customers", scored_customers.to_csv(index=False),
+                               file_name='scored_customers.csv', mime='text/csv')
+
+# Data loading instrumentation for the current page
+with st.sidebar.expander("⏱️ Data Loading"):
+    if data_load_log:
+        load_log = pd.DataFrame(data_load_log)
+        st.dataframe(load_log.style.format({'Seconds': '{:.3f}', 'Memory_MB': '{:.2f}'}, na_rep='–'),
+                     use_container_width=True)
+        st.caption(f"{len(load_log)} datasets, {load_log['Seconds'].sum():.3f}s and "
+                   f"{load_log.drop_duplicates('Dataset')['Memory_MB'].sum():.1f} MB total")
+    else:
+        st.caption("No datasets loaded for this page")
+
+# Render profile for the current page
+if profiler.enabled:
+    profiler.finish()
+    with st.sidebar.expander("🩺 Performance HUD", expanded=True):
+        profile = profiler.to_frame()
+        st.dataframe(profile.drop(columns='Page').style.format({'Seconds': '{:.3f}', 'Memory_MB': '{:+.1f}',
+                                                                 'Payload_KB': '{:,.1f}'}, na_rep='–'),
+                     use_container_width=True)
+        slowest = profile[profile['Kind'] != 'total'].nlargest(1, 'Seconds')
+        if len(slowest):
+            st.caption(f"Slowest step: {slowest['Section'].iloc[0]} ({slowest['Kind'].iloc[0]}, "
+                       f"{slowest['Seconds'].iloc[0]:.3f}s)")
+        try:
+            profiler.export()
+        except OSError as e:
+            # Instrumentation must never break a page, e.g. on a read-only deploy
+            st.caption(f"Profile not written to {PROFILE_DIR}: {e}")
+        st.download_button("📥 JSON", profiler.to_json(), file_name='render_profile.json', mime='application/json')
+        st.download_button("📥 Prometheus", profiler.to_prometheus(), file_name='render_profile.prom',
+                           mime='text/plain')
 
 # Footer
 st.markdown("---")